@@ -0,0 +1,80 @@
+"""Latency/CPU comparison of the AsyncBridge 'poll' and 'push' modes.
+
+    python bench_bridge.py [--rate 200] [--seconds 3] [--idle 2]
+
+Envelope.ts is stamped with time.perf_counter() by the producer thread; latency is measured
+when the envelope is taken off the bridge's asyncio queue.
+"""
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import argparse, asyncio, json, statistics, threading, time
+from domain.messages import Envelope, Telemetry
+from infrastructure.bus.channels import ChannelRegistry, ChannelConfig
+from infrastructure.bus.async_bridge import AsyncBridge
+
+def _pct(xs, p):
+    if not xs: return float('nan')
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p / 100.0 * len(xs)))]
+
+async def run_mode(mode: str, rate: float, seconds: float, idle: float) -> dict:
+    reg = ChannelRegistry([ChannelConfig('kpi', maxsize=1000, policy='drop_old')])
+    bridge = AsyncBridge(reg, mode=mode)
+    bridge.start()
+
+    # Idle cost: nothing is published, so only the bridge's own wakeups burn CPU.
+    c0 = time.process_time()
+    await asyncio.sleep(idle)
+    idle_cpu = time.process_time() - c0
+
+    stop = threading.Event()
+    ch = reg.channel('kpi')
+    def produce():
+        period = 1.0 / rate
+        nxt = time.perf_counter()
+        while not stop.is_set():
+            ch.put(Envelope(topic='kpi', payload=Telemetry(source='bench', value=0.0), ts=time.perf_counter()))
+            nxt += period
+            delay = nxt - time.perf_counter()
+            if delay > 0: time.sleep(delay)
+
+    lat = []
+    q = bridge.queues['kpi']
+    async def consume():
+        while True:
+            env = await q.get()
+            lat.append(time.perf_counter() - env.ts)
+
+    ctask = asyncio.create_task(consume())
+    prod = threading.Thread(target=produce, daemon=True)
+    c0 = time.process_time()
+    prod.start()
+    await asyncio.sleep(seconds)
+    stop.set()
+    prod.join()
+    await asyncio.sleep(0.1)
+    load_cpu = time.process_time() - c0
+    ctask.cancel()
+    await bridge.stop()
+
+    ms = [x * 1000.0 for x in lat]
+    return {
+        'mode': mode, 'messages': len(ms),
+        'latency_ms': {'mean': statistics.fmean(ms) if ms else float('nan'),
+                       'p50': _pct(ms, 50), 'p99': _pct(ms, 99), 'max': max(ms, default=float('nan'))},
+        'idle_cpu_pct': 100.0 * idle_cpu / idle,
+        'load_cpu_pct': 100.0 * load_cpu / (seconds + 0.1),
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--rate', type=float, default=200.0, help='messages per second')
+    ap.add_argument('--seconds', type=float, default=3.0)
+    ap.add_argument('--idle', type=float, default=2.0)
+    a = ap.parse_args()
+    results = [asyncio.run(run_mode(m, a.rate, a.seconds, a.idle)) for m in ('poll', 'push')]
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
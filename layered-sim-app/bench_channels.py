@@ -0,0 +1,44 @@
+"""Microbenchmark: put/drain cost per channel policy, queue.Queue backend vs the ring/latest backends.
+
+    python bench_channels.py [--n 200000] [--maxsize 1000]
+
+'put_full_ns' is the steady state of a bounded telemetry channel: every put has to evict the oldest item.
+"""
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import argparse, json, time
+from infrastructure.bus.channels import ChannelConfig, make_channel
+
+def bench(policy: str, maxsize: int, backend: str, n: int) -> dict:
+    ch = make_channel(ChannelConfig('bench', maxsize=maxsize, policy=policy, backend=backend))
+    put = ch.put
+    for i in range(maxsize): put(i)
+
+    t0 = time.perf_counter()
+    for i in range(n): put(i)
+    put_ns = (time.perf_counter() - t0) * 1e9 / n
+
+    drained = 0
+    t0 = time.perf_counter()
+    for _ in range(max(1, n // maxsize)):
+        for i in range(maxsize): put(i)
+        drained += len(ch.drain_batch())
+    dt = time.perf_counter() - t0
+    return {'policy': policy, 'maxsize': maxsize, 'backend': type(ch).__name__,
+            'put_full_ns': round(put_ns, 1), 'fill_and_drain_ns_per_item': round(dt * 1e9 / max(1, drained), 1),
+            'overwrites': ch.overwrites}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--n', type=int, default=200_000)
+    ap.add_argument('--maxsize', type=int, default=1000)
+    a = ap.parse_args()
+    rows = []
+    for policy, maxsize in (('drop_old', a.maxsize), ('latest', 1), ('latest', a.maxsize)):
+        for backend in ('queue', 'auto'):
+            rows.append(bench(policy, maxsize, backend, a.n))
+    print(json.dumps(rows, indent=2))
+
+if __name__ == '__main__':
+    main()
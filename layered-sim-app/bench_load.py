@@ -0,0 +1,200 @@
+"""Load test: synthetic high-rate source -> Controller -> bus -> WebSocket server -> N clients, all on localhost.
+
+    python bench_load.py [--topics kpi:2000:64,pose:500:256] [--clients 4] [--client-procs] [--seconds 5]
+                         [--controllers thread,process] [--policies drop_old,latest,block] [--bridges push,poll]
+                         [--out results.json]
+
+One run per (controller mode, channel policy, bridge mode). `--topics` is topic:rate_hz:payload_bytes. The
+source stamps Envelope.ts with time.time() and clients record time.time() - ts on receipt, so latency covers
+the controller, channel, bridge, fan-out, encoding and the socket. Clients run as one asyncio thread
+(default) or one subprocess each (`--client-procs`). CPU is per component over the measured window (thread
+and /proc clocks, so Linux only; null elsewhere). Bus metrics are attached for drop and dwell counts, as
+with `run_server.py --metrics`. This Controller publishes every topic through the 'kpi' channel;
+'latest' runs use a single-slot channel. Output has the same shape as py-multi-mode-app/bench_load.py.
+"""
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import argparse, asyncio, functools, json, platform, subprocess, threading, time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import websockets
+from domain.messages import Envelope
+from infrastructure.bus.async_bridge import AsyncBridge
+from infrastructure.bus.channels import ChannelRegistry, ChannelConfig
+from infrastructure.bus.commands import CommandIngress
+from infrastructure.bus.metrics import BusMetrics, Histogram
+from presentation.controller_host import start_controller
+from presentation.server.websocket_app import run_server
+
+TopicSpec = Tuple[str, float, int]   # (topic, rate Hz, payload bytes)
+
+class LoadExternal:
+    """ExternalProcess that emits each topic at its own rate with a payload of about `size` bytes.
+
+    poll() returns the next envelope of the most overdue topic, or None when nothing is due, so the
+    Controller must poll at least at the summed topic rate. A topic that falls behind keeps at most one
+    period of backlog, like the Scheduler's 'skip'.
+    """
+    def __init__(self, spec: List[TopicSpec]):
+        self._period = {t: 1.0 / hz for t, hz, _ in spec}
+        self._blob = {t: 'x' * size for t, _, size in spec}
+        self._due = {t: 0.0 for t, _, _ in spec}
+        self._seq = 0
+
+    def poll(self) -> Optional[Envelope]:
+        now = time.monotonic()
+        topic = min(self._due, key=self._due.__getitem__)
+        due = self._due[topic]
+        if due > now: return None
+        self._due[topic] = max(due + self._period[topic], now - self._period[topic])
+        self._seq += 1
+        return Envelope(topic=topic, payload={'seq': self._seq, 'blob': self._blob[topic]}, ts=time.time())
+
+def _parse_topics(text: str) -> List[TopicSpec]:
+    spec = []
+    for item in text.split(','):
+        topic, hz, size = item.split(':')
+        spec.append((topic, float(hz), int(size)))
+    return spec
+
+def _thread_cpu(name: str) -> Optional[float]:
+    for t in threading.enumerate():
+        if t.name == name and t.ident is not None:
+            try: return time.clock_gettime(time.pthread_getcpuclockid(t.ident))
+            except (AttributeError, OSError): return None
+    return None
+
+def _proc_cpu(pid: Optional[int]) -> Optional[float]:
+    # utime + stime of another process (fields 14 and 15 of /proc/<pid>/stat).
+    if pid is None: return None
+    try:
+        with open(f'/proc/{pid}/stat') as f: fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError): return None
+
+def _pct(c0: Optional[float], c1: Optional[float], seconds: float) -> Optional[float]:
+    return None if c0 is None or c1 is None else 100.0 * (c1 - c0) / seconds
+
+async def _client(url: str, t_start: float, t_end: float, hist: Histogram) -> int:
+    n = 0
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.recv()   # hello
+        while True:
+            left = t_end - time.time()
+            if left <= 0: break
+            try: msg = await asyncio.wait_for(ws.recv(), left)
+            except asyncio.TimeoutError: break
+            now = time.time()
+            if now < t_start: continue
+            ts = json.loads(msg).get('ts')
+            if ts is None: continue   # snapshot / control
+            hist.record(now - ts)
+            n += 1
+    return n
+
+def _run_clients(url: str, n: int, t_start: float, t_end: float, clock: Callable[[], float]) -> Dict[str, Any]:
+    """N clients on one event loop; CPU is `clock` over [t_start, t_end]."""
+    hist = Histogram()
+    cpu: List[float] = []
+    async def go():
+        loop = asyncio.get_running_loop()
+        loop.call_later(max(0.0, t_start - time.time()), lambda: cpu.append(clock()))
+        counts = await asyncio.gather(*(_client(url, t_start, t_end, hist) for _ in range(n)))
+        cpu.append(clock())
+        return sum(counts)
+    received = asyncio.run(go())
+    return {'received': received, 'hist': hist.state(), 'cpu_s': cpu[-1] - cpu[0] if len(cpu) == 2 else None}
+
+async def run(spec: List[TopicSpec], controller: str, policy: str, bridge_mode: str, clients: int,
+              client_procs: bool, seconds: float, maxsize: int, port: int) -> Dict[str, Any]:
+    reg = ChannelRegistry([ChannelConfig('kpi', maxsize=1 if policy == 'latest' else maxsize, policy=policy),
+                           ChannelConfig('setup', maxsize=64, policy='priority')])
+    metrics = BusMetrics().attach(reg)
+    hz = sum(r for _, r, _ in spec)
+    host = start_controller(reg, controller, external_factory=functools.partial(LoadExternal, spec),
+                            rates={'external': hz})
+    bridge = AsyncBridge(reg, mode=bridge_mode, topics=['kpi'])
+    bridge.start()
+    server, btask, fanout = await run_server(bridge, CommandIngress(reg.channel('setup')).submit, metrics=metrics, port=port)
+
+    url = f'ws://127.0.0.1:{port}/'
+    t_start = time.time() + (2.0 if client_procs or controller == 'process' else 0.5)   # connect / spawn
+    t_end = t_start + seconds
+    window = [repr(t_start), repr(t_end)]
+    if client_procs:
+        procs = [subprocess.Popen([sys.executable, __file__, '--client', url, *window], stdout=subprocess.PIPE)
+                 for _ in range(clients)]
+        collect = lambda: [json.loads(p.communicate()[0]) for p in procs]
+    else:
+        out: List[Dict[str, Any]] = []
+        th = threading.Thread(target=lambda: out.append(_run_clients(url, clients, t_start, t_end, time.thread_time)),
+                              name='BenchClients', daemon=True)
+        th.start()
+        collect = lambda: (th.join(), out)[1]
+
+    ctl_cpu = (lambda: _thread_cpu('ControllerThread')) if controller == 'thread' else (lambda: _proc_cpu(host.pid))
+    await asyncio.sleep(t_start - time.time())
+    r0 = metrics.report()   # interval histograms restart here
+    cpu0 = {'controller': ctl_cpu(), 'server': time.thread_time(), 'process': time.process_time()}
+    await asyncio.sleep(t_end - time.time())
+    r1 = metrics.report()
+    cpu1 = {'controller': ctl_cpu(), 'server': time.thread_time(), 'process': time.process_time()}
+    client_drops = sum(s['dropped'] for s in fanout.stats().values())
+    results = await asyncio.get_running_loop().run_in_executor(None, collect)
+
+    btask.cancel()
+    await fanout.close()
+    server.close()
+    await server.wait_closed()
+    await bridge.stop()
+    host.stop()
+
+    hist = Histogram()
+    for r in results: hist.merge(r['hist'])
+    c0, c1 = r0['channels']['kpi'], r1['channels']['kpi']
+    client_cpu = [r['cpu_s'] for r in results]
+    cpu = {k: _pct(cpu0[k], cpu1[k], seconds) for k in cpu0}
+    cpu['clients'] = None if None in client_cpu else 100.0 * sum(client_cpu) / seconds
+    return {'controller': controller, 'policy': policy, 'bridge': bridge_mode, 'clients': clients,
+            'client_procs': client_procs,
+            'source_hz': {'target': hz, 'achieved': (c1['puts'] - c0['puts']) / seconds},
+            'throughput_hz': sum(r['received'] for r in results) / seconds,   # summed over clients
+            'latency_ms': hist.summary(),
+            'server_e2e_ms': r1['e2e'].get('ws'),   # Envelope.ts -> send() done, server side
+            'dwell_ms': {'kpi': c1['dwell']},
+            'drops': {'channel': c1['drops'] - c0['drops'], 'clients': client_drops},
+            'cpu_pct': cpu}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--topics', default='kpi:2000:64,pose:500:256', help='topic:rate_hz:payload_bytes,...')
+    ap.add_argument('--clients', type=int, default=4)
+    ap.add_argument('--client-procs', action='store_true', help='run each client in its own process')
+    ap.add_argument('--seconds', type=float, default=5.0)
+    ap.add_argument('--controllers', default='thread,process')
+    ap.add_argument('--policies', default='drop_old,latest,block')
+    ap.add_argument('--bridges', default='push,poll')
+    ap.add_argument('--maxsize', type=int, default=1000, help="channel size for non-'latest' policies")
+    ap.add_argument('--port', type=int, default=8799)
+    ap.add_argument('--out', help='also write the JSON to this file')
+    ap.add_argument('--client', nargs=3, metavar=('URL', 'T_START', 'T_END'), help=argparse.SUPPRESS)
+    a = ap.parse_args()
+    if a.client:
+        url, t0, t1 = a.client
+        print(json.dumps(_run_clients(url, 1, float(t0), float(t1), time.process_time)))
+        return
+    spec = _parse_topics(a.topics)
+    runs = [asyncio.run(run(spec, c, p, b, a.clients, a.client_procs, a.seconds, a.maxsize, a.port))
+            for c in a.controllers.split(',') for p in a.policies.split(',') for b in a.bridges.split(',')]
+    doc = {'variant': 'layered-sim-app', 'python': platform.python_version(), 'platform': platform.platform(),
+           'config': {'topics': [{'topic': t, 'rate_hz': hz, 'payload_bytes': n} for t, hz, n in spec],
+                      'clients': a.clients, 'client_procs': a.client_procs, 'seconds': a.seconds,
+                      'maxsize': a.maxsize},
+           'runs': runs}
+    text = json.dumps(doc, indent=2)
+    if a.out:
+        with open(a.out, 'w') as f: f.write(text + '\n')
+    print(text)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""End-to-end latency and throughput of the Controller in 'thread' vs 'process' mode.
+
+    python bench_process.py [--rate 1000] [--seconds 3]
+
+Latency is time.time() at the consumer minus Envelope.ts stamped by the external source (wall clock,
+so it is comparable across processes). Throughput runs the source as fast as the scheduler allows.
+"""
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import argparse, json, queue, time
+from typing import Optional
+from domain.messages import Envelope, Telemetry
+from infrastructure.bus.channels import ChannelRegistry, ChannelConfig
+from presentation.controller_host import start_controller
+
+class BenchExternal:
+    def __init__(self): self._seq = 0
+    def poll(self) -> Optional[Envelope]:
+        self._seq += 1
+        return Envelope(topic='kpi', payload=Telemetry(source='bench', value=float(self._seq)), ts=time.time())
+
+def _pct(xs, p):
+    if not xs: return float('nan')
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p / 100.0 * len(xs)))]
+
+def run(mode: str, rate: float, seconds: float) -> dict:
+    reg = ChannelRegistry([ChannelConfig('kpi', maxsize=100_000, policy='drop_old'),
+                           ChannelConfig('setup', maxsize=10, policy='block')])
+    host = start_controller(reg, mode, external_factory=BenchExternal, rates={'external': rate})
+    ch = reg.channel('kpi')
+    lat, n = [], 0
+    try: ch.get(timeout=10.0)   # wait for the first message (process start-up)
+    except queue.Empty: pass
+    t_end = time.monotonic() + seconds
+    t0 = time.monotonic()
+    while time.monotonic() < t_end:
+        try: env = ch.get(timeout=0.1)
+        except queue.Empty: continue
+        lat.append(time.time() - env.ts)
+        n += 1
+    elapsed = time.monotonic() - t0
+    host.stop()
+    ms = [x * 1e3 for x in lat]
+    return {'mode': mode, 'target_hz': rate, 'received': n, 'throughput_hz': n / elapsed,
+            'latency_ms': {'p50': _pct(ms, 50), 'p99': _pct(ms, 99), 'max': max(ms, default=float('nan'))},
+            'dropped': ch.overwrites}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--rate', type=float, default=1000.0, help='source rate for the latency run (Hz)')
+    ap.add_argument('--seconds', type=float, default=3.0)
+    a = ap.parse_args()
+    results = []
+    for mode in ('thread', 'process'):
+        results.append(run(mode, a.rate, a.seconds))
+        results.append(run(mode, 1e6, a.seconds))   # saturate: as fast as the scheduler can tick
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,39 @@
+import sys, os, json, argparse
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 import asyncio, websockets
+from infrastructure.bus.wire import decode_frame
 
-async def main():
-    async with websockets.connect("ws://127.0.0.1:8765") as ws:
+async def main(binary: bool, count: int, history: float, delta: bool, rate: str = ''):
+    # history > 0 asks for the last `history` seconds per topic in the join snapshot instead of the last value
+    url = f"ws://127.0.0.1:8765/?history={history:g}" + (f'&rate={rate}' if rate else '')
+    async with websockets.connect(url) as ws:
         print(await ws.recv())  # hello
-        for _ in range(5):
-            print(await ws.recv())
-asyncio.run(main())
\ No newline at end of file
+        if binary: await ws.send(json.dumps({'cmd': 'format', 'format': 'binary'}))
+        elif delta: await ws.send(json.dumps({'cmd': 'format', 'format': 'json', 'delta': True}))
+        keyframes = {}   # (topic, seq) -> payload of an acknowledged keyframe; a delta names its own in 'base'
+        current = {}     # (topic, source) -> seq of its latest keyframe, whose predecessor is no longer needed
+        for _ in range(count):
+            msg = await ws.recv()
+            if isinstance(msg, bytes):
+                for env in decode_frame(msg): print(env)
+                continue
+            env = json.loads(msg)
+            if env.get('key'):
+                # Acknowledge keyframes (one per topic and source, see delta.py) so the server may send deltas.
+                src = (env['topic'], env['payload'].get('source'))
+                keyframes.pop((env['topic'], current.get(src)), None)
+                current[src] = env['seq']
+                keyframes[(env['topic'], env['seq'])] = env['payload']
+                await ws.send(json.dumps({'cmd': 'ack', 'topic': env['topic'], 'seq': env['seq']}))
+            elif 'base' in env:
+                env['payload'] = {**keyframes[(env['topic'], env['base'])], **env.pop('delta')}
+            print(env)
+
+ap = argparse.ArgumentParser()
+ap.add_argument('--binary', action='store_true', help='negotiate the columnar binary wire format')
+ap.add_argument('--history', type=float, default=0.0, help='seconds of recent history to receive on join')
+ap.add_argument('--delta', action='store_true', help='receive delta topics as keyframes plus deltas')
+ap.add_argument('--rate', metavar='SPEC', help='cap topics per second, e.g. kpi:2:mean,kpi_agg:1 (reducers: latest, mean, minmax)')
+ap.add_argument('-n', '--count', type=int, default=5)
+a = ap.parse_args()
+asyncio.run(main(a.binary, a.count, a.history, a.delta, a.rate or ''))
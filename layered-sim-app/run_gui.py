@@ -1,6 +1,6 @@
 import sys, os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
-from presentation.gui.main_gui import main
+from presentation.launcher import main
 
 if __name__ == '__main__':
-    main()
+    main(mode='gui')   # same options as run.py; --mode defaults to gui
@@ -0,0 +1,170 @@
+from __future__ import annotations
+import math, time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple
+from domain.messages import Envelope, KpiAggregate, Telemetry
+from .ports import EventPublisher, publish_batch
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+class QuantileSketch:
+    """Log-bucketed value counts (DDSketch style): O(1) add and remove, quantiles within `rel_err`.
+
+    A value v > 0 lands in bucket ceil(log_gamma(v)) with gamma = (1 + rel_err) / (1 - rel_err), negative
+    values mirror that, and |v| below `min_abs` counts as zero. The bucket count grows with the
+    logarithm of the value range, not with the number of samples.
+    """
+    def __init__(self, rel_err: float = 0.01, min_abs: float = 1e-9):
+        self.gamma = (1 + rel_err) / (1 - rel_err)
+        self._log_gamma = math.log(self.gamma)
+        self.min_abs = min_abs
+        self._pos: Dict[int, int] = {}
+        self._neg: Dict[int, int] = {}
+        self._zero = 0
+        self.count = 0
+
+    def _bucket(self, v: float) -> Tuple[Optional[Dict[int, int]], int]:
+        if abs(v) < self.min_abs: return None, 0
+        return (self._pos if v > 0 else self._neg), math.ceil(math.log(abs(v)) / self._log_gamma)
+
+    def add(self, v: float, n: int = 1) -> None:
+        buckets, k = self._bucket(v)
+        self.count += n
+        if buckets is None:
+            self._zero += n
+            return
+        c = buckets.get(k, 0) + n
+        if c: buckets[k] = c
+        else: del buckets[k]
+
+    def remove(self, v: float) -> None:
+        self.add(v, -1)
+
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        """One ordered walk over the buckets (O(buckets log buckets)), answered for all `qs` at once."""
+        out = [math.nan] * len(qs)
+        if not self.count: return out
+        g = self.gamma
+        ordered = [(-2 * g ** k / (g + 1), self._neg[k]) for k in sorted(self._neg, reverse=True)]
+        if self._zero: ordered.append((0.0, self._zero))
+        ordered += [(2 * g ** k / (g + 1), self._pos[k]) for k in sorted(self._pos)]
+        seen, i = 0, 0
+        for j in sorted(range(len(qs)), key=qs.__getitem__):
+            rank = qs[j] * (self.count - 1)
+            while i < len(ordered) - 1 and seen + ordered[i][1] <= rank:
+                seen += ordered[i][1]
+                i += 1
+            out[j] = ordered[i][0]
+        return out
+
+    def clear(self) -> None:
+        self._pos.clear(); self._neg.clear()
+        self._zero = self.count = 0
+
+class RollingWindow:
+    """Samples of the last `span_s` seconds (or since the last clear) with O(1) amortized add and evict.
+
+    Mean and variance come from running sums shifted by the first value (to limit cancellation), min and
+    max from monotonic deques, quantiles from a QuantileSketch that evicted samples are removed from.
+    """
+    def __init__(self, span_s: float, rel_err: float = 0.01):
+        self.span_s = span_s
+        self.sketch = QuantileSketch(rel_err)
+        self._items: Deque[Tuple[int, float, float]] = deque()   # (seq, ts, value)
+        self._min: Deque[Tuple[int, float]] = deque()
+        self._max: Deque[Tuple[int, float]] = deque()
+        self._seq = 0
+        self._shift = 0.0
+        self._s1 = 0.0
+        self._s2 = 0.0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, ts: float, v: float) -> None:
+        if not self._items: self._shift = v
+        self._seq += 1
+        d = v - self._shift
+        self._s1 += d
+        self._s2 += d * d
+        self._items.append((self._seq, ts, v))
+        while self._min and self._min[-1][1] >= v: self._min.pop()
+        self._min.append((self._seq, v))
+        while self._max and self._max[-1][1] <= v: self._max.pop()
+        self._max.append((self._seq, v))
+        self.sketch.add(v)
+
+    def evict(self, before: float) -> None:
+        items = self._items
+        while items and items[0][1] < before:
+            seq, _, v = items.popleft()
+            d = v - self._shift
+            self._s1 -= d
+            self._s2 -= d * d
+            if self._min[0][0] == seq: self._min.popleft()
+            if self._max[0][0] == seq: self._max.popleft()
+            self.sketch.remove(v)
+        if not items: self.clear()
+
+    def clear(self) -> None:
+        self._items.clear(); self._min.clear(); self._max.clear()
+        self.sketch.clear()
+        self._s1 = self._s2 = 0.0
+
+    def summary(self, source: str, window: str) -> Optional[KpiAggregate]:
+        n = len(self._items)
+        if not n: return None
+        m1 = self._s1 / n
+        var = max(0.0, self._s2 / n - m1 * m1)
+        dt = self._items[-1][1] - self._items[0][1]
+        p50, p90, p99 = self.sketch.quantiles(QUANTILES)
+        return KpiAggregate(source=source, window=window, span_s=self.span_s, count=n,
+                            rate_hz=(n - 1) / dt if dt > 0 else 0.0, mean=self._shift + m1, std=math.sqrt(var),
+                            min=self._min[0][1], max=self._max[0][1], p50=p50, p90=p90, p99=p99)
+
+class KpiAggregator:
+    """Pipeline stage between the Controller and its EventPublisher that derives 'kpi_agg' from 'kpi'.
+
+    Every envelope is forwarded to `downstream` unchanged; Telemetry payloads are also folded, per
+    `Telemetry.source`, into a sliding window of `window_s` seconds and a tumbling window that restarts on
+    every flush. The Controller calls `flush()` every `interval_s` (see the PipelineStage port), which
+    publishes one 'tumbling' and then one 'sliding' KpiAggregate per active source to `out`. A source with
+    no sample in the last `window_s` seconds is dropped until it reports again.
+    """
+    def __init__(self, downstream: EventPublisher, out: EventPublisher, window_s: float = 10.0,
+                 interval_s: float = 1.0, rel_err: float = 0.01, clock: Callable[[], float] = time.time):
+        self.downstream = downstream
+        self.out = out
+        self.window_s = window_s
+        self.interval_s = interval_s
+        self.rel_err = rel_err
+        self.clock = clock
+        self._sources: Dict[str, Tuple[RollingWindow, RollingWindow]] = {}
+
+    def publish(self, env: Envelope) -> None:
+        self.downstream.publish(env)
+        self._fold(env)
+
+    def publish_batch(self, envs: Sequence[Envelope]) -> None:
+        publish_batch(self.downstream, envs)
+        for env in envs: self._fold(env)
+
+    def _fold(self, env: Envelope) -> None:
+        p = env.payload
+        if not isinstance(p, Telemetry): return
+        windows = self._sources.get(p.source)
+        if windows is None:
+            windows = self._sources[p.source] = (RollingWindow(self.window_s, self.rel_err),
+                                                 RollingWindow(self.interval_s, self.rel_err))
+        for w in windows: w.add(env.ts, p.value)
+
+    def flush(self) -> None:
+        now = self.clock()
+        for source, (sliding, tumbling) in list(self._sources.items()):
+            sliding.evict(now - self.window_s)
+            if not sliding and not tumbling:
+                del self._sources[source]; continue
+            for kind, w in (('tumbling', tumbling), ('sliding', sliding)):
+                agg = w.summary(source, kind)
+                if agg is not None: self.out.publish(Envelope(topic='kpi_agg', payload=agg, ts=now))
+            tumbling.clear()
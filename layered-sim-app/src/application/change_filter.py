@@ -0,0 +1,54 @@
+from __future__ import annotations
+from typing import Any, Dict, Sequence, Tuple
+from domain.messages import Envelope, as_dict
+from .ports import EventPublisher, publish_batch
+
+class ChangeFilter:
+    """EventPublisher in front of `downstream` that drops envelopes whose payload barely moved since the last
+    one it let through.
+
+    `eps` maps topic -> {field: epsilon}. A numeric field counts as changed when it differs from the last
+    published value by more than its epsilon (0 for fields not listed); other fields when they are unequal.
+    Topics not in `eps` always pass. Comparison is against the last *published* payload, so slow drift is
+    still published once it adds up, and one envelope per `max_interval_s` passes regardless as a heartbeat.
+    Payloads with a 'source' field are tracked per source.
+    """
+    def __init__(self, downstream: EventPublisher, eps: Dict[str, Dict[str, float]], max_interval_s: float = 1.0):
+        self.downstream = downstream
+        self.eps = eps
+        self.max_interval_s = max_interval_s
+        self.passed = 0
+        self.suppressed = 0
+        self._last: Dict[Tuple[str, Any], Tuple[float, Dict[str, Any]]] = {}
+
+    def publish(self, env: Envelope) -> None:
+        if self.admit(env): self.downstream.publish(env)
+
+    def publish_batch(self, envs: Sequence[Envelope]) -> None:
+        publish_batch(self.downstream, [env for env in envs if self.admit(env)])
+
+    def admit(self, env: Envelope) -> bool:
+        """True if `env` should be published; records it as the new reference if so."""
+        eps = self.eps.get(env.topic)
+        if eps is None: return True
+        d = as_dict(env.payload)
+        key = (env.topic, d.get('source'))
+        last = self._last.get(key)
+        if last is not None and env.ts - last[0] < self.max_interval_s and not _changed(d, last[1], eps):
+            self.suppressed += 1
+            return False
+        self._last[key] = (env.ts, d)
+        self.passed += 1
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {'passed': self.passed, 'suppressed': self.suppressed}
+
+def _changed(new: Dict[str, Any], old: Dict[str, Any], eps: Dict[str, float]) -> bool:
+    if new.keys() != old.keys(): return True
+    for k, v in new.items():
+        prev = old[k]
+        if isinstance(v, (int, float)) and isinstance(prev, (int, float)):
+            if abs(v - prev) > eps.get(k, 0.0): return True
+        elif v != prev: return True
+    return False
@@ -1,17 +1,35 @@
 from __future__ import annotations
 import threading, time
-from typing import Optional
-from .ports import EventPublisher, CommandInbox, ExternalProcess
-from domain.messages import Envelope
+from typing import Any, Dict, Iterable, List, Optional
+from .ports import EventPublisher, CommandInbox, ExternalProcess, PipelineStage, publish_batch
+from .scheduler import Scheduler
+from domain.messages import Command, CommandResult, Envelope
 
 class Controller:
-    def __init__(self, events: EventPublisher, commands: CommandInbox, external: ExternalProcess, period_sec: float = 0.05):
+    def __init__(self, events: EventPublisher, commands: CommandInbox, external: ExternalProcess, period_sec: float = 0.05,
+                 rates: Optional[Dict[str, float]] = None, overrun: str = 'skip', stages: Iterable[PipelineStage] = (),
+                 results: Optional[EventPublisher] = None):
         self.events = events
         self.commands = commands
         self.external = external
+        self._poll_batch = getattr(external, 'poll_batch', None)   # BatchExternalProcess: one call per tick
+        self.results = results   # 'setup_ack' CommandResults; None drops them
         self.period = period_sec
+        self.halted = False   # set by 'estop': the external source is not polled until 'resume'
+        self.settings: Dict[str, Any] = {}
         self._stop = threading.Event()
         self._thread: Optional[threading.Thread] = None
+        # Each source ticks on its own absolute deadlines; `rates` (Hz) overrides the default of 1/period_sec.
+        r = {'commands': 1.0 / period_sec, 'external': 1.0 / period_sec, **(rates or {})}
+        self.scheduler = Scheduler(overrun=overrun)
+        self.scheduler.add('commands', r['commands'], self._drain_commands)
+        self.scheduler.add('external', r['external'], self._poll_external)
+        # Stages (e.g. KpiAggregator) sit in the publish path; their periodic output runs on the same loop,
+        # named after the class, with the stage's index appended when an earlier stage has that class too.
+        for i, stage in enumerate(stages):
+            name = type(stage).__name__
+            if any(task.name == name for task in self.scheduler.tasks): name = f'{name}.{i}'
+            self.scheduler.add(name, 1.0 / stage.interval_s, stage.flush)
 
     def start(self) -> None:
         if self._thread and self._thread.is_alive(): return
@@ -21,15 +39,57 @@ class Controller:
     def stop(self) -> None:
         self._stop.set()
         if self._thread: self._thread.join(timeout=2.0)
+        close = getattr(self.external, 'close', None)
+        if close is not None: close()
+
+    def loop_stats(self) -> Dict[str, Dict[str, float]]:
+        return self.scheduler.stats()
 
     def _run(self) -> None:
-        while not self._stop.is_set():
-            for env in self.commands.drain():
-                self._handle_command(env)
-            env = self.external.poll()
-            if env is not None:
-                self.events.publish(env)
-            time.sleep(self.period)
-
-    def _handle_command(self, env: Envelope) -> None:
-        pass
+        self.scheduler.run(self._stop)
+
+    def _drain_commands(self) -> None:
+        batch = list(self.commands.drain())
+        if batch: self._handle_commands(batch)
+
+    def _poll_external(self) -> None:
+        if self.halted: return
+        if self._poll_batch is not None:
+            publish_batch(self.events, self._poll_batch())   # one channel put per tick where supported
+            return
+        env = self.external.poll()
+        if env is not None:
+            self.events.publish(env)
+
+    def _handle_commands(self, batch: List[Envelope]) -> None:
+        """Applies one tick's commands in drain order (urgent first, already coalesced) and answers every
+        request folded into each with a CommandResult: the newest origin is the request that ran, the older
+        ones it replaced are 'superseded'."""
+        for env in batch:
+            cmd = env.payload
+            if not isinstance(cmd, Command): continue
+            try:
+                self._apply(cmd)
+                ok, error = True, None
+            except (KeyError, TypeError, ValueError) as e:
+                ok, error = False, str(e)
+            if self.results is None: continue
+            n, (last_client, ran) = len(cmd.origins), cmd.origins[-1]
+            results = [CommandResult(cid, client, cmd.cmd, 'superseded', True, None, n, by=ran)
+                       for client, cid in cmd.origins[:-1]]
+            results.append(CommandResult(ran, last_client, cmd.cmd, 'applied' if ok else 'failed', ok, error, n))
+            for result in results: self.results.publish(Envelope(topic='setup_ack', payload=result, ts=time.time()))
+
+    def _apply(self, cmd: Command) -> None:
+        if cmd.cmd == 'estop': self.halted = True
+        elif cmd.cmd == 'resume': self.halted = False
+        elif cmd.cmd == 'set' and cmd.name.startswith('rate_hz.'):
+            # Retime a scheduled source, e.g. {"cmd": "set", "name": "rate_hz.external", "value": 50}.
+            source = cmd.name[len('rate_hz.'):]
+            task = next((t for t in self.scheduler.tasks if t.name == source), None)
+            if task is None: raise KeyError(f'no scheduled source {source!r}')
+            hz = float(cmd.value)
+            if hz <= 0: raise ValueError('rate must be > 0')
+            task.period = 1.0 / hz
+        elif cmd.cmd == 'set': self.settings[cmd.name] = cmd.value
+        else: raise ValueError(f'unknown command: {cmd.cmd!r}')
@@ -1,12 +1,33 @@
 from __future__ import annotations
-from typing import Protocol, Iterable, Optional
+from typing import Protocol, Iterable, List, Optional, Sequence
 from domain.messages import Envelope
 
 class EventPublisher(Protocol):
     def publish(self, env: Envelope) -> None: ...
 
+class BatchEventPublisher(EventPublisher, Protocol):
+    """An EventPublisher that takes a whole tick's envelopes in one call (one channel operation)."""
+    def publish_batch(self, envs: Sequence[Envelope]) -> None: ...
+
 class CommandInbox(Protocol):
     def drain(self) -> Iterable[Envelope]: ...
 
 class ExternalProcess(Protocol):
     def poll(self) -> Optional[Envelope]: ...
+
+class BatchExternalProcess(ExternalProcess, Protocol):
+    """An ExternalProcess that can hand over everything it has buffered at once, oldest first, without
+    blocking; the Controller prefers poll_batch() when present and calls close(), if defined, on stop."""
+    def poll_batch(self) -> List[Envelope]: ...
+
+class PipelineStage(EventPublisher, Protocol):
+    """An EventPublisher that also emits on its own cadence: the Controller calls flush() every interval_s."""
+    interval_s: float
+    def flush(self) -> None: ...
+
+def publish_batch(events: EventPublisher, envs: Sequence[Envelope]) -> None:
+    """`events.publish_batch(envs)` where supported, else one publish() per envelope."""
+    batch = getattr(events, 'publish_batch', None)
+    if batch is not None: batch(envs)
+    else:
+        for env in envs: events.publish(env)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+import threading, time
+from collections import deque
+from typing import Callable, Deque, Dict, List
+
+OVERRUN_POLICIES = ('skip', 'catch_up')
+
+def _pct(sorted_xs: List[float], p: float) -> float:
+    if not sorted_xs: return 0.0
+    return sorted_xs[min(len(sorted_xs) - 1, int(p / 100.0 * len(sorted_xs)))]
+
+class RateTask:
+    def __init__(self, name: str, rate_hz: float, fn: Callable[[], None], window: int = 1024):
+        if rate_hz <= 0: raise ValueError(f'rate for {name!r} must be > 0')
+        self.name = name
+        self.period = 1.0 / rate_hz
+        self.fn = fn
+        self.deadline = 0.0
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.behind = 0   # consecutive overrun ticks, bounds catch-up bursts
+        self._starts: Deque[float] = deque(maxlen=window)
+        self._late: Deque[float] = deque(maxlen=window)
+
+    def mark_start(self, start: float) -> None:
+        self._late.append(start - self.deadline)
+        self._starts.append(start)
+        self.ticks += 1
+
+    def stats(self) -> Dict[str, float]:
+        starts = self._starts
+        span = starts[-1] - starts[0] if len(starts) > 1 else 0.0
+        late = sorted(self._late)
+        return {'rate_hz': 1.0 / self.period, 'achieved_hz': (len(starts) - 1) / span if span > 0 else 0.0,
+                'jitter_p50_ms': _pct(late, 50) * 1e3, 'jitter_p99_ms': _pct(late, 99) * 1e3,
+                'jitter_max_ms': (late[-1] if late else 0.0) * 1e3,
+                'ticks': self.ticks, 'overruns': self.overruns, 'skipped': self.skipped}
+
+class Scheduler:
+    """Runs tasks on absolute monotonic deadlines (deadline += period), so work time never stretches the rate.
+
+    A task overruns when it is still busy at its next deadline. 'skip' drops the missed ticks and realigns
+    to the period grid; 'catch_up' runs the missed ticks back to back, at most `max_catch_up` in a row,
+    after which it realigns like 'skip'. Jitter is how late each tick started relative to its deadline.
+    """
+    def __init__(self, overrun: str = 'skip', max_catch_up: int = 5, clock: Callable[[], float] = time.monotonic):
+        if overrun not in OVERRUN_POLICIES: raise ValueError(f'unknown overrun policy: {overrun!r}')
+        self.overrun = overrun
+        self.max_catch_up = max_catch_up
+        self.clock = clock
+        self.tasks: List[RateTask] = []
+
+    def add(self, name: str, rate_hz: float, fn: Callable[[], None]) -> RateTask:
+        # Names key stats(), so a second task under a taken name would hide the first one's numbers.
+        if any(t.name == name for t in self.tasks): raise ValueError(f'duplicate task name: {name!r}')
+        task = RateTask(name, rate_hz, fn)
+        self.tasks.append(task)
+        return task
+
+    def run(self, stop: threading.Event) -> None:
+        if not self.tasks: return
+        t0 = self.clock()
+        for task in self.tasks: task.deadline = t0
+        while not stop.is_set():
+            nxt = min(t.deadline for t in self.tasks)
+            delay = nxt - self.clock()
+            if delay > 0 and stop.wait(delay): break
+            for task in self.tasks:
+                if task.deadline <= self.clock(): self._tick(task)
+
+    def _tick(self, task: RateTask) -> None:
+        task.mark_start(self.clock())
+        task.fn()
+        task.deadline += task.period
+        now = self.clock()
+        if task.deadline > now:
+            task.behind = 0
+            return
+        task.overruns += 1
+        task.behind += 1
+        if self.overrun == 'catch_up' and task.behind <= self.max_catch_up: return
+        missed = int((now - task.deadline) // task.period) + 1
+        task.skipped += missed
+        task.deadline += missed * task.period
+        task.behind = 0
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {t.name: t.stats() for t in self.tasks}
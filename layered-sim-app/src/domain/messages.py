@@ -1,35 +1,110 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Any, Literal, TypedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Literal, Optional, Tuple
 
-Topic = Literal['visual_frame','thermal_frame','lidar_frame','kpi','detections','pose','setup','visual_image_msg','thermal_image_msg','lidar_image_msg']
+Topic = Literal['visual_frame','thermal_frame','lidar_frame','kpi','kpi_agg','detections','pose','setup','visual_image_msg','thermal_image_msg','lidar_image_msg','metrics','setup_ack']
 
-class Telemetry(TypedDict):
-    source: str
-    value: float
+class Message:
+    """Slotted payload base. Fields are plain attributes (p.x) and keep the mapping access (p['x'])
+    of the former TypedDicts, without a per-message dict. `as_dict` converts for encoders."""
+    __slots__ = ()
 
-class FrameMsg(TypedDict):
-    path: str | None
-    ts: float
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__: raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def keys(self):
+        return self.__slots__
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def __eq__(self, other: object) -> bool:
+        return type(other) is type(self) and all(getattr(self, k) == getattr(other, k) for k in self.__slots__)
+
+    __hash__ = None   # mutable value objects, like the dicts they replace
+
+    def __repr__(self) -> str:
+        return '%s(%s)' % (type(self).__name__, ', '.join(f'{k}={getattr(self, k)!r}' for k in self.__slots__))
+
+    def __getstate__(self):
+        return tuple(getattr(self, k) for k in self.__slots__)
+
+    def __setstate__(self, state) -> None:
+        for k, v in zip(self.__slots__, state): setattr(self, k, v)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+class Telemetry(Message):
+    __slots__ = ('source', 'value')
+    def __init__(self, source: str, value: float):
+        self.source = source; self.value = value
+
+class FrameMsg(Message):
+    __slots__ = ('path', 'ts')
+    def __init__(self, path: str | None, ts: float):
+        self.path = path; self.ts = ts
+
+class Detection(Message):
+    __slots__ = ('cls', 'conf', 'x', 'y', 'w', 'h')
+    def __init__(self, cls: str, conf: float, x: int, y: int, w: int, h: int):
+        self.cls = cls; self.conf = conf; self.x = x; self.y = y; self.w = w; self.h = h
+
+class PoseMsg(Message):
+    """`source` names the body when several share the 'pose' topic (batch simulation); None for a single one."""
+    __slots__ = ('x', 'y', 'z', 'yaw', 'pitch', 'roll', 'source')
+    def __init__(self, x: float, y: float, z: float, yaw: float, pitch: float, roll: float, source: Optional[str] = None):
+        self.x = x; self.y = y; self.z = z; self.yaw = yaw; self.pitch = pitch; self.roll = roll; self.source = source
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = {k: getattr(self, k) for k in self.__slots__}
+        if self.source is None: del d['source']   # single-body poses keep their original shape on the wire
+        return d
+
+class KpiAggregate(Message):
+    """Rolling statistics of one Telemetry source over a 'sliding' or 'tumbling' window of `span_s` seconds."""
+    __slots__ = ('source', 'window', 'span_s', 'count', 'rate_hz', 'mean', 'std', 'min', 'max', 'p50', 'p90', 'p99')
+    def __init__(self, source: str, window: str, span_s: float, count: int, rate_hz: float, mean: float, std: float,
+                 min: float, max: float, p50: float, p90: float, p99: float):
+        self.source = source; self.window = window; self.span_s = span_s; self.count = count; self.rate_hz = rate_hz
+        self.mean = mean; self.std = std; self.min = min; self.max = max; self.p50 = p50; self.p90 = p90; self.p99 = p99
+
+class Command(Message):
+    """A setup command on its way to the Controller. `priority` 0 is urgent (drains first); `key` names what
+    it sets, so a newer command with the same key supersedes a queued one (None: never coalesced).
+    `origins` lists the (client, id) of every request folded into it, each of which gets a result."""
+    __slots__ = ('cmd', 'name', 'value', 'priority', 'key', 'origins')
+    def __init__(self, cmd: str, name: Optional[str], value: Any, priority: int, key: Optional[str],
+                 origins: Tuple[Tuple[str, str], ...]):
+        self.cmd = cmd; self.name = name; self.value = value; self.priority = priority; self.key = key
+        self.origins = origins
+
+    def coalesce(self, older: 'Command') -> 'Command':
+        return Command(self.cmd, self.name, self.value, min(self.priority, older.priority), self.key,
+                       older.origins + self.origins)
+
+class CommandResult(Message):
+    """Reply to one setup request, matched by `id`: 'queued' or 'rejected' from the ingress, then 'applied' or
+    'failed' from the Controller. `coalesced` is how many requests the applied command stood for. A request
+    replaced by a newer one while queued gets 'superseded', with `by` the id of the request that ran."""
+    __slots__ = ('id', 'client', 'cmd', 'status', 'ok', 'error', 'coalesced', 'by')
+    def __init__(self, id: str, client: str, cmd: str, status: str, ok: bool, error: Optional[str] = None,
+                 coalesced: int = 1, by: Optional[str] = None):
+        self.id = id; self.client = client; self.cmd = cmd; self.status = status; self.ok = ok; self.error = error
+        self.coalesced = coalesced; self.by = by
+
+def as_dict(payload: Any) -> Any:
+    """Plain-dict view of a payload for JSON/msgpack encoders; non-Message payloads pass through."""
+    return payload.to_dict() if isinstance(payload, Message) else payload
 
-class Detection(TypedDict):
-    cls: str
-    conf: float
-    x: int
-    y: int
-    w: int
-    h: int
-
-class PoseMsg(TypedDict):
-    x: float
-    y: float
-    z: float
-    yaw: float
-    pitch: float
-    roll: float
-
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Envelope:
     topic: Topic
     payload: Any
     ts: float
+    # Monotonic time of the last channel put, stamped only while bus metrics are attached (0.0 otherwise).
+    enq_ts: float = field(default=0.0, compare=False, repr=False)
@@ -0,0 +1,77 @@
+"""Keyframe/delta messages for slowly changing topics, for JSON and msgpack clients that opt in.
+
+Per envelope topic and source, the first envelope, every `keyframe_every`-th one after it, the first one `keyframe_s` seconds
+after the last keyframe, and any whose field set changed are keyframes, sent in full with "key": true:
+
+    {"topic": "kpi", "payload": {"source": "sim", "value": 0.42}, "ts": ..., "seq": 120, "key": true}
+
+Envelopes in between carry only the fields that differ from that keyframe:
+
+    {"topic": "kpi", "ts": ..., "seq": 121, "base": 120, "delta": {"value": 0.43}}
+
+A client acknowledges a keyframe with {"cmd": "ack", "topic": "kpi", "seq": 120}. Until its last ack
+matches the current keyframe it gets full messages instead of deltas, so a lost keyframe costs bandwidth,
+not correctness. Deltas are relative to the keyframe, not to the previous message, so a dropped delta
+does not affect the ones after it. Keyframes are kept per delta_key: the envelope topic (the one the client
+sees and acks, so batch-simulation 'pose' envelopes riding the 'kpi' channel get keyframes of their own) and
+the payload's 'source', like ChangeFilter, so each body or KPI source is diffed against its own keyframe.
+"""
+from __future__ import annotations
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+from domain.messages import Envelope, as_dict
+from .codec import envelope_dict
+
+# (keyframe seq, None) for a keyframe, (keyframe seq, changed fields) for a delta
+Frame = Tuple[int, Optional[Dict[str, Any]]]
+DeltaKey = Tuple[str, Hashable]   # (envelope topic, payload source)
+
+def delta_key(env: Envelope) -> DeltaKey:
+    get = getattr(env.payload, 'get', None)
+    return (env.topic, get('source') if get is not None else None)
+
+class DeltaCodec:
+    def __init__(self, topics: Iterable[str] = ('kpi',), keyframe_every: int = 100,
+                 keyframe_s: float = 1.0):
+        self.topics = set(topics)
+        self.keyframe_every = keyframe_every
+        self.keyframe_s = keyframe_s
+        self._keys: Dict[DeltaKey, List[Any]] = {}   # -> [keyframe seq, ts, payload, envelopes since]
+        self._current: Dict[Tuple[str, int], DeltaKey] = {}   # (envelope topic, seq) of each current keyframe
+
+    def handles(self, topic: str) -> bool:
+        return topic in self.topics
+
+    def keyframe_key(self, topic: str, seq: int) -> Optional[DeltaKey]:
+        """The key whose current keyframe is `seq` of envelope topic `topic`, None if that is no keyframe
+        (any more)."""
+        return self._current.get((topic, seq))
+
+    def frames(self, topic: str, envs: Sequence[Envelope], seq0: int) -> List[Frame]:
+        """Classify a batch of channel `topic` numbered from `seq0` (the broadcaster's seq) into keyframes
+        and deltas."""
+        keys, current = self._keys, self._current
+        out: List[Frame] = []
+        for i, env in enumerate(envs):
+            seq = seq0 + i
+            d = as_dict(env.payload)
+            dk = delta_key(env)
+            key = keys.get(dk)
+            if (key is None or key[3] + 1 >= self.keyframe_every or env.ts - key[1] >= self.keyframe_s
+                    or d.keys() != key[2].keys()):
+                if key is not None: del current[(env.topic, key[0])]
+                keys[dk] = [seq, env.ts, d, 0]
+                current[(env.topic, seq)] = dk
+                out.append((seq, None))
+            else:
+                key[3] += 1
+                base = key[2]
+                out.append((key[0], {k: v for k, v in d.items() if base[k] != v}))
+        return out
+
+def frame_dict(env: Envelope, seq: int, frame: Frame) -> Dict[str, Any]:
+    base, delta = frame
+    if delta is None:
+        d = envelope_dict(env, seq)
+        d['key'] = True
+        return d
+    return {'topic': env.topic, 'ts': env.ts, 'seq': seq, 'base': base, 'delta': delta}
@@ -0,0 +1,113 @@
+"""Per-subscriber downsampling: a topic reduced to at most `hz` messages per second for one client.
+
+A `Downsampler` folds every envelope of its topic into state per (Envelope.topic, payload.source), so the K
+bodies of a batch simulation, or poses riding on the 'kpi' channel, are reduced separately, and hands back
+the reduction once its window is due.
+Only what comes out gets encoded and sent, so egress and encode cost follow the client's rate rather than
+the Controller's. Reducers:
+
+    latest   the newest envelope per source
+    mean     per source, the newest envelope with every numeric field replaced by its mean over the window
+    minmax   per source, the envelopes holding the smallest and the largest value of the first numeric
+             field (Telemetry.value), in time order, so spikes survive as on a min/max strip chart
+
+'latest' and 'minmax' pass original envelopes through, so their encodings come from the shared
+EncodedCache; 'mean' builds new ones, numbered with the seq of the newest envelope in their window.
+"""
+from __future__ import annotations
+import asyncio, copy
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+from domain.messages import Envelope
+
+REDUCERS = ('latest', 'mean', 'minmax')
+
+def _key(env: Envelope) -> Hashable:
+    get = getattr(env.payload, 'get', None)
+    return env.topic, (get('source') if get is not None else None)
+
+def _numeric(payload: Any) -> List[str]:
+    keys = getattr(payload, 'keys', None)
+    return [k for k in keys() if type(payload[k]) in (int, float)] if keys is not None else []
+
+def _with_values(payload: Any, values: Dict[str, Any]) -> Any:
+    if isinstance(payload, dict): return {**payload, **values}
+    out = copy.copy(payload)
+    for k, v in values.items(): setattr(out, k, v)
+    return out
+
+class Downsampler:
+    """One topic of one subscriber: `add` folds envelopes in, `take` returns the reduction once `due`."""
+    def __init__(self, hz: float, reduce: str = 'latest', auto: bool = False):
+        if reduce not in REDUCERS: raise ValueError(f'unknown reducer: {reduce!r} (expected one of {", ".join(REDUCERS)})')
+        if not hz > 0: raise ValueError(f'rate must be > 0 Hz, got {hz!r}')
+        self.hz = float(hz)
+        self.reduce = reduce
+        self.auto = auto   # set by the session under backpressure rather than requested by the client
+        self.due = 0.0     # monotonic time the next reduction may go out
+        self.timer: Optional[asyncio.TimerHandle] = None   # flushes a window no later envelope completes
+        self.folded = 0
+        self.emitted = 0
+        self._state: Dict[Hashable, list] = {}
+
+    @property
+    def shared(self) -> bool:
+        """True when results are original envelopes, whose encodings other clients can share."""
+        return self.reduce != 'mean'
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    def add(self, envs: Sequence[Envelope], seq0: Optional[int] = None) -> None:
+        state, reduce = self._state, self.reduce
+        self.folded += len(envs)
+        for i, env in enumerate(envs):
+            seq = None if seq0 is None else seq0 + i
+            key = _key(env)
+            if reduce == 'latest':
+                state[key] = [env, seq]; continue
+            st = state.get(key)
+            if reduce == 'mean':
+                # [newest envelope, its seq, count, numeric fields, their sums]
+                if st is None:
+                    fields = _numeric(env.payload)
+                    st = state[key] = [env, seq, 0, fields, [0.0] * len(fields)]
+                st[0], st[1] = env, seq
+                st[2] += 1
+                p, sums = env.payload, st[4]
+                for j, f in enumerate(st[3]): sums[j] += p[f]
+                continue
+            # minmax: [field, min value, its envelope, its seq, max value, its envelope, its seq]
+            if st is None:
+                fields = _numeric(env.payload)
+                v = env.payload[fields[0]] if fields else 0
+                state[key] = [fields[0] if fields else None, v, env, seq, v, env, seq]; continue
+            if st[0] is None:   # nothing to compare on: keeps the newest, like latest
+                st[2], st[3], st[5], st[6] = env, seq, env, seq; continue
+            v = env.payload[st[0]]
+            if v < st[1]: st[1], st[2], st[3] = v, env, seq
+            if v >= st[4]: st[4], st[5], st[6] = v, env, seq
+
+    def take(self, now: float) -> List[Tuple[Envelope, Optional[int]]]:
+        # Windows sit on a 1/hz grid of the monotonic clock, so subscribers at the same rate emit in the
+        # same step and share encodings.
+        period = 1.0 / self.hz
+        self.due = (now // period + 1) * period
+        out: List[Tuple[Envelope, Optional[int]]] = []
+        for st in self._state.values():
+            if self.reduce == 'latest': out.append((st[0], st[1]))
+            elif self.reduce == 'mean':
+                env, seq, n, fields, sums = st
+                p = env.payload
+                values = {f: (round(s / n) if type(p[f]) is int else s / n) for f, s in zip(fields, sums)}
+                out.append((Envelope(topic=env.topic, payload=_with_values(p, values), ts=env.ts), seq))
+            else:
+                lo, hi = (st[2], st[3]), (st[5], st[6])
+                out.extend([lo] if lo[0] is hi[0] else sorted((lo, hi), key=lambda e: e[0].ts))
+        self._state.clear()
+        out.sort(key=lambda e: e[0].ts)
+        self.emitted += len(out)
+        return out
+
+    def cancel(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel(); self.timer = None
@@ -0,0 +1,68 @@
+from __future__ import annotations
+import threading
+from multiprocessing.connection import Connection
+from typing import Callable, Dict, Iterable, List, Optional
+from .channels import ChannelRegistry
+
+class PipeLink:
+    """Mirrors channels between two ChannelRegistry instances in different processes over one duplex Pipe.
+
+    Puts on `outbound` topics wake a sender thread that drains every dirty channel and ships one
+    {topic: [items]} batch per wakeup; a receiver thread puts incoming batches into the local registry,
+    where the usual channel policies and listeners (AsyncBridge, tk_pump) apply as if produced locally.
+    """
+    def __init__(self, reg: ChannelRegistry, conn: Connection, outbound: Iterable[str]):
+        self.reg = reg
+        self.conn = conn
+        self.outbound: List[str] = list(outbound)
+        self.on_closed: Optional[Callable[[], None]] = None
+        self.sent_batches = 0
+        self.received_batches = 0
+        self._wake = threading.Event()
+        self._stopping = False
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for name in self.outbound: self.reg.channel(name).add_listener(self._on_put)
+        self._threads = [threading.Thread(target=self._send_loop, name='PipeLinkSend', daemon=True),
+                         threading.Thread(target=self._recv_loop, name='PipeLinkRecv', daemon=True)]
+        for t in self._threads: t.start()
+        self._wake.set()   # ship anything queued before start()
+
+    def stop(self) -> None:
+        # Threads notice _stopping within one poll interval; the pipe is closed only after they exit,
+        # which the peer sees as EOF.
+        self._stopping = True
+        for name in self.outbound: self.reg.channel(name).remove_listener(self._on_put)
+        self._wake.set()
+        for t in self._threads:
+            if t is not threading.current_thread(): t.join(timeout=2.0)
+        try: self.conn.close()
+        except OSError: pass
+
+    def _on_put(self, name: str) -> None:
+        if not self._wake.is_set(): self._wake.set()
+
+    def _send_loop(self) -> None:
+        while not self._stopping:
+            self._wake.wait()
+            self._wake.clear()
+            batch: Dict[str, list] = {}
+            for name in self.outbound:
+                items = self.reg.channel(name).drain_batch()
+                if items: batch[name] = items
+            if not batch: continue
+            try: self.conn.send(batch)
+            except (OSError, ValueError): break
+            self.sent_batches += 1
+
+    def _recv_loop(self) -> None:
+        while not self._stopping:
+            try:
+                if not self.conn.poll(0.1): continue
+                batch = self.conn.recv()
+            except (EOFError, OSError): break
+            self.received_batches += 1
+            for name, items in batch.items():
+                self.reg.channel(name).put_batch(items)
+        if not self._stopping and self.on_closed is not None: self.on_closed()
@@ -1,12 +1,13 @@
 from __future__ import annotations
-from typing import Iterable
+from typing import Iterable, Sequence
 from domain.messages import Envelope
 from .channels import Channel, ChannelRegistry
 
 class BusPublisher:
     def __init__(self, out_ch: Channel[Envelope]): self._ch = out_ch
     def publish(self, env: Envelope) -> None: self._ch.put(env)
+    def publish_batch(self, envs: Sequence[Envelope]) -> None: self._ch.put_batch(envs)
 
 class BusInbox:
     def __init__(self, in_ch: Channel[Envelope]): self._ch = in_ch
-    def drain(self) -> Iterable[Envelope]: return self._ch.try_drain()
+    def drain(self) -> Iterable[Envelope]: return self._ch.drain_batch()
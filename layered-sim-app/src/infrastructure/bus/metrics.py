@@ -0,0 +1,187 @@
+"""Opt-in bus instrumentation: channel counters, queue dwell and end-to-end latency histograms.
+
+Nothing here runs unless `BusMetrics.attach` is called: channels then count puts, drops, drains and
+their high-water mark and stamp `Envelope.enq_ts` on put, so dwell (put -> drain) can be recorded on
+the consumer side. Sinks (WebSocket send, Tk render) record `Envelope.ts` -> delivery as 'e2e'
+latency under their own name. Counters are cumulative; histograms cover the interval since the last
+`report()`. Updates are unsynchronized: a sample racing a reset or another thread may be lost, which
+is the price of keeping the hot path lock-free.
+"""
+from __future__ import annotations
+import math, threading, time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from domain.messages import Envelope
+from .channels import Channel, ChannelRegistry
+
+QUANTILES: Dict[str, float] = {'p50': 0.5, 'p90': 0.9, 'p99': 0.99, 'p999': 0.999}
+
+class Histogram:
+    """Log-linear latency histogram: `sub` buckets per power of two of microseconds (about 9 % wide at
+    the default 8), fixed memory, O(1) record. Values are seconds."""
+    def __init__(self, sub: int = 8, octaves: int = 32):
+        self.sub = sub
+        self.counts: List[int] = [0] * (sub * octaves)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        us = seconds * 1e6
+        if us < 1.0: i = 0
+        else:
+            m, e = math.frexp(us)   # us = m * 2**e with 0.5 <= m < 1
+            i = min(e * self.sub + int((m - 0.5) * 2 * self.sub), len(self.counts) - 1)
+        self.counts[i] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max: self.max = seconds
+
+    def _upper(self, i: int) -> float:
+        e, k = divmod(i, self.sub)
+        return (0.5 + (k + 1) / (2 * self.sub)) * 2.0 ** e * 1e-6
+
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        """Upper bucket bound for each q in ascending `qs` (capped at the observed max); nan when empty."""
+        if not self.count: return [math.nan] * len(qs)
+        out, seen, i = [], 0, 0
+        for q in qs:
+            rank = q * self.count
+            while i < len(self.counts) - 1 and seen + self.counts[i] < rank:
+                seen += self.counts[i]
+                i += 1
+            out.append(min(self._upper(i), self.max))
+        return out
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """count, mean, max and QUANTILES in milliseconds; None instead of a value when empty (JSON-safe)."""
+        if not self.count: return {'count': 0, 'mean_ms': None, 'max_ms': None, **{k + '_ms': None for k in QUANTILES}}
+        d = {'count': self.count, 'mean_ms': self.total / self.count * 1e3, 'max_ms': self.max * 1e3}
+        for k, v in zip(QUANTILES, self.quantiles(list(QUANTILES.values()))): d[k + '_ms'] = v * 1e3
+        return d
+
+    def state(self) -> Dict[str, Any]:
+        """Plain-data copy (JSON-safe) for combining histograms recorded in other processes via `merge`."""
+        return {'counts': list(self.counts), 'count': self.count, 'total': self.total, 'max': self.max}
+
+    def merge(self, state: Dict[str, Any]) -> None:
+        for i, n in enumerate(state['counts']): self.counts[i] += n
+        self.count += state['count']
+        self.total += state['total']
+        if state['max'] > self.max: self.max = state['max']
+
+    def reset(self) -> None:
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.total = self.max = 0.0
+
+class ChannelMetrics:
+    """Counters for one channel. `drops` adds the channel's own `overwrites` (drop_old/latest) to the
+    items drop_new turned away. `routed` counts items a subscribed topic handed to its subscribers instead."""
+    __slots__ = ('cap', 'puts', 'rejected', 'drained', 'high_water', 'routed', 'dwell')
+
+    def __init__(self, cap: int = 0):
+        self.cap = cap   # channel maxsize (0 = unbounded): depth right after a full put never exceeds it
+        self.puts = 0
+        self.rejected = 0
+        self.drained = 0
+        self.high_water = 0
+        self.routed = 0
+        self.dwell = Histogram()
+
+    def on_put(self, item: Any, depth: int) -> None:
+        self.puts += 1
+        if depth > self.high_water: self.high_water = min(depth, self.cap) if self.cap else depth
+        if isinstance(item, Envelope): object.__setattr__(item, 'enq_ts', time.monotonic())
+
+    def on_drain(self, items) -> None:
+        self.drained += len(items)
+        now = time.monotonic()
+        for item in items:
+            enq = getattr(item, 'enq_ts', 0.0)
+            if enq: self.dwell.record(now - enq)
+
+class BusMetrics:
+    def __init__(self):
+        self.channels: Dict[str, Tuple[Channel, ChannelMetrics]] = {}
+        self.sinks: Dict[str, Histogram] = {}
+        self.last: Optional[Dict[str, Any]] = None
+
+    def attach(self, reg: ChannelRegistry, prefix: str = '') -> 'BusMetrics':
+        """Instrument every channel of `reg`, and of its current subscriptions as '<subscriber>/<topic>'
+        (a subscribed topic routes past its own channel, so its counts live there)."""
+        for name in reg.names():
+            ch = reg.channel(name)
+            if ch.metrics is None: ch.metrics = ChannelMetrics(ch.cfg.maxsize)
+            self.channels[prefix + name] = (ch, ch.metrics)
+        for sub in reg.subscriptions(): self.attach(sub, f'{prefix}{sub.name}/')
+        return self
+
+    def detach(self) -> None:
+        for ch, _ in self.channels.values(): ch.metrics = None
+        self.channels.clear()
+
+    def e2e(self, sink: str) -> Histogram:
+        """Histogram a sink records `time.time() - Envelope.ts` into when it delivers an envelope."""
+        h = self.sinks.get(sink)
+        if h is None: h = self.sinks[sink] = Histogram()
+        return h
+
+    def report(self) -> Dict[str, Any]:
+        """Counters plus histogram summaries since the previous report (which are then reset). Channels
+        detached since (e.g. by ChannelRegistry.unsubscribe) are dropped."""
+        self.channels = {name: (ch, m) for name, (ch, m) in self.channels.items() if ch.metrics is m}
+        channels = {}
+        for name, (ch, m) in self.channels.items():
+            channels[name] = {'puts': m.puts, 'drops': ch.overwrites + m.rejected, 'drained': m.drained,
+                              'high_water': m.high_water, 'routed': m.routed, 'depth': ch.depth(),
+                              'dwell': m.dwell.summary()}
+            m.dwell.reset()
+        sinks = {}
+        for name, h in self.sinks.items():
+            sinks[name] = h.summary()
+            h.reset()
+        self.last = {'ts': time.time(), 'channels': channels, 'e2e': sinks}
+        return self.last
+
+    def text(self) -> str:
+        """The last report in Prometheus text exposition style, one sample per line."""
+        r = self.last or self.report()
+        lines = []
+        for name, c in r['channels'].items():
+            for k in ('puts', 'drops', 'drained', 'high_water', 'routed', 'depth'):
+                lines.append(f'channel_{k}{{channel="{name}"}} {c[k]}')
+            lines += _hist_lines('channel_dwell', f'channel="{name}"', c['dwell'])
+        for name, h in r['e2e'].items():
+            lines += _hist_lines('e2e_latency', f'sink="{name}"', h)
+        return '\n'.join(lines) + '\n'
+
+def _hist_lines(metric: str, labels: str, h: Dict[str, Optional[float]]) -> List[str]:
+    lines = [f'{metric}_count{{{labels}}} {h["count"]}']
+    if not h['count']: return lines
+    for k, q in QUANTILES.items(): lines.append(f'{metric}_ms{{{labels},quantile="{q}"}} {h[k + "_ms"]:.4f}')
+    lines.append(f'{metric}_ms{{{labels},quantile="1"}} {h["max_ms"]:.4f}')
+    return lines
+
+class MetricsReporter:
+    """Publishes `metrics.report()` as a 'metrics' envelope on `channel` every `interval_s` seconds."""
+    def __init__(self, metrics: BusMetrics, channel: Channel, interval_s: float = 1.0):
+        self.metrics = metrics
+        self.channel = channel
+        self.interval_s = interval_s
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'MetricsReporter':
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='MetricsReporter', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None: self._thread.join(timeout=2.0)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            r = self.metrics.report()
+            self.channel.put(Envelope(topic='metrics', payload=r, ts=r['ts']))
@@ -1,13 +1,82 @@
 from __future__ import annotations
+import time
 import tkinter as tk
-from typing import Callable
+from typing import Callable, Dict, Iterable, List, Optional
 from domain.messages import Envelope
 from .channels import ChannelRegistry
+from .metrics import Histogram
 
-def tk_pump(root: tk.Tk, reg: ChannelRegistry, on_event: Callable[[Envelope], None], every_ms: int = 30) -> None:
-    def _drain():
-        for name in reg.names():
-            for env in reg.channel(name).try_drain():
-                on_event(env)
-        root.after(every_ms, _drain)
-    _drain()
+class TkPump:
+    """Moves registry data onto the Tk thread, rendering at most once per topic per frame.
+
+    Each frame drains the channels and folds every batch into a per-topic snapshot of its newest
+    envelope; `on_event` is called once per topic with that envelope, so 1000 KPI messages buffered
+    during a stall cost one widget update, not 1000. The envelopes that were folded away count as
+    dropped updates. `on_batch(topic, envs)` optionally sees the full batch first, for consumers that
+    keep history rather than paint widgets.
+
+    The next frame is scheduled `every_ms` after this one, stretched to `load` times the time the
+    drain and render took (capped at `max_ms`), so a slow render backs off instead of starving Tk.
+    With an `e2e` histogram (BusMetrics.e2e('tk')), each rendered envelope records Envelope.ts -> render.
+    """
+    def __init__(self, root: tk.Tk, reg: ChannelRegistry, on_event: Callable[[Envelope], None],
+                 every_ms: int = 30, topics: Optional[Iterable[str]] = None,
+                 on_batch: Optional[Callable[[str, List[Envelope]], None]] = None,
+                 on_frame: Optional[Callable[[Dict[str, float]], None]] = None,
+                 load: float = 2.0, max_ms: int = 250, e2e: Optional[Histogram] = None):
+        self.root = root
+        self.reg = reg
+        self.on_event = on_event
+        self.on_batch = on_batch
+        self.on_frame = on_frame
+        self.every_ms = every_ms
+        self.topics: List[str] = list(reg.names() if topics is None else topics)
+        self.load = load
+        self.max_ms = max_ms
+        self.e2e = e2e
+        self.interval_ms = every_ms
+        self.frames = 0
+        self.applied = 0
+        self.dropped = 0
+        self.last_frame_ms = 0.0
+        self.max_frame_ms = 0.0
+        self._after: Optional[str] = None
+
+    def start(self) -> 'TkPump':
+        if self._after is None: self._frame()
+        return self
+
+    def stop(self) -> None:
+        if self._after is not None:
+            self.root.after_cancel(self._after)
+            self._after = None
+
+    def _frame(self) -> None:
+        t0 = time.perf_counter()
+        snapshot: Dict[str, Envelope] = {}
+        for name in self.topics:
+            batch = self.reg.channel(name).drain_batch()
+            if not batch: continue
+            if self.on_batch is not None: self.on_batch(name, batch)
+            snapshot[name] = batch[-1]
+            self.dropped += len(batch) - 1
+        for env in snapshot.values():
+            self.on_event(env)
+        if self.e2e is not None:
+            now = time.time()
+            for env in snapshot.values(): self.e2e.record(now - env.ts)
+        self.applied += len(snapshot)
+        self.frames += 1
+        self.last_frame_ms = (time.perf_counter() - t0) * 1e3
+        self.max_frame_ms = max(self.max_frame_ms, self.last_frame_ms)
+        self.interval_ms = min(self.max_ms, max(self.every_ms, int(self.last_frame_ms * self.load)))
+        if self.on_frame is not None: self.on_frame(self.stats())
+        self._after = self.root.after(self.interval_ms, self._frame)
+
+    def stats(self) -> Dict[str, float]:
+        return {'frames': self.frames, 'frame_ms': self.last_frame_ms, 'max_frame_ms': self.max_frame_ms,
+                'interval_ms': self.interval_ms, 'applied': self.applied, 'dropped_updates': self.dropped}
+
+def tk_pump(root: tk.Tk, reg: ChannelRegistry, on_event: Callable[[Envelope], None], every_ms: int = 30,
+            **kw) -> TkPump:
+    return TkPump(root, reg, on_event, every_ms=every_ms, **kw).start()
@@ -0,0 +1,21 @@
+"""Declarative topic table: every channel the entry points use, with its bound, policy and the modes that
+carry it. `build_registry(mode)` is the one place registries are built from it."""
+from __future__ import annotations
+from typing import List, Optional, Tuple
+from .channels import ChannelConfig, ChannelRegistry
+
+# name, maxsize, policy, modes (None: every mode)
+TOPICS: Tuple[Tuple[str, int, str, Optional[Tuple[str, ...]]], ...] = (
+    ('kpi',       1000, 'drop_old', None),
+    ('kpi_agg',    100, 'drop_old', None),
+    ('metrics',      1, 'latest',   None),
+    ('setup',       64, 'priority', None),
+    ('setup_ack', 1000, 'drop_old', ('server',)),   # command results go back to WebSocket clients only
+)
+
+def topic_configs(mode: str) -> List[ChannelConfig]:
+    return [ChannelConfig(name, maxsize=maxsize, policy=policy) for name, maxsize, policy, modes in TOPICS
+            if modes is None or mode in modes]
+
+def build_registry(mode: str) -> ChannelRegistry:
+    return ChannelRegistry(topic_configs(mode))
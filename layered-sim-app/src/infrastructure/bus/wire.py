@@ -0,0 +1,98 @@
+"""Binary columnar frames for high-rate topics ('binary' wire format).
+
+One frame carries N envelopes of one topic:
+
+    header   <2sBBHQ  magic b'OT', version, field count F, row count N, seq of row 0 (0 = unsequenced)
+             B + utf-8 topic name
+             F x (B + utf-8 field name, 1 byte type code)
+    columns  ts as N little-endian float64, then one column per field in header order
+
+Type codes: 'd' float64, 'f' float32, 'i' int32, 's' string (per row: <H length + utf-8, 0xFFFF = None).
+The header names every field, so a decoder needs no out-of-band schema table. Rows are numbered
+seq, seq + 1, ... (see snapshot.py). Version 3 added the optional pose "source" column; fields listed in
+OPTIONAL are left out of a decoded payload when None, as in the JSON form. Version 2 frames (same header)
+and version 1 frames, which lack the seq, still decode.
+"""
+from __future__ import annotations
+import struct
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from domain.messages import Envelope
+
+MAGIC = b'OT'
+VERSION = 3
+_HEAD = struct.Struct('<2sBBHQ')
+_HEAD_V1 = struct.Struct('<2sBBH')
+_STRLEN = struct.Struct('<H')
+_NONE = 0xFFFF
+
+# Fixed layouts per topic; topics not listed here fall back to JSON for binary clients.
+SCHEMAS: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    'kpi': (('source', 's'), ('value', 'd')),
+    'kpi_agg': (('source', 's'), ('window', 's'), ('span_s', 'd'), ('count', 'i'), ('rate_hz', 'd'), ('mean', 'd'),
+                ('std', 'd'), ('min', 'd'), ('max', 'd'), ('p50', 'd'), ('p90', 'd'), ('p99', 'd')),
+    'pose': (('x', 'd'), ('y', 'd'), ('z', 'd'), ('yaw', 'd'), ('pitch', 'd'), ('roll', 'd'), ('source', 's')),
+    'detections': (('cls', 's'), ('conf', 'f'), ('x', 'i'), ('y', 'i'), ('w', 'i'), ('h', 'i')),
+    'visual_frame': (('path', 's'), ('ts', 'd')),
+    'thermal_frame': (('path', 's'), ('ts', 'd')),
+    'lidar_frame': (('path', 's'), ('ts', 'd')),
+}
+
+# Fields that may be None and are then omitted from the payload, like PoseMsg.to_dict does for JSON.
+OPTIONAL: Dict[str, Tuple[str, ...]] = {'pose': ('source',)}
+
+def _pack_str(s: Optional[str]) -> bytes:
+    if s is None: return _STRLEN.pack(_NONE)
+    b = s.encode()
+    return _STRLEN.pack(len(b)) + b
+
+def encode_batch(topic: str, envs: Sequence[Envelope], seq0: int = 0) -> Optional[bytes]:
+    """Pack envelopes of one topic into a single frame, or None if the topic has no binary schema."""
+    schema = SCHEMAS.get(topic)
+    if schema is None or not envs: return None
+    n = len(envs)
+    tb = topic.encode()
+    parts = [_HEAD.pack(MAGIC, VERSION, len(schema), n, seq0), bytes((len(tb),)), tb]
+    for name, code in schema:
+        nb = name.encode()
+        parts += (bytes((len(nb),)), nb, code.encode())
+    parts.append(struct.pack(f'<{n}d', *[e.ts for e in envs]))
+    for name, code in schema:
+        col = [e.payload[name] for e in envs]
+        if code == 's': parts.append(b''.join(map(_pack_str, col)))
+        else: parts.append(struct.pack(f'<{n}{code}', *col))
+    return b''.join(parts)
+
+def decode_frame(data: bytes) -> List[Dict[str, Any]]:
+    """Inverse of encode_batch: returns [{'topic', 'payload', 'ts'[, 'seq']}, ...] like the JSON wire format."""
+    magic, version, nfields, n = _HEAD_V1.unpack_from(data, 0)
+    if magic != MAGIC or version not in (1, 2, VERSION): raise ValueError('not an OT binary frame')
+    if version == 1: seq0, off = 0, _HEAD_V1.size
+    else: seq0, off = _HEAD.unpack_from(data, 0)[4], _HEAD.size
+    tlen = data[off]; off += 1
+    topic = data[off:off + tlen].decode(); off += tlen
+    fields = []
+    for _ in range(nfields):
+        nlen = data[off]; off += 1
+        name = data[off:off + nlen].decode(); off += nlen
+        fields.append((name, chr(data[off]))); off += 1
+    ts = struct.unpack_from(f'<{n}d', data, off); off += 8 * n
+    cols = []
+    for _, code in fields:
+        if code == 's':
+            col = []
+            for _ in range(n):
+                (ln,) = _STRLEN.unpack_from(data, off); off += 2
+                if ln == _NONE: col.append(None)
+                else: col.append(data[off:off + ln].decode()); off += ln
+            cols.append(col)
+        else:
+            fmt = struct.Struct(f'<{n}{code}')
+            cols.append(fmt.unpack_from(data, off)); off += fmt.size
+    names = [name for name, _ in fields]
+    rows = [{'topic': topic, 'ts': ts[i], 'payload': {k: c[i] for k, c in zip(names, cols)}} for i in range(n)]
+    for name in OPTIONAL.get(topic, ()):
+        for row in rows:
+            if row['payload'].get(name, 0) is None: del row['payload'][name]
+    if seq0:
+        for i, row in enumerate(rows): row['seq'] = seq0 + i
+    return rows
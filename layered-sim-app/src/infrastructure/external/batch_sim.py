@@ -0,0 +1,88 @@
+"""Vectorized simulation of many sources at once, for twin load testing (requires numpy).
+
+`BatchSim` advances K sources together: each tick yields M KPI samples per source (a sine with its own
+amplitude, frequency and phase plus uniform noise) and one pose per source on a circular orbit with its own
+radius, inclination, node and mean motion, all computed as (M, K) / (K,) arrays. `BatchSimExternal` wraps it
+as a BatchExternalProcess, so the Controller publishes each tick with a single `publish_batch`.
+
+Runs are reproducible: every parameter and all noise come from one `numpy.random.Generator(seed)`, and
+simulated time advances by the nominal tick period rather than the wall clock, so the same seed, sizes and
+tick count give the same values. Envelope.ts is still the wall clock, with the M samples of a tick spread
+evenly over the period that ends at the poll.
+"""
+from __future__ import annotations
+import math, time
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+import numpy as np
+from domain.messages import Envelope, PoseMsg, Telemetry
+
+TWO_PI = 2.0 * math.pi
+
+class BatchSim:
+    def __init__(self, sources: int = 100, samples: int = 1, seed: Optional[int] = 0, noise: float = 0.05):
+        if sources < 1 or samples < 1: raise ValueError('sources and samples must be >= 1')
+        self.sources = sources
+        self.samples = samples
+        self.seed = seed
+        self.noise = noise
+        self.names = [f'sim-{i:03d}' for i in range(sources)]
+        rng = self.rng = np.random.default_rng(seed)
+        # KPI: value = amp * sin(omega * t + phi) + U(-noise, noise)
+        self.amp = rng.uniform(0.5, 1.5, sources)
+        self.omega = rng.uniform(0.5, 2.0, sources)
+        self.phi = rng.uniform(0.0, TWO_PI, sources)
+        # Pose: circular orbit of `radius`, mean motion `motion` rad/s, inclination `inc`, ascending node `node`
+        self.radius = rng.uniform(1.0, 3.0, sources)
+        self.motion = rng.uniform(0.05, 0.5, sources)
+        self.anomaly = rng.uniform(0.0, TWO_PI, sources)
+        inc = rng.uniform(0.0, 0.5 * math.pi, sources)
+        node = rng.uniform(0.0, TWO_PI, sources)
+        self._cos_i, self._sin_i = np.cos(inc), np.sin(inc)
+        self._cos_n, self._sin_n = np.cos(node), np.sin(node)
+        self._frac = np.arange(1, samples + 1) / samples   # sample j of a tick sits at (j + 1) / M of the period
+        self.t = 0.0   # simulated seconds, advanced per tick
+
+    def step(self, period: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Advance one tick: (M,) sample offsets before the tick's end, (M, K) KPI values and (K, 6) poses
+        (x, y, z, yaw, pitch, roll) at the tick's end."""
+        t = self.t + period * self._frac
+        self.t += period
+        values = self.amp * np.sin(np.outer(t, self.omega) + self.phi)
+        values += self.rng.uniform(-self.noise, self.noise, values.shape)
+        theta = self.anomaly + self.motion * self.t
+        c, s = np.cos(theta), np.sin(theta)
+        ci, si, cn, sn = self._cos_i, self._sin_i, self._cos_n, self._sin_n
+        # Position and unit velocity: the in-plane circle rotated by inclination, then by the node.
+        poses = np.empty((self.sources, 6))
+        poses[:, 0] = self.radius * (cn * c - sn * ci * s)
+        poses[:, 1] = self.radius * (sn * c + cn * ci * s)
+        poses[:, 2] = self.radius * si * s
+        poses[:, 3] = np.arctan2(-sn * s + cn * ci * c, -cn * s - sn * ci * c) % TWO_PI
+        poses[:, 4] = np.arcsin(np.clip(si * c, -1.0, 1.0))
+        poses[:, 5] = 0.0
+        return period * (1.0 - self._frac), values, poses
+
+    def envelopes(self, now: float, period: float) -> List[Envelope]:
+        """One tick as K x M 'kpi' Telemetry envelopes (oldest first) followed by K 'pose' envelopes."""
+        ago, values, poses = self.step(period)
+        names = self.names
+        out = [Envelope(topic='kpi', payload=Telemetry(source=name, value=v), ts=ts)
+               for ts, row in zip((now - ago).tolist(), values.tolist()) for name, v in zip(names, row)]
+        out += [Envelope(topic='pose', payload=PoseMsg(*p, source=name), ts=now) for name, p in zip(names, poses.tolist())]
+        return out
+
+class BatchSimExternal:
+    """BatchExternalProcess over a BatchSim polled at `rate_hz`: every poll_batch() is one tick of simulated
+    time (1 / rate_hz), so retiming the 'external' task changes the sample rate, not the simulated dynamics."""
+    def __init__(self, sources: int = 100, samples: int = 1, seed: Optional[int] = 0, rate_hz: float = 20.0):
+        self.sim = BatchSim(sources, samples, seed)
+        self.period = 1.0 / rate_hz
+        self._pending: Deque[Envelope] = deque()
+
+    def poll_batch(self) -> List[Envelope]:
+        return self.sim.envelopes(time.time(), self.period)
+
+    def poll(self) -> Optional[Envelope]:
+        if not self._pending: self._pending.extend(self.poll_batch())
+        return self._pending.popleft() if self._pending else None
@@ -0,0 +1,74 @@
+from __future__ import annotations
+import time
+from typing import Callable, Iterator, List, Optional, Sequence
+from domain.messages import Envelope
+from infrastructure.recording.segment_log import RecordingReader
+
+# Controller poll rates for a replay. poll_batch() hands over everything that is due, so the rate only sets how
+# finely deliveries are spread; at max speed every poll takes up to `max_batch` envelopes.
+REPLAY_POLL_HZ = 200.0
+MAX_SPEED_POLL_HZ = 1000.0
+
+class ReplayExternal:
+    """BatchExternalProcess that streams a recorded time range back through the normal Controller.
+
+    `start_s`/`end_s` are seconds from the start of the recording. `speed` 1.0 replays in real time, N
+    replays N times faster and 0 as fast as the Controller polls. poll_batch() returns every envelope that
+    is due, at most `max_batch` (which bounds a max-speed or looping replay), and poll() the next one
+    (None if none is due). Envelopes are re-stamped onto the wall clock with the recorded spacing scaled by
+    `speed`, so windows and charts downstream behave as they do live; `restamp=False` keeps the
+    recorded timestamps. `loop` starts over at the end of the range.
+    """
+    def __init__(self, directory: str, start_s: Optional[float] = None, end_s: Optional[float] = None,
+                 speed: float = 1.0, topics: Optional[Sequence[str]] = ('kpi',), restamp: bool = True,
+                 loop: bool = False, max_batch: int = 512, clock: Callable[[], float] = time.monotonic,
+                 wall: Callable[[], float] = time.time):
+        self.reader = RecordingReader(directory)
+        base = self.reader.t0 or 0.0
+        self.t0 = None if start_s is None else base + start_s
+        self.t1 = None if end_s is None else base + end_s
+        self.speed = speed
+        self.topics = topics
+        self.restamp = restamp
+        self.loop = loop
+        self.max_batch = max_batch
+        self.clock = clock
+        self.wall = wall
+        self.replayed = 0
+        self._it: Optional[Iterator[Envelope]] = None
+        self._next: Optional[Envelope] = None
+
+    def _rewind(self) -> None:
+        self._it = self.reader.read(self.t0, self.t1, self.topics)
+        self._next = next(self._it, None)
+        self._ts0 = self._next.ts if self._next is not None else 0.0
+        self._start = self.clock()
+        self._wall0 = self.wall()
+
+    def poll(self) -> Optional[Envelope]:
+        batch = self._due(1)
+        return batch[0] if batch else None
+
+    def poll_batch(self) -> List[Envelope]:
+        return self._due(self.max_batch)
+
+    def _due(self, limit: int) -> List[Envelope]:
+        if self._it is None: self._rewind()
+        out: List[Envelope] = []
+        elapsed = self.clock() - self._start
+        now = self.wall() if self.restamp and self.speed <= 0 else 0.0
+        while len(out) < limit:
+            env = self._next
+            if env is None:
+                if not self.loop or self.replayed == 0: break
+                self._rewind()
+                elapsed = self.clock() - self._start
+                env = self._next
+            offset = (env.ts - self._ts0) / self.speed if self.speed > 0 else 0.0
+            if offset > elapsed: break
+            self._next = next(self._it, None)
+            self.replayed += 1
+            if self.restamp:
+                env = Envelope(topic=env.topic, payload=env.payload, ts=self._wall0 + offset if self.speed > 0 else now)
+            out.append(env)
+        return out
@@ -0,0 +1,65 @@
+from __future__ import annotations
+import threading
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional
+from domain.messages import Envelope
+from infrastructure.bus.channels import ChannelRegistry
+from .segment_log import SegmentWriter
+
+class Recorder:
+    """Records every envelope put on the registry's channels to a segmented log (see segment_log.py).
+
+    It attaches as a channel tap, so it sees items before the overflow policy drops them and never
+    competes with the channel's consumer. The tap only appends to a bounded deque on the producer
+    thread; a writer thread encodes and writes the backlog every `flush_every_s` in one buffered write.
+    If the writer falls `max_pending` envelopes behind, the oldest pending ones are counted in `dropped`.
+    """
+    def __init__(self, reg: ChannelRegistry, directory: str, topics: Optional[Iterable[str]] = None,
+                 segment_bytes: int = 64 << 20, index_every_s: float = 1.0, flush_every_s: float = 0.2,
+                 max_pending: int = 100_000):
+        self.reg = reg
+        self.topics: List[str] = [n for n in (reg.names() if topics is None else topics) if n != 'setup']
+        self.writer = SegmentWriter(directory, segment_bytes=segment_bytes, index_every_s=index_every_s)
+        self.flush_every_s = flush_every_s
+        self.records = 0
+        self.bytes = 0
+        self.dropped = 0
+        self._pending: Deque[Envelope] = deque(maxlen=max_pending)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'Recorder':
+        if self._thread is not None: return self
+        self.reg.tap(self._on_item, self.topics)
+        self._thread = threading.Thread(target=self._run, name='Recorder', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.reg.untap(self._on_item, self.topics)
+        self._stop.set()
+        if self._thread is not None: self._thread.join(timeout=5.0)
+        self._write_pending()
+        self.writer.close()
+
+    def _on_item(self, env: Envelope) -> None:
+        p = self._pending
+        if len(p) == p.maxlen: self.dropped += 1
+        p.append(env)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_every_s):
+            self._write_pending()
+
+    def _write_pending(self) -> None:
+        p = self._pending
+        n = len(p)
+        if not n: return
+        batch = [p.popleft() for _ in range(n)]
+        self.bytes += self.writer.write_batch(batch)
+        self.records += n
+        self.writer.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {'records': self.records, 'bytes': self.bytes, 'segments': len(self.writer.segments),
+                'pending': len(self._pending), 'dropped': self.dropped}
@@ -0,0 +1,186 @@
+"""On-disk layout of a telemetry recording: segmented append-only logs with sparse time indexes.
+
+A recording is a directory:
+
+    manifest.json        {"version": 1, "topics": [...], "types": [...], "segments": [{"file", "t0", "t1", "records"}...]}
+    seg-000001.log       MAGIC, then records: <I H H d> (body length, topic id, type id, ts) + body
+    seg-000001.idx       <H d Q> (topic id, ts, offset) for the first record of each topic per `index_every_s`
+
+Message payloads are stored as their pickled field tuple with the class recorded once in "types" (type
+id > 0), which keeps a KPI sample around 40 bytes; other payloads are pickled whole (type id 0).
+Records are appended in arrival order. Readers assume ts is non-decreasing in that order up to a small
+skew (`SKEW_S`), which holds for envelopes stamped by one controller.
+"""
+from __future__ import annotations
+import bisect, importlib, json, mmap, os, pickle, struct
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from domain.messages import Envelope, Message
+
+MAGIC = b'OTR1'
+RECORD = struct.Struct('<IHHd')
+INDEX = struct.Struct('<HdQ')
+SKEW_S = 1.0
+
+class SegmentWriter:
+    """Appends encoded records to the current segment, rolling to a new file at `segment_bytes`."""
+    def __init__(self, directory: str, segment_bytes: int = 64 << 20, index_every_s: float = 1.0):
+        self.dir = directory
+        self.segment_bytes = segment_bytes
+        self.index_every_s = index_every_s
+        self.topics: List[str] = []
+        self.types: List[str] = []
+        self.segments: List[Dict] = []
+        self._topic_ids: Dict[str, int] = {}
+        self._type_ids: Dict[type, int] = {}
+        self._log = self._idx = None
+        self._size = 0
+        self._last_indexed: Dict[int, float] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _open_segment(self) -> None:
+        self._close_segment()
+        name = 'seg-%06d' % (len(self.segments) + 1)
+        self._log = open(os.path.join(self.dir, name + '.log'), 'wb', buffering=1 << 20)
+        self._idx = open(os.path.join(self.dir, name + '.idx'), 'wb')
+        self._log.write(MAGIC)
+        self._size = len(MAGIC)
+        self._last_indexed = {}
+        self.segments.append({'file': name + '.log', 't0': None, 't1': None, 'records': 0})
+        self.write_manifest()
+
+    def _close_segment(self) -> None:
+        if self._log is None: return
+        self._log.close(); self._idx.close()
+        self._log = self._idx = None
+
+    def _topic_id(self, topic: str) -> int:
+        tid = self._topic_ids.get(topic)
+        if tid is None:
+            tid = self._topic_ids[topic] = len(self.topics)
+            self.topics.append(topic)
+        return tid
+
+    def _encode(self, payload: Any):
+        cls = type(payload)
+        if not isinstance(payload, Message): return 0, pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+        type_id = self._type_ids.get(cls)
+        if type_id is None:
+            self.types.append(f'{cls.__module__}:{cls.__qualname__}')
+            type_id = self._type_ids[cls] = len(self.types)
+        return type_id, pickle.dumps(payload.__getstate__(), protocol=pickle.HIGHEST_PROTOCOL)
+
+    def write_batch(self, envs: Sequence[Envelope]) -> int:
+        """Encode and append a batch with one write per segment touched; returns bytes written."""
+        written = 0
+        buf, index = bytearray(), bytearray()
+        for env in envs:
+            if self._log is None or (self._size + len(buf) >= self.segment_bytes and buf):
+                written += self._commit(buf, index)
+                buf, index = bytearray(), bytearray()
+                self._open_segment()
+            tid = self._topic_id(env.topic)
+            type_id, body = self._encode(env.payload)
+            offset = self._size + len(buf)
+            last = self._last_indexed.get(tid)
+            if last is None or env.ts - last >= self.index_every_s:
+                index += INDEX.pack(tid, env.ts, offset)
+                self._last_indexed[tid] = env.ts
+            buf += RECORD.pack(len(body), tid, type_id, env.ts)
+            buf += body
+            seg = self.segments[-1]
+            if seg['t0'] is None: seg['t0'] = env.ts
+            seg['t1'] = env.ts
+            seg['records'] += 1
+        return written + self._commit(buf, index)
+
+    def _commit(self, buf: bytearray, index: bytearray) -> int:
+        if not buf: return 0
+        self._log.write(buf)
+        self._idx.write(index)
+        self._size += len(buf)
+        return len(buf)
+
+    def flush(self) -> None:
+        # The manifest is rewritten too, so a crash loses at most the last flush interval.
+        if self._log is not None:
+            self._log.flush(); self._idx.flush()
+        self.write_manifest()
+
+    def write_manifest(self) -> None:
+        tmp = os.path.join(self.dir, 'manifest.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'version': 1, 'topics': self.topics, 'types': self.types, 'segments': self.segments}, f)
+        os.replace(tmp, os.path.join(self.dir, 'manifest.json'))
+
+    def close(self) -> None:
+        self._close_segment()
+        self.write_manifest()
+
+class RecordingReader:
+    """Time-range reads over a recording via mmap; the index picks where to start in each segment."""
+    def __init__(self, directory: str):
+        self.dir = directory
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            m = json.load(f)
+        self.topics: List[str] = m['topics']
+        self.types: List[type] = [_resolve(t) for t in m.get('types', [])]
+        self.segments: List[Dict] = [s for s in m['segments'] if s['records']]
+
+    @property
+    def t0(self) -> Optional[float]:
+        return self.segments[0]['t0'] if self.segments else None
+
+    @property
+    def t1(self) -> Optional[float]:
+        return self.segments[-1]['t1'] if self.segments else None
+
+    def _start_offset(self, seg: Dict, t0: float) -> int:
+        # Last indexed record (any topic) at least SKEW_S before t0; records before it are all older.
+        path = os.path.join(self.dir, seg['file'][:-4] + '.idx')
+        with open(path, 'rb') as f:
+            data = f.read()
+        entries = [INDEX.unpack_from(data, i) for i in range(0, len(data) - len(data) % INDEX.size, INDEX.size)]
+        keys = [ts for _, ts, _ in entries]
+        i = bisect.bisect_right(keys, t0 - SKEW_S) - 1
+        return entries[i][2] if i >= 0 else len(MAGIC)
+
+    def read(self, t0: Optional[float] = None, t1: Optional[float] = None,
+             topics: Optional[Sequence[str]] = None) -> Iterator[Envelope]:
+        lo = float('-inf') if t0 is None else t0
+        hi = float('inf') if t1 is None else t1
+        wanted = None if topics is None else {self.topics.index(t) for t in topics if t in self.topics}
+        for seg in self.segments:
+            if seg['t1'] < lo - SKEW_S or seg['t0'] > hi + SKEW_S: continue
+            yield from self._read_segment(seg, lo, hi, wanted)
+
+    def _decode(self, type_id: int, body: memoryview) -> Any:
+        if not type_id: return pickle.loads(body)
+        cls = self.types[type_id - 1]
+        payload = cls.__new__(cls)
+        payload.__setstate__(pickle.loads(body))
+        return payload
+
+    def _read_segment(self, seg: Dict, lo: float, hi: float, wanted) -> Iterator[Envelope]:
+        with open(os.path.join(self.dir, seg['file']), 'rb') as f:
+            if os.fstat(f.fileno()).st_size <= len(MAGIC): return
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with mm:
+            view = memoryview(mm)
+            try:
+                pos = self._start_offset(seg, lo) if lo != float('-inf') else len(MAGIC)
+                end = len(mm)
+                while pos + RECORD.size <= end:
+                    n, tid, type_id, ts = RECORD.unpack_from(mm, pos)
+                    body = pos + RECORD.size
+                    pos = body + n
+                    if pos > end or ts > hi + SKEW_S: break
+                    if ts < lo or ts > hi or (wanted is not None and tid not in wanted): continue
+                    yield Envelope(topic=self.topics[tid], payload=self._decode(type_id, view[body:pos]), ts=ts)
+            finally:
+                view.release()
+
+def _resolve(name: str) -> type:
+    module, _, qualname = name.partition(':')
+    obj: Any = importlib.import_module(module)
+    for part in qualname.split('.'): obj = getattr(obj, part)
+    return obj
@@ -0,0 +1,117 @@
+from __future__ import annotations
+import functools, signal, threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence
+from application.aggregation import KpiAggregator
+from application.change_filter import ChangeFilter
+from application.controller import Controller
+from application.ports import EventPublisher, CommandInbox, ExternalProcess
+from infrastructure.bus.channels import ChannelRegistry, ChannelConfig
+from infrastructure.bus.message_bus import BusPublisher, BusInbox
+from infrastructure.external.external_proc import SimExternal
+if TYPE_CHECKING:
+    import multiprocessing as mp
+    from infrastructure.bus.ipc import PipeLink
+# multiprocessing, the pipe link and the optional ExternalProcesses are imported where they are used, so a
+# thread-hosted Controller starts without them (see presentation/launcher.py).
+
+CONTROLLER_MODES = ('thread', 'process')
+
+def build_controller(reg: ChannelRegistry, external: ExternalProcess, agg_window_s: float = 10.0,
+                     agg_interval_s: float = 1.0, change_eps: Optional[Dict[str, Dict[str, float]]] = None,
+                     change_max_interval_s: float = 1.0, **kw) -> Controller:
+    events: EventPublisher = BusPublisher(reg.channel('kpi'))
+    # Change detection only thins what is published; the aggregator below still sees every sample.
+    if change_eps: events = ChangeFilter(events, change_eps, change_max_interval_s)
+    commands: CommandInbox = BusInbox(reg.channel('setup'))
+    # Command results go back to clients on 'setup_ack' where the registry has it.
+    if 'setup_ack' in reg.names(): kw.setdefault('results', BusPublisher(reg.channel('setup_ack')))
+    if 'kpi_agg' not in reg.names(): return Controller(events, commands, external, **kw)
+    # Registries with a 'kpi_agg' topic get rolling KPI statistics derived in the publish path.
+    agg = KpiAggregator(events, BusPublisher(reg.channel('kpi_agg')), window_s=agg_window_s, interval_s=agg_interval_s)
+    return Controller(agg, commands, external, stages=[agg], **kw)
+
+class ThreadHost:
+    """Controller as a daemon thread sharing the caller's registry (the original arrangement)."""
+    def __init__(self, reg: ChannelRegistry, external_factory: Callable[[], ExternalProcess] = SimExternal, **kw):
+        self.ctl = build_controller(reg, external_factory(), **kw)
+    def start(self) -> None: self.ctl.start()
+    def stop(self) -> None: self.ctl.stop()
+
+def _process_main(configs: List[ChannelConfig], conn, external_factory: Callable[[], ExternalProcess], kw: Dict) -> None:
+    from infrastructure.bus.ipc import PipeLink
+    signal.signal(signal.SIGINT, signal.SIG_IGN)   # Ctrl+C reaches the whole group; the parent stops us via the pipe
+    reg = ChannelRegistry(configs)
+    done = threading.Event()
+    link = PipeLink(reg, conn, outbound=[c.name for c in configs if c.name != 'setup'])
+    link.on_closed = done.set   # parent went away or stopped us
+    ctl = build_controller(reg, external_factory(), **kw)
+    link.start()
+    ctl.start()
+    done.wait()
+    ctl.stop()
+    link.stop()
+
+class ProcessHost:
+    """Controller (and its ExternalProcess) in a child process with its own interpreter and GIL.
+
+    The child builds a registry from the same configs; a PipeLink mirrors the outbound topics into the
+    caller's registry and 'setup' back to the child, so AsyncBridge/tk_pump consumers are unchanged.
+    `external_factory` must be picklable (a module-level class or function).
+    """
+    def __init__(self, reg: ChannelRegistry, external_factory: Callable[[], ExternalProcess] = SimExternal,
+                 start_method: str = 'spawn', **kw):
+        import multiprocessing
+        self.reg = reg
+        self._ctx = multiprocessing.get_context(start_method)
+        self._factory = external_factory
+        self._kw = kw
+        self._proc: Optional[mp.process.BaseProcess] = None
+        self._link: Optional[PipeLink] = None
+
+    def start(self) -> None:
+        if self._proc is not None: return
+        parent, child = self._ctx.Pipe(duplex=True)
+        self._proc = self._ctx.Process(target=_process_main, name='ControllerProcess', daemon=True,
+                                       args=(self.reg.configs(), child, self._factory, self._kw))
+        self._proc.start()
+        child.close()
+        from infrastructure.bus.ipc import PipeLink
+        self._link = PipeLink(self.reg, parent, outbound=['setup'])
+        self._link.start()
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._proc.pid if self._proc is not None else None
+
+    def stop(self) -> None:
+        if self._link is not None: self._link.stop()   # closing the pipe tells the child to exit
+        if self._proc is not None:
+            self._proc.join(timeout=3.0)
+            if self._proc.is_alive(): self._proc.terminate()
+
+def start_controller(reg: ChannelRegistry, mode: str = 'thread', **kw):
+    if mode not in CONTROLLER_MODES: raise ValueError(f'unknown controller mode: {mode!r}')
+    host = ThreadHost(reg, **kw) if mode == 'thread' else ProcessHost(reg, **kw)
+    host.start()
+    return host
+
+def replay_options(directory: str, speed: float = 1.0, start_s: Optional[float] = None,
+                   end_s: Optional[float] = None, loop: bool = False) -> Dict[str, Any]:
+    """start_controller() kwargs that feed the Controller from a recording instead of SimExternal."""
+    from infrastructure.external.replay import ReplayExternal, REPLAY_POLL_HZ, MAX_SPEED_POLL_HZ
+    factory = functools.partial(ReplayExternal, directory, start_s=start_s, end_s=end_s, speed=speed, loop=loop)
+    return {'external_factory': factory, 'rates': {'external': REPLAY_POLL_HZ if speed > 0 else MAX_SPEED_POLL_HZ}}
+
+def multi_source_options(specs: Sequence[str], poll_hz: float = 200.0) -> Dict[str, Any]:
+    """start_controller() kwargs that feed the Controller from several concurrent sensors (see
+    MultiSourceExternal / source_from_spec); each tick takes everything they staged since the last one."""
+    from infrastructure.external.multi_source import MultiSourceExternal
+    return {'external_factory': functools.partial(MultiSourceExternal.from_specs, list(specs)),
+            'rates': {'external': poll_hz}}
+
+def batch_sim_options(sources: int, samples: int = 1, seed: Optional[int] = 0, rate_hz: float = 20.0) -> Dict[str, Any]:
+    """start_controller() kwargs that simulate `sources` bodies at once with numpy (see BatchSimExternal):
+    each tick publishes sources x samples KPI samples and one pose per source as one batch."""
+    from infrastructure.external.batch_sim import BatchSimExternal   # numpy is only needed here
+    return {'external_factory': functools.partial(BatchSimExternal, sources, samples, seed, rate_hz),
+            'rates': {'external': rate_hz}}
@@ -1,37 +1,44 @@
 from __future__ import annotations
+from typing import Optional
 import tkinter as tk
-from application.controller import Controller
-from application.ports import EventPublisher, CommandInbox, ExternalProcess
-from infrastructure.bus.channels import ChannelRegistry, ChannelConfig
-from infrastructure.bus.message_bus import BusPublisher, BusInbox
+from infrastructure.bus.metrics import BusMetrics, MetricsReporter
+from infrastructure.bus.topics import build_registry
 from infrastructure.bus.tk_pump import tk_pump
-from infrastructure.external.external_proc import SimExternal
+from presentation.controller_host import start_controller
+from presentation.startup import StartupTimer
 from .tk_app import TkApp
 
-def build_registry() -> ChannelRegistry:
-    return ChannelRegistry([
-        ChannelConfig('kpi', maxsize=1000, policy='drop_old'),
-        ChannelConfig('setup', maxsize=10, policy='block'),
-    ])
-
-def main():
-    reg = build_registry()
-    events: EventPublisher   = BusPublisher(reg.channel('kpi'))
-    commands: CommandInbox   = BusInbox(reg.channel('setup'))
-    external: ExternalProcess = SimExternal()
-    ctl = Controller(events, commands, external)
-    ctl.start()
+def main(controller_mode: str = 'thread', record_dir: Optional[str] = None, metrics: bool = False,
+         timer: Optional[StartupTimer] = None, **host_kw):
+    timer = timer or StartupTimer()
+    reg = build_registry('gui')
+    bus_metrics = BusMetrics().attach(reg) if metrics else None
+    reporter = MetricsReporter(bus_metrics, reg.channel('metrics')).start() if bus_metrics else None
+    recorder = None
+    if record_dir:
+        from infrastructure.recording.recorder import Recorder
+        recorder = Recorder(reg, record_dir).start()
+    timer.mark('registry')
+    ctl = start_controller(reg, controller_mode, **host_kw)
+    timer.mark('controller')
 
     root = tk.Tk()
     ui = TkApp(root)
 
-    tk_pump(root, reg, ui.on_event, every_ms=30)
+    # 'setup' flows to the controller; the pump only renders outbound topics.
+    pump = tk_pump(root, reg, ui.on_event, every_ms=30, topics=['kpi', 'kpi_agg', 'metrics'], on_batch=ui.on_batch,
+                   on_frame=ui.on_frame, e2e=bus_metrics.e2e('tk') if bus_metrics else None)
 
     def on_close():
+        pump.stop()
         ctl.stop()
+        if reporter is not None: reporter.stop()
+        if recorder is not None: recorder.stop()
         root.destroy()
 
     root.protocol('WM_DELETE_WINDOW', on_close)
+    timer.mark('gui')
+    timer.done()
     root.mainloop()
 
 if __name__ == '__main__':
@@ -0,0 +1,46 @@
+from __future__ import annotations
+import tkinter as tk
+from typing import Dict, Optional, Sequence
+import numpy as np
+from .timeseries import TimeSeriesStore
+
+COLORS = ('#1f77b4', '#d62728', '#2ca02c', '#ff7f0e', '#9467bd', '#8c564b')
+
+class StripChart(tk.Canvas):
+    """Scrolling line chart of the last `span_s` seconds of a TimeSeriesStore.
+
+    One canvas line item per field is created up front and only its coordinates change on redraw, and
+    the store decimates to the canvas pixel width, so redraw cost does not depend on the span.
+    """
+    def __init__(self, master, store: TimeSeriesStore, fields: Optional[Sequence[str]] = None,
+                 span_s: float = 600.0, width: int = 480, height: int = 120, **kw):
+        super().__init__(master, width=width, height=height, bg='white', highlightthickness=0, **kw)
+        self.store = store
+        self.span_s = span_s
+        self.fields = list(fields or store.fields)
+        self._cols = [store.fields.index(f) for f in self.fields]
+        self._lines: Dict[str, int] = {f: self.create_line(0, 0, 0, 0, fill=COLORS[i % len(COLORS)])
+                                       for i, f in enumerate(self.fields)}
+        self._caption = self.create_text(4, 2, anchor='nw', fill='gray40', font=('Segoe UI', 8))
+
+    def redraw(self) -> None:
+        store = self.store
+        if not len(store): return
+        w = max(self.winfo_width(), int(self['width']))
+        h = max(self.winfo_height(), int(self['height']))
+        t1 = store.ts[(store.count - 1) % store.capacity]
+        lo, hi = store.window(t1 - self.span_s, t1)
+        x, rows = store.decimate(lo, hi, w)
+        rows = rows[:, self._cols]
+        if len(x) < 2:
+            for item in self._lines.values(): self.coords(item, 0, 0, 0, 0)
+            return
+        ymin, ymax = float(rows.min()), float(rows.max())
+        pad = (ymax - ymin) * 0.05 or 1.0
+        ymin, ymax = ymin - pad, ymax + pad
+        px = (x - (t1 - self.span_s)) * (w / self.span_s)
+        for col, item in enumerate(self._lines.values()):
+            py = (ymax - rows[:, col]) * (h / (ymax - ymin))
+            self.coords(item, np.column_stack((px, py)).ravel().tolist())
+        self.itemconfigure(self._caption, text=f"{', '.join(self.fields)}  [{ymin:.3g}, {ymax:.3g}]  "
+                                               f"last {self.span_s:g} s · {hi - lo} samples")
@@ -0,0 +1,133 @@
+from __future__ import annotations
+from typing import Sequence, Tuple
+import numpy as np
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of `n_out` points of (x, y) that keep the visual shape.
+
+    Bucket averages are computed vectorized; the sequential pick runs over plain lists, which is
+    cheaper than per-bucket numpy calls for the few points each bucket holds at plotting sizes.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3: return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    sizes = np.diff(edges)
+    avg_x = np.append(np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / sizes, x[-1])
+    avg_y = np.append(np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / sizes, y[-1])
+    xs, ys, bounds, avg_x, avg_y = x.tolist(), y.tolist(), edges.tolist(), avg_x.tolist(), avg_y.tolist()
+    out = [0]
+    a = 0
+    for i in range(n_out - 2):
+        ax, ay = xs[a], ys[a]
+        nx, ny = avg_x[i + 1], avg_y[i + 1]
+        best, best_area = bounds[i], -1.0
+        for j in range(bounds[i], bounds[i + 1]):
+            area = abs((ax - nx) * (ys[j] - ay) - (ax - xs[j]) * (ny - ay))
+            if area > best_area: best, best_area = j, area
+        a = best
+        out.append(a)
+    out.append(n - 1)
+    return np.asarray(out, dtype=np.int64)
+
+class TimeSeriesStore:
+    """Preallocated ring of (ts, field...) rows with a min/max pyramid for constant-cost plotting.
+
+    `append()` writes a whole batch with slice assignment and then refreshes the pyramid: level l holds
+    the min and max of every block of `factor**l` consecutive samples, updated only for blocks the batch
+    completed. `decimate()` picks the coarsest level that still has at least one block per pixel, so a
+    window of ten minutes reads about as many cells as a window of one second (at most width × factor).
+    Small windows (up to `lttb_ratio` samples per pixel) use LTTB on the raw samples instead.
+    """
+    def __init__(self, fields: Sequence[str], capacity: int = 60_000, factor: int = 8, levels: int = 3,
+                 lttb_ratio: int = 2):
+        block = factor ** levels
+        capacity = -(-capacity // block) * block   # blocks never straddle the ring wrap
+        self.fields: Tuple[str, ...] = tuple(fields)
+        self.capacity = capacity
+        self.factor = factor
+        self.lttb_ratio = lttb_ratio
+        self.ts = np.zeros(capacity)
+        self.values = np.zeros((capacity, len(self.fields)))
+        self.count = 0   # samples ever appended; absolute index of the next one
+        self._mins = [np.zeros((capacity // factor ** l, len(self.fields))) for l in range(1, levels + 1)]
+        self._maxs = [np.zeros_like(m) for m in self._mins]
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def append(self, ts, values) -> None:
+        ts = np.asarray(ts, dtype=float).reshape(-1)
+        values = np.asarray(values, dtype=float).reshape(len(ts), len(self.fields))
+        skipped = max(0, len(ts) - self.capacity)
+        if skipped: ts, values = ts[skipped:], values[skipped:]
+        start = self.count + skipped
+        n = len(ts)
+        pos = start % self.capacity
+        first = min(n, self.capacity - pos)
+        self.ts[pos:pos + first] = ts[:first]
+        self.values[pos:pos + first] = values[:first]
+        self.ts[:n - first] = ts[first:]
+        self.values[:n - first] = values[first:]
+        self.count = start + n
+        self._refresh_levels(start, self.count)
+
+    def _refresh_levels(self, lo: int, hi: int) -> None:
+        f = self.factor
+        src_min, src_max = self.values, self.values
+        for mins, maxs in zip(self._mins, self._maxs):
+            j1 = hi // f
+            j0 = max(lo // f, j1 - len(mins))
+            if j1 <= j0: return
+            blocks = np.arange(j0, j1)
+            units = (blocks[:, None] * f + np.arange(f)) % len(src_min)
+            dst = blocks % len(mins)
+            mins[dst] = src_min[units].min(axis=1)
+            maxs[dst] = src_max[units].max(axis=1)
+            src_min, src_max, lo, hi = mins, maxs, j0, j1
+
+    def _ts_at(self, i: int) -> float:
+        return float(self.ts[i % self.capacity])
+
+    def window(self, t0: float, t1: float) -> Tuple[int, int]:
+        """Absolute index range [lo, hi) of samples with t0 <= ts <= t1 (binary search, O(log n))."""
+        oldest = self.count - len(self)
+        return self._search(t0, oldest, False), self._search(t1, oldest, True)
+
+    def _search(self, t: float, lo: int, right: bool) -> int:
+        hi = self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            v = self._ts_at(mid)
+            if v < t or (right and v == t): lo = mid + 1
+            else: hi = mid
+        return lo
+
+    def take(self, lo: int, hi: int) -> Tuple[np.ndarray, np.ndarray]:
+        idx = np.arange(lo, hi) % self.capacity
+        return self.ts[idx], self.values[idx]
+
+    def decimate(self, lo: int, hi: int, width: int) -> Tuple[np.ndarray, np.ndarray]:
+        """At most ~2 × width points (x, rows) for drawing samples [lo, hi) across `width` pixels."""
+        n = hi - lo
+        width = max(1, width)
+        if n <= width * self.lttb_ratio:
+            x, ys = self.take(lo, hi)
+            if n <= width: return x, ys
+            keep = lttb(x, ys[:, 0], width)
+            return x[keep], ys[keep]
+        level, unit = 0, 1
+        while level < len(self._mins) and unit * self.factor <= n / width:
+            level, unit = level + 1, unit * self.factor
+        u0, u1 = -(-lo // unit), hi // unit   # whole blocks only; edges lose < 1 block
+        units = np.arange(u0, u1)
+        if level == 0:
+            mins = maxs = self.values[units % self.capacity]
+        else:
+            mins = self._mins[level - 1][units % len(self._mins[level - 1])]
+            maxs = self._maxs[level - 1][units % len(self._maxs[level - 1])]
+        starts = np.unique(np.linspace(0, len(units), width, endpoint=False).astype(np.int64))
+        xb = self.ts[(units[starts] * unit) % self.capacity]
+        ys = np.empty((2 * len(starts), len(self.fields)))
+        ys[0::2] = np.minimum.reduceat(mins, starts, axis=0)
+        ys[1::2] = np.maximum.reduceat(maxs, starts, axis=0)
+        return np.repeat(xb, 2), ys
@@ -1,14 +1,54 @@
 from __future__ import annotations
 import tkinter as tk
+from typing import Dict, List
 from domain.messages import Envelope
+try:
+    import numpy as np
+    from .strip_chart import StripChart
+    from .timeseries import TimeSeriesStore
+except ImportError:   # numpy is optional: without it the GUI shows the latest value only
+    np = None
 
 class TkApp:
-    def __init__(self, root: tk.Tk):
+    def __init__(self, root: tk.Tk, span_s: float = 600.0, max_rate_hz: float = 100.0):
         self.root = root
         self.root.title('KPI Telemetry')
         self.label = tk.Label(root, text='waiting…', width=40, font=('Segoe UI', 14))
         self.label.pack(padx=10, pady=10)
+        self.chart = None
+        if np is not None:
+            self.kpi_store = TimeSeriesStore(['value'], capacity=int(span_s * max_rate_hz))
+            self.chart = StripChart(root, self.kpi_store, span_s=span_s)
+            self.chart.pack(fill='x', expand=True, padx=10)
+        self.agg_label = tk.Label(root, text='', width=60)
+        self.agg_label.pack(padx=10, pady=(5, 0))
+        self.status = tk.Label(root, text='', width=60, fg='gray40')
+        self.status.pack(padx=10, pady=(0, 10))
+        self.metrics_label = tk.Label(root, text='', width=80, fg='gray40')   # filled by the 'metrics' topic, if enabled
+        self.metrics_label.pack(padx=10, pady=(0, 10))
+
+    def on_batch(self, topic: str, envs: List[Envelope]):
+        # Every sample goes into the history; on_event only sees the newest one per frame.
+        if topic == 'kpi' and self.chart is not None:
+            self.kpi_store.append(np.fromiter((e.ts for e in envs), float, len(envs)),
+                                  np.fromiter((e.payload['value'] for e in envs), float, len(envs)))
 
     def on_event(self, env: Envelope):
         if env.topic == 'kpi':
             self.label.config(text=f"KPI: {env.payload['value']:.3f}")
+            if self.chart is not None: self.chart.redraw()
+        elif env.topic == 'metrics':
+            kpi, tk_e2e = env.payload['channels'].get('kpi'), env.payload['e2e'].get('tk')
+            if kpi is None: return
+            text = f"kpi: {kpi['puts']} put · {kpi['drops']} dropped · high water {kpi['high_water']}"
+            if kpi['dwell']['count']: text += f" · dwell p99 {kpi['dwell']['p99_ms']:.2f} ms"
+            if tk_e2e and tk_e2e['count']: text += f" · render p99 {tk_e2e['p99_ms']:.1f} ms"
+            self.metrics_label.config(text=text)
+        elif env.topic == 'kpi_agg' and env.payload.window == 'sliding':
+            a = env.payload
+            self.agg_label.config(text=f"last {a.span_s:g} s: mean {a.mean:.3f} ± {a.std:.3f} · "
+                                       f"min {a.min:.3f} · max {a.max:.3f} · p99 {a.p99:.3f} · {a.rate_hz:.1f} Hz")
+
+    def on_frame(self, stats: Dict[str, float]):
+        self.status.config(text=f"frame {stats['frame_ms']:.1f} ms · every {stats['interval_ms']} ms · "
+                                f"dropped updates {stats['dropped_updates']}")
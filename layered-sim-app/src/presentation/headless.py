@@ -0,0 +1,36 @@
+"""Controller without a front end (containers, soak tests): registry, Controller and the optional recorder
+and bus metrics, until SIGINT/SIGTERM. Neither tkinter nor websockets nor asyncio is imported."""
+from __future__ import annotations
+import signal, threading
+from typing import Optional
+from infrastructure.bus.topics import build_registry
+from presentation.controller_host import start_controller
+from presentation.startup import StartupTimer
+
+def main(controller_mode: str = 'thread', record_dir: Optional[str] = None, metrics: bool = False,
+         timer: Optional[StartupTimer] = None, **host_kw):
+    timer = timer or StartupTimer()
+    reg = build_registry('headless')
+    bus_metrics = reporter = recorder = None
+    if metrics:
+        from infrastructure.bus.metrics import BusMetrics, MetricsReporter
+        bus_metrics = BusMetrics().attach(reg)
+        reporter = MetricsReporter(bus_metrics, reg.channel('metrics')).start()
+    if record_dir:
+        from infrastructure.recording.recorder import Recorder
+        recorder = Recorder(reg, record_dir).start()
+    timer.mark('registry')
+    ctl = start_controller(reg, controller_mode, **host_kw)
+    timer.mark('controller')
+    timer.done()
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM): signal.signal(sig, lambda *_: stop.set())
+    print(f'headless controller ({controller_mode}) up in {timer.total_ms():.1f} ms', flush=True)
+    try:
+        while not stop.wait(0.5): pass
+    finally:
+        ctl.stop()
+        if reporter is not None: reporter.stop()
+        if recorder is not None: recorder.stop()
+        if bus_metrics is not None: print(bus_metrics.text(), end='')
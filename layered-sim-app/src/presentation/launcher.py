@@ -0,0 +1,99 @@
+"""Single entry point for every mode: gui, server, headless and replay (server fed from a recording).
+
+    python run.py [--mode headless] [--config run.json] [--timing] [options]
+
+The mode and options come from the command line, from a JSON config file whose keys are the option names
+(`{"mode": "headless", "controller": "process", "metrics": true}`), or both, the command line winning.
+Only the chosen backend is imported: tkinter for gui, asyncio and websockets for server/replay, neither for
+headless. `--workers N` serves server/replay clients from N processes (presentation/server/workers.py).
+Registries come from the topic table in infrastructure/bus/topics.py. `--timing` prints how long each
+startup phase took, measured from the moment this module was imported.
+"""
+from __future__ import annotations
+import time
+T0 = time.perf_counter()   # startup timing starts here, before anything else is imported
+import argparse, json
+from typing import Any, Dict, List, Optional
+
+MODES = ('gui', 'server', 'headless', 'replay')
+
+def build_parser(mode: Optional[str] = None) -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--mode', choices=MODES, default=mode or 'server',
+                    help='front end to run (replay: the server fed from --replay DIR)')
+    ap.add_argument('--config', metavar='FILE', help='JSON file with option defaults, e.g. {"mode": "headless"}')
+    ap.add_argument('--timing', action='store_true', help='print a startup-phase timing breakdown to stderr')
+    ap.add_argument('--controller', choices=('thread', 'process'), default='thread',
+                    help='run the Controller in a background thread or in a separate process')
+    ap.add_argument('--record', metavar='DIR', help='record all outbound topics to a segmented log in DIR')
+    ap.add_argument('--replay', metavar='DIR', help='feed the Controller from a recording instead of the simulator')
+    ap.add_argument('--speed', type=float, default=1.0, help='replay speed factor (0 = as fast as possible)')
+    ap.add_argument('--start', type=float, help='replay from this many seconds into the recording')
+    ap.add_argument('--end', type=float, help='replay up to this many seconds into the recording')
+    ap.add_argument('--source', action='append', metavar='SPEC',
+                    help="read sensors concurrently instead of the simulator (repeatable): "
+                         "'sim[:HZ]', 'udp:HOST:PORT', 'tcp:HOST:PORT' or 'cmd:COMMAND'")
+    ap.add_argument('--sim-sources', type=int, metavar='K',
+                    help='simulate K sources at once with numpy (kpi and pose, see batch_sim.py)')
+    ap.add_argument('--sim-samples', type=int, default=1, metavar='M', help='KPI samples per source per tick')
+    ap.add_argument('--seed', type=int, default=0, help='random seed for --sim-sources')
+    ap.add_argument('--metrics', action='store_true', help="instrument the bus and publish a 'metrics' topic every second")
+    ap.add_argument('--workers', type=int, default=1, metavar='N',
+                    help='server/replay: serve WebSocket clients from N processes sharing the port (Linux)')
+    ap.add_argument('--kpi-epsilon', type=float, help='publish a KPI sample only if it moved more than this (heartbeat 1 s)')
+    return ap
+
+def parse_args(argv: Optional[List[str]] = None, mode: Optional[str] = None) -> argparse.Namespace:
+    ap = build_parser(mode)
+    a = ap.parse_args(argv)
+    if a.config:
+        with open(a.config) as f: config: Dict[str, Any] = json.load(f)
+        known = set(vars(ap.parse_args([])))
+        unknown = sorted(k for k in config if k.replace('-', '_') not in known)
+        if unknown: ap.error(f'unknown option(s) in {a.config}: {", ".join(unknown)}')
+        ap.set_defaults(**{k.replace('-', '_'): v for k, v in config.items()})
+        a = ap.parse_args(argv)   # the command line overrides the file
+    if sum(map(bool, (a.replay, a.source, a.sim_sources))) > 1:
+        ap.error('--replay, --source and --sim-sources are mutually exclusive')
+    if a.mode == 'replay' and not a.replay: ap.error('--mode replay needs --replay DIR')
+    if a.workers < 1 or (a.workers > 1 and a.mode not in ('server', 'replay')):
+        ap.error('--workers N (N >= 1) applies to the server and replay modes')
+    return a
+
+def host_options(a: argparse.Namespace) -> Dict[str, Any]:
+    """start_controller() kwargs for the chosen ExternalProcess; only its module gets imported."""
+    from presentation import controller_host as ch
+    host_kw: Dict[str, Any] = {}
+    if a.replay: host_kw = ch.replay_options(a.replay, a.speed, a.start, a.end)
+    if a.source: host_kw = ch.multi_source_options(a.source)
+    if a.sim_sources: host_kw = ch.batch_sim_options(a.sim_sources, a.sim_samples, a.seed)
+    if a.kpi_epsilon is not None: host_kw['change_eps'] = {'kpi': {'value': a.kpi_epsilon}}
+    return host_kw
+
+def main(argv: Optional[List[str]] = None, mode: Optional[str] = None) -> None:
+    from presentation.startup import StartupTimer
+    timer = StartupTimer(T0)
+    a = parse_args(argv, mode)
+    timer.echo = a.timing
+    timer.mark('config')
+    host_kw = host_options(a)
+    timer.mark('import core')
+    run_kw = dict(controller_mode=a.controller, record_dir=a.record, metrics=a.metrics, timer=timer, **host_kw)
+    if a.mode == 'headless':
+        from presentation.headless import main as run
+        timer.mark('import headless')
+        run(**run_kw)
+    elif a.mode == 'gui':
+        from presentation.gui.main_gui import main as run
+        timer.mark('import gui')
+        run(**run_kw)
+    elif a.workers > 1:
+        from presentation.server.workers import main as run
+        timer.mark('import server')
+        run(workers=a.workers, **run_kw)
+    else:
+        import asyncio
+        from presentation.server.main_server import main as run
+        timer.mark('import server')
+        try: asyncio.run(run(**run_kw))
+        except KeyboardInterrupt: pass   # main() has already shut everything down
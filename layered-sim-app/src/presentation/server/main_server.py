@@ -1,42 +1,47 @@
 from __future__ import annotations
+from typing import Optional
 import asyncio
-from application.controller import Controller
-from application.ports import EventPublisher, CommandInbox, ExternalProcess
-from domain.messages import Envelope
-from infrastructure.bus.channels import ChannelRegistry, ChannelConfig
-from infrastructure.bus.message_bus import BusPublisher, BusInbox
 from infrastructure.bus.async_bridge import AsyncBridge
-from infrastructure.external.external_proc import SimExternal
+from infrastructure.bus.commands import CommandIngress
+from infrastructure.bus.metrics import BusMetrics, MetricsReporter
+from infrastructure.bus.topics import build_registry
+from presentation.controller_host import start_controller
+from presentation.startup import StartupTimer
 from .websocket_app import run_server
 
-def build_registry() -> ChannelRegistry:
-    return ChannelRegistry([
-        ChannelConfig('kpi', maxsize=1000, policy='drop_old'),
-        ChannelConfig('setup', maxsize=10, policy='block'),
-    ])
-
-async def main():
-    reg = build_registry()
-    bridge = AsyncBridge(reg)
+async def main(controller_mode: str = 'thread', record_dir: Optional[str] = None, metrics: bool = False,
+               timer: Optional[StartupTimer] = None, **host_kw):
+    timer = timer or StartupTimer()
+    reg = build_registry('server')
+    # Off by default: unattached channels skip all counting and timestamping.
+    bus_metrics = BusMetrics().attach(reg) if metrics else None
+    reporter = MetricsReporter(bus_metrics, reg.channel('metrics')).start() if bus_metrics else None
+    bridge = AsyncBridge(reg, topics=[n for n in reg.names() if n != 'setup'])
     bridge.start()
 
-    events: EventPublisher   = BusPublisher(reg.channel('kpi'))
-    commands: CommandInbox   = BusInbox(reg.channel('setup'))
-    external: ExternalProcess = SimExternal()
-    ctl = Controller(events, commands, external)
-    ctl.start()
-
-    def on_setup(raw: str):
-        reg.channel('setup').put(Envelope(topic='setup', payload={'raw': raw}, ts=0.0))
+    recorder = None
+    if record_dir:
+        from infrastructure.recording.recorder import Recorder
+        recorder = Recorder(reg, record_dir).start()
+    timer.mark('registry')
+    ctl = start_controller(reg, controller_mode, **host_kw)
+    timer.mark('controller')
 
-    server, btask = await run_server(bridge, on_setup)
-    print('WebSocket server on ws://127.0.0.1:8765')
+    # Never blocks the event loop: commands are queued by priority and answered on 'setup_ack'.
+    ingress = CommandIngress(reg.channel('setup'))
+    server, btask, fanout = await run_server(bridge, ingress.submit, metrics=bus_metrics)
+    timer.mark('server')
+    print('WebSocket server on ws://127.0.0.1:8765' + (' (stats: http://127.0.0.1:8765/stats)' if bus_metrics else ''))
+    timer.done()
 
     try:
         await asyncio.Future()
     finally:
         btask.cancel()
+        await fanout.close()
         server.close()
         await server.wait_closed()
         await bridge.stop()
         ctl.stop()
+        if reporter is not None: reporter.stop()
+        if recorder is not None: recorder.stop()
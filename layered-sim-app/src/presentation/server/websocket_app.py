@@ -1,33 +1,139 @@
 from __future__ import annotations
 import asyncio, json, websockets
+from urllib.parse import urlsplit, parse_qs
 from websockets.server import WebSocketServerProtocol
-from typing import Callable, Set, Tuple
+from typing import Any, Callable, Dict, Optional, Sequence, Set, Tuple
 from domain.messages import Envelope
 from infrastructure.bus.async_bridge import AsyncBridge
+from infrastructure.bus.codec import EncodedCache, encode
+from infrastructure.bus.delta import DeltaCodec
+from infrastructure.bus.fanout import ClientSession, FanOut, FANOUT_POLICIES
+from infrastructure.bus.metrics import BusMetrics
+from infrastructure.bus.snapshot import SnapshotStore
 
-async def broadcaster(bridge: AsyncBridge, clients: Set[WebSocketServerProtocol]):
-    q = bridge.queues['kpi']
-    while True:
-        env: Envelope = await q.get()
-        msg = json.dumps({'topic': env.topic, 'payload': env.payload, 'ts': env.ts})
-        dead = []
-        for ws in list(clients):
-            try: await ws.send(msg)
-            except Exception: dead.append(ws)
-        for ws in dead: clients.discard(ws)
+async def broadcaster(bridge: AsyncBridge, fanout: FanOut, cache: EncodedCache, max_batch: int = 256,
+                      store: Optional[SnapshotStore] = None, direct: Sequence[str] = ('setup_ack',)):
+    # `direct` topics are replies addressed to one client (payload.client): not broadcast, numbered or kept.
+    async def forward(topic: str, q: asyncio.Queue[Envelope]):
+        while True:
+            batch = [await q.get()]
+            while len(batch) < max_batch and not q.empty(): batch.append(q.get_nowait())
+            if topic in direct:
+                for env in batch: fanout.publish_to(env.payload['client'], env, cache)
+                continue
+            seq0 = store.append(topic, batch) if store is not None else None
+            fanout.publish_batch(topic, batch, cache, seq0)
+    await asyncio.gather(*(forward(t, q) for t, q in bridge.queues.items()))
 
-async def run_server(bridge: AsyncBridge, on_setup: Callable[[str], None]):
-    clients: Set[WebSocketServerProtocol] = set()
+def _client_options(ws: WebSocketServerProtocol) -> Dict[str, str]:
+    # Per-client settings ride on the URL:
+    # ws://host:8765/?policy=latest&maxsize=64&topics=kpi,pose&history=30&rate=kpi:2:mean,pose:10
+    path = getattr(ws, 'path', None) or getattr(getattr(ws, 'request', None), 'path', '') or ''
+    return {k: v[-1] for k, v in parse_qs(urlsplit(path).query).items()}
 
+def _parse_control(text: Any) -> Optional[Dict[str, Any]]:
+    # Session commands share the setup path with controller commands; only {"cmd": ...} objects
+    # the server understands are intercepted, everything else goes to on_setup unchanged:
+    #   {"cmd": "subscribe", "topics": [...]}, {"cmd": "format", "format": "json", "delta": true},
+    #   {"cmd": "ack", "topic": "kpi", "seq": 120} (keyframe received, see delta.py; no reply),
+    #   {"cmd": "rate", "topic": "kpi", "hz": 2, "reduce": "mean"} (at most 2/s, see downsample.py; hz 0 lifts it)
+    if not isinstance(text, str) or not text.startswith('{'): return None
+    try: msg = json.loads(text)
+    except ValueError: return None
+    return msg if isinstance(msg, dict) and msg.get('cmd') in ('subscribe', 'format', 'ack', 'rate') else None
+
+def _apply_control(session: ClientSession, msg: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    try:
+        if msg['cmd'] == 'ack':
+            session.ack(str(msg['topic']), int(msg['seq'])); return None
+        if msg['cmd'] == 'subscribe': session.subscribe(msg.get('topics') or [])
+        elif msg['cmd'] == 'format':
+            session.set_format(msg.get('format', 'json'))
+            session.delta = bool(msg.get('delta', session.delta))
+        elif msg['cmd'] == 'rate':
+            for topic in msg.get('topics') or [msg['topic']]: session.set_rate(str(topic), msg.get('hz'), msg.get('reduce', 'latest'))
+    except (KeyError, TypeError, ValueError) as e:
+        return {'topic': 'control', 'ok': False, 'cmd': msg['cmd'], 'error': str(e)}
+    return {'topic': 'control', 'ok': True, 'cmd': msg['cmd'], 'topics': sorted(session.topics), 'format': session.fmt,
+            'delta': session.delta, 'rates': session.stats()['rates']}
+
+def _apply_rates(session: ClientSession, opts: Dict[str, str]) -> None:
+    # ?rate=TOPIC:HZ[:REDUCER],... ; malformed entries are ignored like other bad URL options.
+    for item in filter(None, opts.get('rate', '').split(',')):
+        topic, _, rest = item.partition(':')
+        hz, _, reduce = rest.partition(':')
+        try: session.set_rate(topic, float(hz), reduce or 'latest')
+        except ValueError: pass
+
+def _history_s(opts: Dict[str, str]) -> float:
+    try: return max(0.0, float(opts.get('history', 0)))
+    except ValueError: return 0.0
+
+def _snapshot_text(store: SnapshotStore, session: ClientSession, history_s: float = 0.0,
+                   exclude: Set[str] = frozenset()) -> Optional[str]:
+    topics = [t for t in store.topics() if session.wants(t) and t not in exclude]
+    return json.dumps(store.snapshot(topics, history_s)) if topics else None
+
+def _stats_route(metrics: BusMetrics) -> Callable[..., Any]:
+    # Plain-text GET /stats on the WebSocket port (e.g. curl http://127.0.0.1:8765/stats). Handles both the
+    # legacy process_request(path, headers) hook and the newer process_request(connection, request) one.
+    def process_request(*args):
+        if hasattr(args[0], 'respond'):
+            conn, request = args
+            return conn.respond(200, metrics.text()) if urlsplit(request.path).path == '/stats' else None
+        if urlsplit(args[0]).path != '/stats': return None
+        return 200, [('Content-Type', 'text/plain; charset=utf-8')], metrics.text().encode()
+    return process_request
+
+async def serve_clients(fanout: FanOut, store: SnapshotStore, on_setup: Callable[[Any, str], Envelope],
+                        metrics: Optional[BusMetrics] = None, host: str = '127.0.0.1', port: int = 8765,
+                        **serve_kw) -> object:
+    """The WebSocket endpoint: greets, joins `fanout` with the URL options, sends the join snapshot from
+    `store` and serves the setup path. Whoever feeds `fanout` and `store` (the broadcaster, or a worker's
+    feed in presentation/server/workers.py) is up to the caller."""
     async def handler(ws: WebSocketServerProtocol):
         await ws.send('hello')
-        clients.add(ws)
+        opts = _client_options(ws)
+        policy = opts.get('policy') if opts.get('policy') in FANOUT_POLICIES else None
+        maxsize = int(opts['maxsize']) if opts.get('maxsize', '').isdigit() else None
+        # Joining and snapshotting happen in one loop step (no await between them), so the snapshot ends
+        # right before the first live message the session receives.
+        session = fanout.add(ws, ws.send, ws.close, maxsize=maxsize, policy=policy, name='%s:%s' % ws.remote_address[:2])
+        if opts.get('topics'): session.subscribe(opts['topics'].split(','))
+        _apply_rates(session, opts)
+        snap = _snapshot_text(store, session, _history_s(opts))
+        if snap is not None: session.offer(snap, 'snapshot')
         try:
             async for text in ws:
-                on_setup(text)
+                ctl = _parse_control(text)
+                if ctl is None:
+                    # Everything else is a controller command; on_setup queues it without blocking and
+                    # returns the immediate 'setup_ack' for this client.
+                    reply = on_setup(text, session.name)
+                    session.offer(encode(reply, session.fmt), reply.topic, reply.ts)
+                    continue
+                before = {t for t in store.topics() if session.wants(t)}
+                reply = _apply_control(session, ctl)
+                if reply is not None: session.offer(json.dumps(reply), 'control')
+                # Topics added by a subscribe start with their last value, like a fresh connection.
+                snap = _snapshot_text(store, session, exclude=before) if ctl['cmd'] == 'subscribe' else None
+                if snap is not None: session.offer(snap, 'snapshot')
         finally:
-            clients.discard(ws)
+            await fanout.remove(ws)
+
+    if metrics is not None: serve_kw['process_request'] = _stats_route(metrics)
+    return await websockets.serve(handler, host, port, **serve_kw)
 
-    server = await websockets.serve(handler, '127.0.0.1', 8765)
-    btask = asyncio.create_task(broadcaster(bridge, clients))
-    return server, btask
+async def run_server(bridge: AsyncBridge, on_setup: Callable[[Any, str], Envelope],
+                     client_maxsize: int = 256, client_policy: str = 'drop_old',
+                     history: int = 1024, history_s: float = 60.0,
+                     delta_topics: Sequence[str] = ('kpi',),
+                     metrics: Optional[BusMetrics] = None, host: str = '127.0.0.1',
+                     port: int = 8765) -> Tuple[object, asyncio.Task, FanOut]:
+    fanout = FanOut(maxsize=client_maxsize, policy=client_policy, deltas=DeltaCodec(delta_topics),
+                    e2e=metrics.e2e('ws') if metrics is not None else None)
+    cache = EncodedCache()
+    store = SnapshotStore(history=history, history_s=history_s)
+    server = await serve_clients(fanout, store, on_setup, metrics, host, port)
+    btask = asyncio.create_task(broadcaster(bridge, fanout, cache, store=store))
+    return server, btask, fanout
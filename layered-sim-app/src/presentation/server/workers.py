@@ -0,0 +1,126 @@
+"""Multi-worker server: one Controller plus N WebSocket worker processes sharing one port.
+
+    python run.py --mode server --workers 4
+
+This process keeps the registry, the Controller (thread or process, as usual), the recorder and the bus
+metrics, plus an EncodedFeed that numbers, encodes and pickles each outbound batch once and sends the same
+bytes to every worker. Each worker has its own interpreter and event loop and binds the port with
+SO_REUSEPORT, so the kernel spreads new connections over the workers. Within a worker, clients are served
+exactly as by the single-process server (subscriptions, formats, rate caps, deltas, join snapshots).
+Commands go to the worker's own 'setup' channel, which answers 'queued' at once, and are forwarded to the
+Controller. Its 'setup_ack' results reach every worker, and the one holding the client delivers them.
+Needs SO_REUSEPORT (Linux); workers do not serve /stats.
+"""
+from __future__ import annotations
+import asyncio, os, signal, socket, threading
+from typing import List, Optional
+from infrastructure.bus.channels import ChannelConfig, ChannelRegistry
+from infrastructure.bus.codec import EncodedCache
+from infrastructure.bus.commands import CommandIngress
+from infrastructure.bus.delta import DeltaCodec
+from infrastructure.bus.fanout import FanOut
+from infrastructure.bus.snapshot import SnapshotStore
+from infrastructure.bus.topics import build_registry
+from infrastructure.bus.worker_link import Batch, EncodedFeed, WorkerFeed
+from presentation.controller_host import start_controller
+from presentation.startup import StartupTimer
+from .websocket_app import serve_clients
+
+WORKER_READY_S = 10.0   # how long a worker may take to start and bind
+FORMATS_EVERY_S = 0.5   # how often a worker re-checks which formats its clients use
+
+async def serve_worker(conn, configs: List[ChannelConfig], host: str = '127.0.0.1', port: int = 8765,
+                       delta_topics=('kpi',)) -> None:
+    loop = asyncio.get_running_loop()
+    reg = ChannelRegistry(configs)
+    fanout = FanOut(deltas=DeltaCodec(delta_topics))
+    cache = EncodedCache()
+    store = SnapshotStore()
+    closed = asyncio.Event()
+
+    def deliver(batch: Batch) -> None:
+        for topic, seq0, envs, encoded in batch:
+            if seq0 is None:   # a reply for one client, which may be on another worker
+                for env in envs: fanout.publish_to(env.payload['client'], env, cache)
+                continue
+            store.append(topic, envs, seq0)
+            # Seed the cache too, so downsampled clients reuse the controller's encodings.
+            for fmt, msgs in encoded.items():
+                if len(msgs) == len(envs):
+                    for i, (env, msg) in enumerate(zip(envs, msgs)): cache.put(env, fmt, msg, seq0 + i)
+            fanout.publish_batch(topic, envs, cache, seq0, encoded)
+
+    server = await serve_clients(fanout, store, CommandIngress(reg.channel('setup')).submit, host=host, port=port,
+                                 reuse_port=True)
+    conn.send(('ready', os.getpid()))
+    feed = WorkerFeed(conn, reg.channel('setup'), deliver, loop, on_closed=closed.set).start()
+    formats = None
+    try:
+        while not closed.is_set():
+            if fanout.formats() != formats:
+                formats = fanout.formats()
+                feed.report_formats(formats)
+            try: await asyncio.wait_for(closed.wait(), FORMATS_EVERY_S)
+            except asyncio.TimeoutError: pass
+    finally:
+        await fanout.close()
+        server.close()
+        await server.wait_closed()
+        feed.stop()
+
+def _worker_main(conn, configs: List[ChannelConfig], host: str, port: int) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)   # Ctrl+C reaches the whole group; the parent stops us via the pipe
+    asyncio.run(serve_worker(conn, configs, host, port))
+
+def main(workers: int = 2, controller_mode: str = 'thread', record_dir: Optional[str] = None, metrics: bool = False,
+         timer: Optional[StartupTimer] = None, host: str = '127.0.0.1', port: int = 8765, **host_kw):
+    if not hasattr(socket, 'SO_REUSEPORT'): raise SystemExit('--workers needs SO_REUSEPORT (Linux)')
+    import multiprocessing
+    timer = timer or StartupTimer()
+    reg = build_registry('server')
+    bus_metrics = reporter = recorder = None
+    if metrics:
+        from infrastructure.bus.metrics import BusMetrics, MetricsReporter
+        bus_metrics = BusMetrics().attach(reg)
+        reporter = MetricsReporter(bus_metrics, reg.channel('metrics')).start()
+    if record_dir:
+        from infrastructure.recording.recorder import Recorder
+        recorder = Recorder(reg, record_dir).start()
+    timer.mark('registry')
+    ctl = start_controller(reg, controller_mode, **host_kw)
+    timer.mark('controller')
+
+    ctx = multiprocessing.get_context('spawn')
+    setup = [c for c in reg.configs() if c.name == 'setup']
+    conns, procs = [], []
+    for i in range(workers):
+        parent, child = ctx.Pipe(duplex=True)
+        proc = ctx.Process(target=_worker_main, name=f'WsWorker-{i}', daemon=True, args=(child, setup, host, port))
+        proc.start()
+        child.close()
+        conns.append(parent); procs.append(proc)
+    feed = None
+    try:
+        for conn in conns:
+            if not conn.poll(WORKER_READY_S): raise SystemExit('a WebSocket worker did not start in time')
+            conn.recv()   # ('ready', pid)
+        feed = EncodedFeed(reg, conns, outbound=[n for n in reg.names() if n != 'setup']).start()
+        timer.mark('workers')
+        timer.done()
+        print(f'WebSocket server on ws://{host}:{port} ({workers} workers)', flush=True)
+
+        stop = threading.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM): signal.signal(sig, lambda *_: stop.set())
+        while not stop.wait(0.5):
+            if not any(p.is_alive() for p in procs): break
+    except EOFError:
+        raise SystemExit(f'a WebSocket worker failed to start (is {host}:{port} taken?)')
+    finally:
+        if feed is not None: feed.stop()   # closing the pipes tells the workers to exit
+        for conn in conns: conn.close()
+        for proc in procs:
+            proc.join(timeout=3.0)
+            if proc.is_alive(): proc.terminate()
+        ctl.stop()
+        if reporter is not None: reporter.stop()
+        if recorder is not None: recorder.stop()
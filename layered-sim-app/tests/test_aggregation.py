@@ -0,0 +1,24 @@
+"""KpiAggregator keeps windows only for sources that reported within the sliding window."""
+from domain.messages import Envelope, Telemetry
+from application.aggregation import KpiAggregator
+
+class Sink:
+    def __init__(self): self.envs = []
+    def publish(self, env): self.envs.append(env)
+
+def test_silent_sources_expire():
+    now = [100.0]
+    out = Sink()
+    agg = KpiAggregator(Sink(), out, window_s=10.0, interval_s=1.0, clock=lambda: now[0])
+    kpi = lambda source, ts: Envelope(topic='kpi', payload=Telemetry(source=source, value=1.0), ts=ts)
+    agg.publish_batch([kpi('a', 100.0), kpi('b', 100.0)])
+    agg.flush()
+    assert {(e.payload.source, e.payload.window) for e in out.envs} == \
+           {('a', 'tumbling'), ('a', 'sliding'), ('b', 'tumbling'), ('b', 'sliding')}
+    for t in range(101, 112):   # only 'a' keeps reporting
+        now[0] = float(t)
+        agg.publish(kpi('a', now[0]))
+        out.envs.clear()
+        agg.flush()
+    assert {e.payload.source for e in out.envs} == {'a'}
+    assert list(agg._sources) == ['a']
@@ -0,0 +1,20 @@
+"""EncodedCache: one encoding per envelope, format and seq."""
+import json
+from domain.messages import Envelope, Telemetry
+from infrastructure.bus.codec import EncodedCache
+
+def test_seq_is_part_of_the_key():
+    cache = EncodedCache()
+    env = Envelope(topic='kpi', payload=Telemetry(source='a', value=1.0), ts=0.0)
+    assert json.loads(cache.get(env, 'json', 5))['seq'] == 5
+    assert json.loads(cache.get(env, 'json', 7))['seq'] == 7
+    assert 'seq' not in json.loads(cache.get(env, 'json'))
+    assert cache.get(env, 'json', 5) is cache.get(env, 'json', 5)
+    assert (cache.hits, cache.misses) == (2, 3)
+
+def test_put_seeds_one_seq():
+    cache = EncodedCache()
+    env = Envelope(topic='kpi', payload=Telemetry(source='a', value=1.0), ts=0.0)
+    cache.put(env, 'json', 'seeded', 3)
+    assert cache.get(env, 'json', 3) == 'seeded'
+    assert json.loads(cache.get(env, 'json', 4))['seq'] == 4
@@ -0,0 +1,27 @@
+"""Controller wiring of pipeline stages onto its scheduler."""
+import pytest
+from application.aggregation import KpiAggregator
+from application.controller import Controller
+from application.scheduler import Scheduler
+
+class Sink:
+    def publish(self, env): pass
+
+class NoCommands:
+    def drain(self): return []
+
+class NoExternal:
+    def poll(self): return None
+
+def test_stages_of_one_class_get_their_own_task():
+    fast = KpiAggregator(Sink(), Sink(), window_s=5.0, interval_s=0.5)
+    slow = KpiAggregator(fast, Sink(), window_s=60.0, interval_s=10.0)
+    ctl = Controller(slow, NoCommands(), NoExternal(), stages=[fast, slow])
+    stats = ctl.loop_stats()
+    assert list(stats) == ['commands', 'external', 'KpiAggregator', 'KpiAggregator.1']
+    assert [t.period for t in ctl.scheduler.tasks[2:]] == [0.5, 10.0]
+
+def test_scheduler_rejects_duplicate_names():
+    s = Scheduler()
+    s.add('a', 1.0, lambda: None)
+    with pytest.raises(ValueError): s.add('a', 2.0, lambda: None)
@@ -0,0 +1,61 @@
+"""DeltaCodec on the topics the layered app actually publishes."""
+import asyncio, json
+from domain.messages import Envelope, PoseMsg, Telemetry
+from infrastructure.bus.codec import EncodedCache
+from infrastructure.bus.delta import DeltaCodec, frame_dict
+from infrastructure.bus.fanout import FanOut
+
+def kpi(value, ts):
+    return Envelope(topic='kpi', payload=Telemetry(source='sim', value=value), ts=ts)
+
+def test_kpi_is_a_delta_topic_by_default():
+    codec = DeltaCodec()
+    assert codec.handles('kpi')
+    frames = codec.frames('kpi', [kpi(1.0, 0.0), kpi(1.5, 0.1), kpi(1.5, 0.2)], seq0=10)
+    assert frames == [(10, None), (10, {'value': 1.5}), (10, {'value': 1.5})]
+    assert frame_dict(kpi(1.0, 0.0), 10, frames[0])['key'] is True
+    assert frame_dict(kpi(1.5, 0.1), 11, frames[1]) == {'topic': 'kpi', 'ts': 0.1, 'seq': 11, 'base': 10,
+                                                       'delta': {'value': 1.5}}
+
+def test_keyframes_are_kept_per_envelope_topic():
+    # Batch simulation publishes 'pose' envelopes on the 'kpi' channel; each envelope topic keeps its own keyframe.
+    pose = lambda x, ts: Envelope(topic='pose', payload=PoseMsg(x, 0, 0, 0, 0, 0, source='sim'), ts=ts)
+    codec = DeltaCodec()
+    frames = codec.frames('kpi', [kpi(1.0, 0.0), pose(2.0, 0.0), kpi(1.1, 0.1), pose(2.5, 0.1)], seq0=1)
+    assert frames == [(1, None), (2, None), (1, {'value': 1.1}), (2, {'x': 2.5})]
+
+def test_keyframe_every():
+    codec = DeltaCodec(keyframe_every=2)
+    frames = codec.frames('kpi', [kpi(float(i), 0.0) for i in range(4)], seq0=1)
+    assert [f[1] is None for f in frames] == [True, False, True, False]
+
+def test_keyframes_are_kept_per_source():
+    # Batch simulation: every body's pose is diffed against its own keyframe, not the previous body's.
+    pose = lambda src, x, ts: Envelope(topic='pose', payload=PoseMsg(x, 1, 2, 0, 0, 0, source=src), ts=ts)
+    codec = DeltaCodec(keyframe_every=3)
+    batch = lambda seq0, ts: codec.frames('kpi', [pose('sim-000', 1.0, ts), pose('sim-001', 5.0, ts)], seq0)
+    assert batch(1, 0.0) == [(1, None), (2, None)]
+    assert batch(3, 0.1) == [(1, {}), (2, {})]
+    assert batch(5, 0.2) == [(1, {}), (2, {})]
+    assert batch(7, 0.3) == [(7, None), (8, None)]   # keyframe_every counts each source's own envelopes
+    assert codec.keyframe_key('pose', 8) == ('pose', 'sim-001')
+    assert codec.keyframe_key('pose', 2) is None    # replaced
+
+def test_acks_count_for_their_source():
+    pose = lambda src, x, ts: Envelope(topic='pose', payload=PoseMsg(x, 0, 0, 0, 0, 0, source=src), ts=ts)
+    async def run():
+        fanout = FanOut(deltas=DeltaCodec())
+        async def send(msg): pass
+        s = fanout.add('client', send)
+        s.delta = True
+        cache = EncodedCache()
+        fanout.publish_batch('kpi', [pose('a', 1.0, 0.0), pose('b', 2.0, 0.0)], cache, seq0=1)
+        s.ack('pose', 2)   # only b's keyframe
+        fanout.publish_batch('kpi', [pose('a', 1.5, 0.1), pose('b', 2.5, 0.1)], cache, seq0=3)
+        msgs = [json.loads(m) for m, *_ in s._buf]
+        await fanout.close()
+        return msgs
+    msgs = asyncio.run(run())
+    assert [m.get('key', False) for m in msgs[:2]] == [True, True]
+    assert 'payload' in msgs[2] and 'base' not in msgs[2]            # a: not acked, full message
+    assert msgs[3] == {'topic': 'pose', 'ts': 0.1, 'seq': 4, 'base': 2, 'delta': {'x': 2.5}}
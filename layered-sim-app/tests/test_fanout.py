@@ -0,0 +1,48 @@
+"""Rate-capped binary clients: the seqs a downsampled frame decodes to are the envelopes' own."""
+import asyncio
+from domain.messages import Envelope, Telemetry
+from infrastructure.bus.codec import EncodedCache
+from infrastructure.bus.fanout import FanOut
+from infrastructure.bus.wire import decode_frame
+
+def kpi(source, value, ts):
+    return Envelope(topic='kpi', payload=Telemetry(source=source, value=value), ts=ts)
+
+def capped_binary(batches, reduce):
+    """Publish (seq0, envs) batches to one binary client capped at 1 Hz; returns its frames, decoded."""
+    async def run():
+        fanout = FanOut()
+        async def send(msg): pass
+        s = fanout.add('client', send)
+        s.set_format('binary')
+        s.set_rate('kpi', 1.0, reduce)
+        cache = EncodedCache()
+        for seq0, envs in batches: fanout.publish_batch('kpi', envs, cache, seq0)
+        w = s.windows['kpi']   # the first batch went out at once; close the window later ones fell into now
+        fanout._emit(s, 'kpi', w, cache, w.due)
+        frames = [msg for msg, *_ in s._buf]
+        await fanout.close()
+        return frames
+    frames = asyncio.run(run())
+    return [[(row['seq'], row['payload']) for row in decode_frame(frame)] for frame in frames]
+
+def rows(frames):
+    return [row for frame in frames for row in frame]
+
+def test_latest_keeps_each_envelopes_seq():
+    # Two sources: the window keeps a@3 and b@4, not seqs counted back from the newest one.
+    frames = capped_binary([(1, [kpi('a', 1.0, 1.0), kpi('b', 2.0, 1.1), kpi('a', 3.0, 1.2), kpi('b', 4.0, 1.3)])],
+                           'latest')
+    assert frames == [[(3, {'source': 'a', 'value': 3.0}), (4, {'source': 'b', 'value': 4.0})]]
+
+def test_minmax_gap_splits_frames():
+    values = [5.0, 2.0, 6.0, 7.0, 3.0, 9.0, 4.0]   # seqs 11..17: min 2.0 at 12, max 9.0 at 16
+    frames = capped_binary([(11, [kpi('a', v, 10.0 + i) for i, v in enumerate(values)])], 'minmax')
+    assert frames == [[(12, {'source': 'a', 'value': 2.0})], [(16, {'source': 'a', 'value': 9.0})]]
+
+def test_windows_after_the_first():
+    # Later batches fold into the open window; their rows keep their seqs across batch boundaries.
+    frames = capped_binary([(1, [kpi('a', 1.0, 1.0)]), (2, [kpi('a', 2.0, 1.1), kpi('b', 3.0, 1.2)]),
+                            (4, [kpi('a', 4.0, 1.3)])], 'latest')
+    assert rows(frames) == [(1, {'source': 'a', 'value': 1.0}), (3, {'source': 'b', 'value': 3.0}),
+                            (4, {'source': 'a', 'value': 4.0})]
@@ -0,0 +1,124 @@
+"""MultiSourceExternal and its sources against local stand-ins: UDP and TCP sockets on localhost and a
+child Python process."""
+import json, socket, sys, threading, time
+import pytest
+from infrastructure.external.multi_source import MultiSourceExternal, Source, SubprocessSource, TcpSource, UdpSource
+
+def wait_until(pred, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not pred():
+        if time.monotonic() > deadline: return False
+        time.sleep(0.01)
+    return True
+
+def line(value, ts, source=None):
+    obj = {'value': value, 'ts': ts}
+    if source is not None: obj['source'] = source
+    return json.dumps(obj).encode() + b'\n'
+
+def udp_source(name):
+    src = UdpSource(name, '127.0.0.1', 0)
+    return src, src.sock.getsockname()
+
+def test_source_requires_run():
+    with pytest.raises(TypeError): Source('incomplete')
+
+def test_udp_source_reads_datagrams_and_closes():
+    src, addr = udp_source('udp')
+    src.start()
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as tx:
+        tx.sendto(b'1.5\n2.5\n', addr)       # several lines in one datagram
+        tx.sendto(line(3.5, 100.0), addr)
+        tx.sendto(b'not a number\n', addr)
+    assert wait_until(lambda: src.received == 3 and src.errors == 1)
+    envs = src.drain()
+    assert [e.payload.value for e in envs] == [1.5, 2.5, 3.5]
+    assert {e.payload.source for e in envs} == {'udp'}
+    assert envs[2].ts == 100.0
+    src.stop()
+    assert not src.alive
+    assert src.sock.fileno() == -1
+
+def test_tcp_source_reads_lines_and_stops():
+    server = socket.create_server(('127.0.0.1', 0))
+    conns = []
+    def serve():
+        conn, _ = server.accept()
+        conns.append(conn)
+        conn.sendall(line(1.0, 10.0) + line(2.0, 11.0))
+    t = threading.Thread(target=serve, daemon=True)
+    t.start()
+    src = TcpSource('tcp', *server.getsockname(), retry_s=0.1)
+    src.start()
+    try:
+        assert wait_until(lambda: src.received == 2)
+        assert src.connects == 1
+        assert [(e.payload.value, e.ts) for e in src.drain()] == [(1.0, 10.0), (2.0, 11.0)]
+    finally:
+        src.stop()
+        for c in conns: c.close()
+        server.close()
+    assert not src.alive
+
+def test_tcp_source_retries_until_sensor_is_up():
+    probe = socket.create_server(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()   # nothing listens on `port` yet
+    src = TcpSource('tcp', '127.0.0.1', port, retry_s=0.05)
+    src.start()
+    try:
+        time.sleep(0.2)
+        assert src.connects == 0 and src.alive
+        server = socket.create_server(('127.0.0.1', port))
+        conn, _ = server.accept()
+        conn.sendall(b'4.0\n')
+        assert wait_until(lambda: src.received == 1)
+        assert src.connects == 1
+    finally:
+        src.stop()
+    conn.close()
+    server.close()
+    assert not src.alive
+
+def test_subprocess_source_reads_stdout_and_terminates_child():
+    code = 'import time; print(1, flush=True); print(2, flush=True); time.sleep(30)'
+    src = SubprocessSource('cmd', [sys.executable, '-c', code])
+    src.start()
+    assert wait_until(lambda: src.received == 2)
+    assert [e.payload.value for e in src.drain()] == [1.0, 2.0]
+    t0 = time.monotonic()
+    src.stop()
+    assert time.monotonic() - t0 < 2.0
+    assert not src.alive
+    assert src.returncode is not None
+
+def test_merge_is_ts_ordered_across_sources():
+    (a, addr_a), (b, addr_b) = udp_source('a'), udp_source('b')
+    ext = MultiSourceExternal([a, b])
+    assert ext.poll_batch() == []   # starts the sources
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as tx:
+        for ts in (1.0, 3.0, 5.0): tx.sendto(line(ts, ts), addr_a)
+        for ts in (2.0, 4.0, 6.0): tx.sendto(line(ts, ts), addr_b)
+        assert wait_until(lambda: a.received == 3 and b.received == 3)
+        batch = ext.poll_batch()
+        assert [e.ts for e in batch] == [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]
+        assert [e.payload.source for e in batch] == ['a', 'b'] * 3
+        # A sample stamped before what was already returned still arrives, in the next batch.
+        tx.sendto(line(0.5, 0.5), addr_b)
+        tx.sendto(line(7.0, 7.0), addr_a)
+        assert wait_until(lambda: a.received == 4 and b.received == 4)
+    assert [e.ts for e in ext.poll_batch()] == [0.5, 7.0]
+    ext.close()
+    assert not a.alive and not b.alive
+
+def test_poll_hands_out_the_batch_one_by_one():
+    src, addr = udp_source('one')
+    ext = MultiSourceExternal([src])
+    ext.poll()
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as tx:
+        tx.sendto(line(2.0, 2.0) + line(1.0, 1.0), addr)
+    assert wait_until(lambda: src.received == 2)
+    assert [ext.poll().ts, ext.poll().ts] == [1.0, 2.0]
+    assert ext.poll() is None
+    ext.close()
+    assert not src.alive
@@ -0,0 +1,29 @@
+"""ReplayExternal hands the Controller every envelope that is due per poll."""
+from domain.messages import Envelope, Telemetry
+from infrastructure.external.replay import ReplayExternal
+from infrastructure.recording.segment_log import SegmentWriter
+
+def record(directory, n, spacing):
+    w = SegmentWriter(str(directory))
+    w.write_batch([Envelope(topic='kpi', payload=Telemetry(source='s', value=float(i)), ts=1000.0 + i * spacing)
+                   for i in range(n)])
+    w.close()
+
+def test_poll_batch_returns_everything_due(tmp_path):
+    record(tmp_path, 3000, 0.0005)   # 2000 msg/s
+    now = [0.0]
+    replay = ReplayExternal(str(tmp_path), clock=lambda: now[0], wall=lambda: 50.0, max_batch=10_000)
+    assert [e.payload.value for e in replay.poll_batch()] == [0.0]
+    now[0] = 0.10025   # between the 200th and 201st envelope
+    batch = replay.poll_batch()
+    assert [e.payload.value for e in batch] == [float(i) for i in range(1, 201)]
+    assert abs(batch[-1].ts - (50.0 + 200 * 0.0005)) < 1e-9
+    now[0] = 10.0
+    assert len(replay.poll_batch()) == 2799 and replay.poll_batch() == []
+    assert replay.replayed == 3000
+
+def test_max_speed_is_bounded_by_max_batch(tmp_path):
+    record(tmp_path, 1000, 0.001)
+    replay = ReplayExternal(str(tmp_path), speed=0, loop=True, max_batch=300)
+    assert [len(replay.poll_batch()) for _ in range(4)] == [300, 300, 300, 300]   # the 4th wraps around
+    assert replay.poll().payload.value == 200.0
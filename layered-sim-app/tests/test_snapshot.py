@@ -0,0 +1,37 @@
+"""Late-joiner snapshots: one last value per source of a shared topic, each with its own seq and topic."""
+from domain.messages import Envelope, KpiAggregate, PoseMsg, Telemetry
+from infrastructure.bus.snapshot import SnapshotStore
+
+def kpi(source, value, ts):
+    return Envelope(topic='kpi', payload=Telemetry(source=source, value=value), ts=ts)
+
+def agg(window, ts):
+    return Envelope(topic='kpi_agg', payload=KpiAggregate('a', window, 1.0, 1, 1.0, 0, 0, 0, 0, 0, 0, 0), ts=ts)
+
+def test_last_value_per_source_and_envelope_topic():
+    store = SnapshotStore()
+    # Batch sim pose rides the kpi channel next to the kpi sources.
+    pose = Envelope(topic='pose', payload=PoseMsg(1, 2, 3, 0, 0, 0, source='sim-000'), ts=1.5)
+    store.append('kpi', [kpi('a', 1.0, 1.0), kpi('b', 2.0, 1.1), pose, kpi('a', 3.0, 1.6)])
+    store.append('kpi', [kpi('a', 4.0, 2.0)])
+    snap = store.snapshot(['kpi'])['topics']['kpi']
+    assert snap['seq'] == 5   # live messages continue at 6
+    assert [(i['topic'], i['seq'], i['payload'].get('source')) for i in snap['items']] == \
+           [('kpi', 2, 'b'), ('pose', 3, 'sim-000'), ('kpi', 5, 'a')]
+
+def test_kpi_agg_keeps_each_window():
+    store = SnapshotStore()
+    store.append('kpi_agg', [agg('sliding', 1.0), agg('tumbling', 1.0), agg('sliding', 2.0)])
+    items = store.snapshot(['kpi_agg'])['topics']['kpi_agg']['items']
+    assert [(i['seq'], i['payload']['window']) for i in items] == [(2, 'tumbling'), (3, 'sliding')]
+
+def test_history_adds_last_values_of_quiet_sources():
+    store = SnapshotStore()
+    store.append('kpi', [kpi('quiet', 0.0, 0.0)] + [kpi('a', float(i), 10.0 + i) for i in range(5)], seq0=20)
+    items = store.snapshot(['kpi'], history_s=2.0)['topics']['kpi']['items']
+    assert [(i['seq'], i['payload']['source']) for i in items] == [(20, 'quiet'), (23, 'a'), (24, 'a'), (25, 'a')]
+
+def test_keys_are_bounded():
+    store = SnapshotStore(history=3)
+    store.append('kpi', [kpi(f's{i}', 0.0, float(i)) for i in range(10)])
+    assert [i['payload']['source'] for i in store.snapshot(['kpi'])['topics']['kpi']['items']] == ['s7', 's8', 's9']
@@ -0,0 +1,20 @@
+"""Binary frames decode to the same payloads as the JSON wire format."""
+import pytest
+from domain.messages import Envelope, PoseMsg, as_dict
+from infrastructure.bus import wire
+
+def test_pose_source_is_optional_like_json():
+    envs = [Envelope(topic='pose', payload=PoseMsg(1, 2, 3, 0.1, 0.2, 0.3), ts=1.0),
+            Envelope(topic='pose', payload=PoseMsg(4, 5, 6, 0.4, 0.5, 0.6, source='sim-001'), ts=2.0)]
+    rows = wire.decode_frame(wire.encode_batch('pose', envs, seq0=7))
+    assert [r['payload'] for r in rows] == [as_dict(e.payload) for e in envs]
+    assert 'source' not in rows[0]['payload']
+    assert [r['seq'] for r in rows] == [7, 8]
+
+def test_version_is_checked():
+    frame = bytearray(wire.encode_batch('kpi', [Envelope(topic='kpi', payload={'source': 's', 'value': 1.0}, ts=0.0)]))
+    assert frame[2] == wire.VERSION == 3
+    frame[2] = 2   # version 2 frames share the header and still decode
+    assert wire.decode_frame(bytes(frame))[0]['payload'] == {'source': 's', 'value': 1.0}
+    frame[2] = 9
+    with pytest.raises(ValueError): wire.decode_frame(bytes(frame))
@@ -0,0 +1,83 @@
+"""Vectorized simulation of many sources at once, for twin load testing (requires numpy).
+
+`BatchSim` advances K sources together: each tick yields M KPI samples per source (a sine with its own
+amplitude, frequency and phase plus uniform noise) and one pose per source on a circular orbit with its own
+radius, inclination, node and mean motion. All of it is computed as (M, K) / (K,) arrays; Python only runs
+to wrap the results in Envelopes, which callers publish with `Channel.put_batch`.
+
+Runs are reproducible: every parameter and all noise come from one `numpy.random.Generator(seed)`, and the
+simulated time advances by the nominal tick period rather than the wall clock, so the same seed, sizes and
+tick count give the same values. Envelope.ts is still the wall clock, with the M samples of a tick spread
+evenly over the period that ends at `now`.
+"""
+from __future__ import annotations
+import math
+from typing import List, Optional, Tuple
+import numpy as np
+from messages import Envelope, PoseMsg, Telemetry
+
+TWO_PI = 2.0 * math.pi
+
+class BatchSim:
+    def __init__(self, sources: int = 100, samples: int = 1, seed: Optional[int] = 0, noise: float = 0.05):
+        if sources < 1 or samples < 1:
+            raise ValueError("sources and samples must be >= 1")
+        self.sources = sources
+        self.samples = samples
+        self.seed = seed
+        self.noise = noise
+        self.names = [f"sim-{i:03d}" for i in range(sources)]
+        rng = self.rng = np.random.default_rng(seed)
+        # KPI: value = amp * sin(omega * t + phi) + U(-noise, noise)
+        self.amp = rng.uniform(0.5, 1.5, sources)
+        self.omega = rng.uniform(0.5, 2.0, sources)
+        self.phi = rng.uniform(0.0, TWO_PI, sources)
+        # Pose: circular orbit of `radius`, mean motion `motion` rad/s, inclination `inc`, ascending node `node`
+        self.radius = rng.uniform(1.0, 3.0, sources)
+        self.motion = rng.uniform(0.05, 0.5, sources)
+        self.anomaly = rng.uniform(0.0, TWO_PI, sources)
+        inc = rng.uniform(0.0, 0.5 * math.pi, sources)
+        node = rng.uniform(0.0, TWO_PI, sources)
+        self._cos_i, self._sin_i = np.cos(inc), np.sin(inc)
+        self._cos_n, self._sin_n = np.cos(node), np.sin(node)
+        self._frac = np.arange(1, samples + 1) / samples  # sample j of a tick sits at (j + 1) / M of the period
+        self.kpi_t = 0.0   # simulated seconds, advanced per tick
+        self.pose_t = 0.0
+
+    def kpi(self, period: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Advance the KPI clock by one tick: (M,) sample offsets before the tick's end, (M, K) values."""
+        t = self.kpi_t + period * self._frac
+        self.kpi_t += period
+        values = self.amp * np.sin(np.outer(t, self.omega) + self.phi)
+        values += self.rng.uniform(-self.noise, self.noise, values.shape)
+        return period * (1.0 - self._frac), values
+
+    def poses(self, period: float) -> np.ndarray:
+        """Advance the pose clock by one tick: (K, 6) x, y, z, yaw, pitch, roll at the tick's end."""
+        self.pose_t += period
+        theta = self.anomaly + self.motion * self.pose_t
+        c, s = np.cos(theta), np.sin(theta)
+        ci, si, cn, sn = self._cos_i, self._sin_i, self._cos_n, self._sin_n
+        # Position and unit velocity: the in-plane circle rotated by inclination, then by the node.
+        x, y, z = cn * c - sn * ci * s, sn * c + cn * ci * s, si * s
+        vx, vy, vz = -cn * s - sn * ci * c, -sn * s + cn * ci * c, si * c
+        out = np.empty((self.sources, 6))
+        out[:, 0] = self.radius * x
+        out[:, 1] = self.radius * y
+        out[:, 2] = self.radius * z
+        out[:, 3] = np.arctan2(vy, vx) % TWO_PI
+        out[:, 4] = np.arcsin(np.clip(vz, -1.0, 1.0))
+        out[:, 5] = 0.0
+        return out
+
+    def kpi_envelopes(self, now: float, period: float) -> List[Envelope]:
+        """One tick of K x M Telemetry envelopes, oldest sample first."""
+        ago, values = self.kpi(period)
+        names = self.names
+        return [Envelope(topic="kpi", payload=Telemetry(source=name, value=v), ts=ts)
+                for ts, row in zip((now - ago).tolist(), values.tolist()) for name, v in zip(names, row)]
+
+    def pose_envelopes(self, now: float, period: float) -> List[Envelope]:
+        """One tick of K PoseMsg envelopes, one per source."""
+        return [Envelope(topic="pose", payload=PoseMsg(*p, source=name), ts=now)
+                for name, p in zip(self.names, self.poses(period).tolist())]
@@ -0,0 +1,50 @@
+"""Frame hand-off cost per consumer: copied bytes through a channel vs FramePool handles.
+
+    python bench_frames.py [--frames 200] [--consumers 3]
+
+"copy" puts a bytes snapshot of each frame in the "latest" channel and every consumer takes its own
+copy (what a pickled/queued frame costs); "pool" renders into a FramePool slot once and consumers open
+the handle as a memoryview. Both touch one byte per consumer so the work is the hand-off, not the image.
+"""
+import argparse, json, time
+from channels import ChannelConfig, make_channel
+from controller import FRAME_SPECS
+from frame_pool import build_frame_pools
+from messages import Envelope, FrameMsg
+
+def run(mode: str, topic: str, frames: int, consumers: int) -> dict:
+    shape, dtype = FRAME_SPECS[topic]
+    pools = build_frame_pools({topic: (shape, dtype)})
+    pool = pools[topic]
+    ch = make_channel(ChannelConfig(topic, maxsize=1, policy="latest"))
+    src = bytearray(pool.slot_bytes)
+    t0 = time.perf_counter()
+    for i in range(frames):
+        src[0] = i & 0xFF
+        if mode == "copy":
+            ch.put(Envelope(topic, FrameMsg(path=None, ts=0.0), 0.0))
+            frame = bytes(src)
+            for _ in range(consumers):
+                _ = bytearray(frame)[0]
+        else:
+            handle = pool.write(src, shape, dtype)
+            ch.put(Envelope(topic, FrameMsg(path=None, ts=0.0, handle=handle), 0.0))
+            h = ch.drain_batch()[-1].payload.handle
+            for _ in range(consumers):
+                with pool.read(h) as view:
+                    _ = view[(0,) * view.ndim]
+    elapsed = time.perf_counter() - t0
+    pool.close()
+    return {"mode": mode, "topic": topic, "frame_bytes": pool.slot_bytes, "consumers": consumers,
+            "us_per_frame": elapsed / frames * 1e6}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--frames", type=int, default=200)
+    ap.add_argument("--consumers", type=int, default=3)
+    a = ap.parse_args()
+    results = [run(mode, topic, a.frames, a.consumers) for topic in FRAME_SPECS for mode in ("copy", "pool")]
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Load test: synthetic high-rate source -> channels -> bridge -> WebSocket server -> N clients, all on localhost.
+
+    python bench_load.py [--topics kpi:2000:64,pose:500:256] [--clients 4] [--client-procs] [--seconds 5]
+                         [--policies drop_old,latest,block] [--bridges push,poll] [--out results.json]
+
+One run per (channel policy, bridge mode). `--topics` is topic:rate_hz:payload_bytes. `LoadSource` takes the
+Controller's place: a Scheduler thread puts each topic on its own channel at its own rate. It stamps
+Envelope.ts with time.time() and clients record time.time() - ts on receipt, so latency covers the channel,
+bridge, fan-out, encoding and the socket. Clients run as one asyncio thread (default) or one subprocess each
+(`--client-procs`). CPU is per component over the measured window (thread clocks, so Linux/Unix only; null
+elsewhere). Bus metrics are attached for drop and dwell counts, as with `run_server.py --metrics`.
+'latest' runs use single-slot channels. Output has the same shape as layered-sim-app/bench_load.py
+(where "controller" can also be "process").
+"""
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import websockets
+from bridge_async import AsyncBridge
+from channels import ChannelConfig, ChannelRegistry
+from codec import EncodedCache
+from commands import CommandIngress
+from fanout import FanOut
+from messages import Envelope
+from metrics import BusMetrics, Histogram
+from scheduler import Scheduler
+from server_mode import broadcaster, make_ws_handler
+from snapshot import SnapshotStore
+
+TopicSpec = Tuple[str, float, int]   # (topic, rate Hz, payload bytes)
+
+class LoadSource:
+    """Puts each topic on its channel at its own rate, with a payload of about `size` bytes."""
+    def __init__(self, reg: ChannelRegistry, spec: List[TopicSpec]):
+        self.reg = reg
+        self.scheduler = Scheduler(overrun="skip")
+        self._seq = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        for topic, hz, size in spec:
+            self.scheduler.add(topic, hz, self._emitter(topic, "x" * size))
+
+    def _emitter(self, topic: str, blob: str) -> Callable[[], None]:
+        ch = self.reg.channel(topic)
+        def emit():
+            self._seq += 1
+            ch.put(Envelope(topic=topic, payload={"seq": self._seq, "blob": blob}, ts=time.time()))
+        return emit
+
+    def start(self):
+        self._thread = threading.Thread(target=self.scheduler.run, args=(self._stop,), name="LoadSource", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+
+def parse_topics(text: str) -> List[TopicSpec]:
+    spec = []
+    for item in text.split(","):
+        topic, hz, size = item.split(":")
+        spec.append((topic, float(hz), int(size)))
+    return spec
+
+def thread_cpu(name: str) -> Optional[float]:
+    for t in threading.enumerate():
+        if t.name == name and t.ident is not None:
+            try:
+                return time.clock_gettime(time.pthread_getcpuclockid(t.ident))
+            except (AttributeError, OSError):
+                return None
+    return None
+
+def cpu_pct(c0: Optional[float], c1: Optional[float], seconds: float) -> Optional[float]:
+    if c0 is None or c1 is None:
+        return None
+    return 100.0 * (c1 - c0) / seconds
+
+async def client(url: str, t_start: float, t_end: float, hist: Histogram) -> int:
+    n = 0
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.recv()   # hello
+        while True:
+            left = t_end - time.time()
+            if left <= 0:
+                break
+            try:
+                msg = await asyncio.wait_for(ws.recv(), left)
+            except asyncio.TimeoutError:
+                break
+            now = time.time()
+            if now < t_start:
+                continue
+            ts = json.loads(msg).get("ts")
+            if ts is None:
+                continue   # snapshot / control
+            hist.record(now - ts)
+            n += 1
+    return n
+
+def run_clients(url: str, n: int, t_start: float, t_end: float, clock: Callable[[], float]) -> Dict[str, Any]:
+    """N clients on one event loop; CPU is `clock` over [t_start, t_end]."""
+    hist = Histogram()
+    cpu: List[float] = []
+
+    async def go():
+        loop = asyncio.get_running_loop()
+        loop.call_later(max(0.0, t_start - time.time()), lambda: cpu.append(clock()))
+        counts = await asyncio.gather(*(client(url, t_start, t_end, hist) for _ in range(n)))
+        cpu.append(clock())
+        return sum(counts)
+
+    received = asyncio.run(go())
+    return {"received": received, "hist": hist.state(), "cpu_s": cpu[-1] - cpu[0] if len(cpu) == 2 else None}
+
+async def run(spec: List[TopicSpec], policy: str, bridge_mode: str, clients: int, client_procs: bool,
+              seconds: float, maxsize: int, port: int) -> Dict[str, Any]:
+    topics = [t for t, _, _ in spec]
+    reg = ChannelRegistry([ChannelConfig(t, maxsize=1 if policy == "latest" else maxsize, policy=policy)
+                           for t in topics] + [ChannelConfig("setup", maxsize=64, policy="priority")])
+    metrics = BusMetrics().attach(reg)
+    source = LoadSource(reg, spec)
+    source.start()
+    bridge = AsyncBridge(reg, mode=bridge_mode, topics=topics)
+    bridge.start()
+    fanout = FanOut(maxsize=256, policy="drop_old", e2e=metrics.e2e("ws"))
+    store = SnapshotStore()
+    cache = EncodedCache()
+    server = await websockets.serve(make_ws_handler(CommandIngress(reg.channel("setup")), fanout, store), "127.0.0.1", port)
+    btask = asyncio.create_task(broadcaster(bridge, fanout, cache, store=store))
+
+    url = f"ws://127.0.0.1:{port}/"
+    t_start = time.time() + (2.0 if client_procs else 0.5)   # connect / spawn
+    t_end = t_start + seconds
+    window = [repr(t_start), repr(t_end)]
+    if client_procs:
+        procs = [subprocess.Popen([sys.executable, __file__, "--client", url, *window], stdout=subprocess.PIPE)
+                 for _ in range(clients)]
+
+        def collect():
+            return [json.loads(p.communicate()[0]) for p in procs]
+    else:
+        out: List[Dict[str, Any]] = []
+        th = threading.Thread(target=lambda: out.append(run_clients(url, clients, t_start, t_end, time.thread_time)),
+                              name="BenchClients", daemon=True)
+        th.start()
+
+        def collect():
+            th.join()
+            return out
+
+    def sample() -> Dict[str, Optional[float]]:
+        return {"controller": thread_cpu("LoadSource"), "server": time.thread_time(), "process": time.process_time()}
+
+    await asyncio.sleep(t_start - time.time())
+    r0 = metrics.report()   # interval histograms restart here
+    cpu0 = sample()
+    await asyncio.sleep(t_end - time.time())
+    r1 = metrics.report()
+    cpu1 = sample()
+    client_drops = sum(s["dropped"] for s in fanout.stats().values())
+    results = await asyncio.get_running_loop().run_in_executor(None, collect)
+
+    btask.cancel()
+    await fanout.close()
+    server.close()
+    await server.wait_closed()
+    await bridge.stop()
+    source.stop()
+
+    hist = Histogram()
+    for r in results:
+        hist.merge(r["hist"])
+    puts = drops = 0
+    for t in topics:
+        puts += r1["channels"][t]["puts"] - r0["channels"][t]["puts"]
+        drops += r1["channels"][t]["drops"] - r0["channels"][t]["drops"]
+    client_cpu = [r["cpu_s"] for r in results]
+    cpu = {k: cpu_pct(cpu0[k], cpu1[k], seconds) for k in cpu0}
+    cpu["clients"] = None if None in client_cpu else 100.0 * sum(client_cpu) / seconds
+    return {"controller": "thread", "policy": policy, "bridge": bridge_mode, "clients": clients,
+            "client_procs": client_procs,
+            "source_hz": {"target": sum(hz for _, hz, _ in spec), "achieved": puts / seconds},
+            "throughput_hz": sum(r["received"] for r in results) / seconds,   # summed over clients
+            "latency_ms": hist.summary(),
+            "server_e2e_ms": r1["e2e"].get("ws"),   # Envelope.ts -> send() done, server side
+            "dwell_ms": {t: r1["channels"][t]["dwell"] for t in topics},
+            "drops": {"channel": drops, "clients": client_drops},
+            "cpu_pct": cpu}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--topics", default="kpi:2000:64,pose:500:256", help="topic:rate_hz:payload_bytes,...")
+    ap.add_argument("--clients", type=int, default=4)
+    ap.add_argument("--client-procs", action="store_true", help="run each client in its own process")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--policies", default="drop_old,latest,block")
+    ap.add_argument("--bridges", default="push,poll")
+    ap.add_argument("--maxsize", type=int, default=1000, help="channel size for non-'latest' policies")
+    ap.add_argument("--port", type=int, default=8799)
+    ap.add_argument("--out", help="also write the JSON to this file")
+    ap.add_argument("--client", nargs=3, metavar=("URL", "T_START", "T_END"), help=argparse.SUPPRESS)
+    a = ap.parse_args()
+    if a.client:
+        url, t0, t1 = a.client
+        print(json.dumps(run_clients(url, 1, float(t0), float(t1), time.process_time)))
+        return
+    spec = parse_topics(a.topics)
+    runs = [asyncio.run(run(spec, p, b, a.clients, a.client_procs, a.seconds, a.maxsize, a.port))
+            for p in a.policies.split(",") for b in a.bridges.split(",")]
+    doc = {"variant": "py-multi-mode-app", "python": platform.python_version(), "platform": platform.platform(),
+           "config": {"topics": [{"topic": t, "rate_hz": hz, "payload_bytes": n} for t, hz, n in spec],
+                      "clients": a.clients, "client_procs": a.client_procs, "seconds": a.seconds,
+                      "maxsize": a.maxsize},
+           "runs": runs}
+    text = json.dumps(doc, indent=2)
+    if a.out:
+        with open(a.out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Retained bytes per buffered envelope and construction cost: slotted messages vs dict payloads.
+
+    python bench_memory.py [--n 1000]
+
+"dict" rebuilds the previous representation (TypedDict payloads in a non-slotted frozen dataclass);
+"slots" uses messages.py. --n matches the 1000-slot drop_old bounds of the telemetry channels.
+"""
+import argparse, gc, json, time, tracemalloc
+from dataclasses import dataclass
+from typing import Any
+from messages import Envelope, Telemetry, PoseMsg, Detection, FrameMsg
+
+@dataclass(frozen=True)
+class DictEnvelope:
+    topic: str
+    payload: Any
+    ts: float
+
+def make_dict(topic: str, i: int):
+    now = 1.0e9 + i
+    if topic == "kpi":
+        return DictEnvelope(topic, dict(source="sim", value=i * 0.5), now)
+    if topic == "pose":
+        return DictEnvelope(topic, dict(x=i * 0.1, y=i * 0.2, z=0.0, yaw=i * 0.3, pitch=0.0, roll=0.0), now)
+    if topic == "detections":
+        return DictEnvelope(topic, dict(cls="target", conf=0.9, x=42, y=40, w=100, h=80), now)
+    return DictEnvelope(topic, dict(path=None, ts=now), now)
+
+def make_slots(topic: str, i: int):
+    now = 1.0e9 + i
+    if topic == "kpi":
+        return Envelope(topic, Telemetry(source="sim", value=i * 0.5), now)
+    if topic == "pose":
+        return Envelope(topic, PoseMsg(x=i * 0.1, y=i * 0.2, z=0.0, yaw=i * 0.3, pitch=0.0, roll=0.0), now)
+    if topic == "detections":
+        return Envelope(topic, Detection(cls="target", conf=0.9, x=42, y=40, w=100, h=80), now)
+    return Envelope(topic, FrameMsg(path=None, ts=now), now)
+
+def measure(make, topic: str, n: int) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    buf = [make(topic, i) for i in range(n)]
+    retained = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del buf
+    t0 = time.perf_counter()
+    for i in range(n):
+        make(topic, i)
+    ns = (time.perf_counter() - t0) * 1e9 / n
+    return {"bytes_per_envelope": round(retained / n, 1), "construct_ns": round(ns, 1)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=1000)
+    a = ap.parse_args()
+    rows = []
+    for topic in ("kpi", "pose", "detections", "visual_frame"):
+        rows.append({"topic": topic, "dict": measure(make_dict, topic, a.n), "slots": measure(make_slots, topic, a.n)})
+    print(json.dumps(rows, indent=2))
+
+if __name__ == "__main__":
+    main()
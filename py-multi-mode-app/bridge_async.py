@@ -1,37 +1,92 @@
 from __future__ import annotations
 import asyncio
-from typing import Dict
+import threading
+from typing import Dict, Iterable, List, Optional, Set
 from channels import ChannelRegistry
 from messages import Envelope
 
 class AsyncBridge:
-    """Polls registry channels and forwards items to asyncio queues (per topic).
-    Run entirely on the asyncio thread; thread-safe because `Channel.try_drain` uses Queue.get_nowait().
+    """Forwards registry channels to asyncio queues (per topic). Runs on the asyncio thread.
+    Channels are emptied with `drain_batch()`/`drain_all()`, one operation per channel.
+
+    mode="push" (default): `Channel.put` wakes the loop through `call_soon_threadsafe`. A burst of
+    puts coalesces into a single scheduled drain that only visits channels that received data.
+    mode="poll": fallback that sleeps `poll_interval` and walks every channel.
+
+    `topics` limits the bridge to outbound channels (default: all) so it does not consume e.g. "setup".
     """
-    def __init__(self, reg: ChannelRegistry, poll_interval: float = 0.02):
+    def __init__(self, reg: ChannelRegistry, poll_interval: float = 0.02, mode: str = "push",
+                 topics: Optional[Iterable[str]] = None):
+        if mode not in ("push", "poll"):
+            raise ValueError(f"unknown bridge mode: {mode!r}")
         self.reg = reg
         self.poll_interval = poll_interval
-        self.async_queues: Dict[str, asyncio.Queue[Envelope]] = {name: asyncio.Queue() for name in reg.names()}
+        self.mode = mode
+        self.topics: List[str] = list(reg.names() if topics is None else topics)
+        self.async_queues: Dict[str, asyncio.Queue[Envelope]] = {name: asyncio.Queue() for name in self.topics}
         self._task: asyncio.Task | None = None
         self._stopping = asyncio.Event()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
+        self._dirty: Set[str] = set()
+        self._scheduled = False
 
     def get_async_queue(self, topic: str) -> asyncio.Queue[Envelope]:
         return self.async_queues[topic]
 
     def start(self):
-        if self._task is None:
-            self._task = asyncio.create_task(self._pump())
+        if self.mode == "poll":
+            if self._task is None:
+                self._task = asyncio.create_task(self._pump())
+            return
+        if self._loop is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        for name in self.topics:
+            self.reg.channel(name).add_listener(self._on_put)
+        # Anything published before start() never triggered a wakeup.
+        with self._lock:
+            self._dirty.update(self.topics)
+            self._scheduled = True
+        self._loop.call_soon(self._drain_dirty)
 
     async def stop(self):
         self._stopping.set()
         if self._task:
             await self._task
+        if self._loop is not None:
+            for name in self.topics:
+                self.reg.channel(name).remove_listener(self._on_put)
+            self._loop = None
+
+    def _on_put(self, name: str) -> None:
+        # Producer thread: mark the topic dirty and keep at most one drain pending on the loop.
+        loop = self._loop
+        if loop is None:
+            return
+        with self._lock:
+            self._dirty.add(name)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        try:
+            loop.call_soon_threadsafe(self._drain_dirty)
+        except RuntimeError:
+            pass  # loop already closed during shutdown
+
+    def _drain_dirty(self) -> None:
+        with self._lock:
+            names, self._dirty = self._dirty, set()
+            self._scheduled = False
+        for name in names:
+            q = self.async_queues[name]
+            for env in self.reg.channel(name).drain_batch():
+                q.put_nowait(env)
 
     async def _pump(self):
         while not self._stopping.is_set():
-            for name in self.reg.names():
-                ch = self.reg.channel(name)
-                for env in ch.try_drain():
-                    q = self.async_queues[name]
+            for name in self.topics:
+                q = self.async_queues[name]
+                for env in self.reg.channel(name).drain_batch():
                     q.put_nowait(env)
             await asyncio.sleep(self.poll_interval)
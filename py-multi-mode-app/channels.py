@@ -1,7 +1,16 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Generic, TypeVar, Optional, Dict, Iterable
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Generic, TypeVar, Optional, Dict, Hashable, Iterable, List, Callable, Deque, Sequence, Tuple
+import fnmatch
+import itertools
 import queue
+import threading
+import time
+
+if TYPE_CHECKING:
+    from metrics import ChannelMetrics
 
 T = TypeVar("T")
 
@@ -9,14 +18,74 @@ T = TypeVar("T")
 class ChannelConfig:
     name: str
     maxsize: int = 0
-    policy: str = "block"   # "block" | "drop_new" | "drop_old" | "latest"
+    policy: str = "block"   # "block" | "drop_new" | "drop_old" | "latest" | "priority" (commands, see PriorityChannel)
+    backend: str = "auto"   # "auto" (pick by policy) | "queue" (force queue.Queue)
 
-class Channel(Generic[T]):
+class Channel(ABC, Generic[T]):
+    """Common channel surface. Storage lives in the subclasses chosen by `make_channel`. A backend missing one
+    of the abstract methods fails when it is created, not at first use."""
     def __init__(self, cfg: ChannelConfig):
         self.cfg = cfg
+        self.overwrites = 0  # items discarded by drop_old/latest to make room
+        self._listeners: List[Callable[[str], None]] = []
+        # Set by BusMetrics.attach. While None, put/drain pay a single attribute check.
+        self.metrics: Optional[ChannelMetrics] = None
+        # Routing index kept by ChannelRegistry.subscribe. While non-empty, put() hands each item to these
+        # subscriber channels instead of storing it. Replaced, never mutated, so producers iterate lock-free.
+        self._subscribers: Tuple[Channel[T], ...] = ()
+
+    def add_listener(self, fn: Callable[[str], None]) -> None:
+        """Call `fn(name)` on the producer thread after every put. Must be cheap and non-blocking."""
+        self._listeners.append(fn)
+
+    def remove_listener(self, fn: Callable[[str], None]) -> None:
+        try:
+            self._listeners.remove(fn)
+        except ValueError:
+            pass
+
+    @abstractmethod
+    def put(self, item: T) -> None:
+        ...
+
+    def put_batch(self, items: Sequence[T]) -> None:
+        """Put `items` in order. Backends that can take a batch in one operation override this."""
+        for item in items:
+            self.put(item)
+
+    def _route(self, item: T) -> None:
+        if self.metrics is not None:
+            self.metrics.routed += 1
+        for ch in self._subscribers:
+            ch.put(item)
+
+    @abstractmethod
+    def get(self, timeout: Optional[float] = None) -> T:
+        ...
+
+    @abstractmethod
+    def depth(self) -> int:
+        """Items currently buffered."""
+
+    @abstractmethod
+    def drain_batch(self, max_items: Optional[int] = None) -> List[T]:
+        """Take up to `max_items` (all if None) in FIFO order in one operation. Returns [] when empty."""
+
+    def try_drain(self) -> Iterable[T]:
+        return iter(self.drain_batch())
+
+class QueueChannel(Channel[T]):
+    """`queue.Queue` backend. Used for "block"/"drop_new", or any policy with backend="queue"."""
+    def __init__(self, cfg: ChannelConfig):
+        super().__init__(cfg)
         self._q: queue.Queue[T] = queue.Queue(maxsize=cfg.maxsize)
 
     def put(self, item: T) -> None:
+        if self._subscribers:
+            return self._route(item)
+        m = self.metrics
+        if m is not None:
+            m.on_put(item, self._q.qsize() + 1)
         p = self.cfg.policy
         if p == "block":
             self._q.put(item)
@@ -24,8 +93,10 @@ class Channel(Generic[T]):
             try:
                 self._q.put_nowait(item)
             except queue.Full:
-                pass
-        elif p == "drop_old":
+                if m is not None:
+                    m.rejected += 1
+                return
+        elif p in ("drop_old", "latest"):
             while True:
                 try:
                     self._q.put_nowait(item)
@@ -33,35 +104,341 @@ class Channel(Generic[T]):
                 except queue.Full:
                     try:
                         self._q.get_nowait()
+                        self.overwrites += 1
                     except queue.Empty:
                         break
-        elif p == "latest":
+        for fn in self._listeners:
+            fn(self.cfg.name)
+
+    def get(self, timeout: Optional[float] = None):
+        item = self._q.get(timeout=timeout)
+        if self.metrics is not None:
+            self.metrics.on_drain((item,))
+        return item
+
+    def depth(self) -> int:
+        return self._q.qsize()
+
+    def drain_batch(self, max_items: Optional[int] = None) -> List[T]:
+        q = self._q
+        with q.mutex:
+            buf = q.queue
+            n = len(buf) if max_items is None else min(max_items, len(buf))
+            if not n:
+                return []
+            pop = buf.popleft
+            items = [pop() for _ in range(n)]
+            q.not_full.notify(n)  # wake producers blocked on a full "block" channel
+        if self.metrics is not None:
+            self.metrics.on_drain(items)
+        return items
+
+class _Waitable(Channel[T]):
+    """Blocking get() for the lock-free backends. Producers only touch the Event while a consumer is parked."""
+    def __init__(self, cfg: ChannelConfig):
+        super().__init__(cfg)
+        self._ready = threading.Event()
+        self._waiters = 0
+        self._wlock = threading.Lock()
+
+    @abstractmethod
+    def _take(self) -> T:
+        """Pop one item, or raise IndexError when there is none."""
+
+    def _wake(self) -> None:
+        if self._waiters:
+            self._ready.set()
+
+    def _took(self, item: T) -> T:
+        if self.metrics is not None:
+            self.metrics.on_drain((item,))
+        return item
+
+    def get(self, timeout: Optional[float] = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._wlock:
+            self._waiters += 1
+        try:
             while True:
                 try:
-                    self._q.put_nowait(item)
-                    break
-                except queue.Full:
-                    try:
-                        self._q.get_nowait()
-                    except queue.Empty:
-                        break
+                    return self._took(self._take())
+                except IndexError:
+                    pass
+                self._ready.clear()
+                try:
+                    return self._took(self._take())
+                except IndexError:
+                    pass
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise queue.Empty
+                self._ready.wait(remaining)
+        finally:
+            with self._wlock:
+                self._waiters -= 1
 
-    def get(self, timeout: Optional[float] = None):
-        return self._q.get(timeout=timeout)
+class RingChannel(_Waitable[T]):
+    """Bounded ring for "drop_old" (and multi-slot "latest"): O(1) overwrite-oldest via deque(maxlen).
 
-    def try_drain(self) -> Iterable[T]:
-        while True:
-            try:
-                yield self._q.get_nowait()
-            except queue.Empty:
-                break
+    deque.append/popleft are atomic under the GIL, so neither put nor drain takes a lock. `overwrites`
+    is exact for a single producer; a drain racing a full-buffer put may over-count by one.
+    """
+    def __init__(self, cfg: ChannelConfig):
+        super().__init__(cfg)
+        self._buf: Deque[T] = deque(maxlen=cfg.maxsize or None)
+
+    def put(self, item: T) -> None:
+        if self._subscribers:
+            return self._route(item)
+        buf = self._buf
+        if self.metrics is not None:
+            self.metrics.on_put(item, len(buf) + 1)
+        if len(buf) == buf.maxlen:
+            self.overwrites += 1
+        buf.append(item)
+        self._wake()
+        for fn in self._listeners:
+            fn(self.cfg.name)
+
+    def put_batch(self, items: Sequence[T]) -> None:
+        # One extend, one wake-up and one listener call for the whole batch.
+        if not items:
+            return
+        if self._subscribers:
+            if self.metrics is not None:
+                self.metrics.routed += len(items)
+            for ch in self._subscribers:
+                ch.put_batch(items)
+            return
+        buf = self._buf
+        if self.metrics is not None:
+            for depth, item in enumerate(items, len(buf) + 1):
+                self.metrics.on_put(item, depth)
+        if buf.maxlen is not None:
+            self.overwrites += max(0, len(buf) + len(items) - buf.maxlen)
+        buf.extend(items)
+        self._wake()
+        for fn in self._listeners:
+            fn(self.cfg.name)
+
+    def _take(self) -> T:
+        return self._buf.popleft()
+
+    def depth(self) -> int:
+        return len(self._buf)
+
+    def drain_batch(self, max_items: Optional[int] = None) -> List[T]:
+        buf = self._buf
+        n = len(buf) if max_items is None else min(max_items, len(buf))
+        pop = buf.popleft
+        items: List[T] = []
+        try:
+            for _ in range(n):
+                items.append(pop())
+        except IndexError:
+            pass  # another consumer got there first
+        if self.metrics is not None:
+            self.metrics.on_drain(items)
+        return items
+
+_EMPTY = object()
+
+class LatestChannel(_Waitable[T]):
+    """Single-slot cell for maxsize=1 "latest" topics (frames): a dict pop/set swap, no queue machinery."""
+    def __init__(self, cfg: ChannelConfig):
+        super().__init__(cfg)
+        self._cell: Dict[int, T] = {}
+
+    def put(self, item: T) -> None:
+        if self._subscribers:
+            return self._route(item)
+        if self.metrics is not None:
+            self.metrics.on_put(item, 1)
+        if self._cell.pop(0, _EMPTY) is not _EMPTY:
+            self.overwrites += 1
+        self._cell[0] = item
+        self._wake()
+        for fn in self._listeners:
+            fn(self.cfg.name)
+
+    def _take(self) -> T:
+        item = self._cell.pop(0, _EMPTY)
+        if item is _EMPTY:
+            raise IndexError
+        return item
+
+    def depth(self) -> int:
+        return len(self._cell)
+
+    def drain_batch(self, max_items: Optional[int] = None) -> List[T]:
+        if max_items == 0:
+            return []
+        item = self._cell.pop(0, _EMPTY)
+        if item is _EMPTY:
+            return []
+        if self.metrics is not None:
+            self.metrics.on_drain((item,))
+        return [item]
+
+class PriorityChannel(_Waitable[T]):
+    """Command queue for "priority": put never blocks, drains urgent items first and coalesces by key.
+
+    Items are Envelopes whose payload has `priority` (lower drains first, 0 = urgent) and `key` (None: never
+    coalesced), e.g. messages.Command. A put whose key is already queued replaces that item in place with
+    `payload.coalesce(older)`: a burst of updates to one setting takes one slot, keeps its place in line and
+    reaches the consumer as the newest value. `maxsize` bounds the non-urgent items; past it `offer` returns
+    False (counted in `rejected`). Urgent items are always accepted. Equal priorities drain FIFO.
+    """
+    def __init__(self, cfg: ChannelConfig):
+        super().__init__(cfg)
+        self.coalesced = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._slots: Dict[Hashable, list] = {}   # key -> [priority, arrival, item]
+        self._arrival = itertools.count()
+        self._normal = 0
+
+    def offer(self, item: T) -> bool:
+        payload = getattr(item, "payload", None)
+        prio = getattr(payload, "priority", 1)
+        key = getattr(payload, "key", None)
+        with self._lock:
+            slot = self._slots.get(key) if key is not None else None
+            if slot is not None:
+                if prio == 0 and slot[0] > 0:
+                    self._normal -= 1
+                slot[0] = min(slot[0], prio)
+                slot[2] = item = replace(item, payload=payload.coalesce(slot[2].payload))
+                self.coalesced += 1
+            elif prio > 0 and self.cfg.maxsize and self._normal >= self.cfg.maxsize:
+                self.rejected += 1
+                if self.metrics is not None:
+                    self.metrics.rejected += 1
+                return False
+            else:
+                n = next(self._arrival)
+                self._slots[(_EMPTY, n) if key is None else key] = [prio, n, item]
+                if prio > 0:
+                    self._normal += 1
+            depth = len(self._slots)
+        if self.metrics is not None:
+            self.metrics.on_put(item, depth)
+        self._wake()
+        for fn in self._listeners:
+            fn(self.cfg.name)
+        return True
+
+    def put(self, item: T) -> None:
+        self.offer(item)
+
+    def _pop(self, max_items: Optional[int]) -> List[T]:
+        with self._lock:
+            order = sorted(self._slots.items(), key=lambda kv: (kv[1][0], kv[1][1]))
+            if max_items is not None:
+                order = order[:max_items]
+            for key, slot in order:
+                del self._slots[key]
+                if slot[0] > 0:
+                    self._normal -= 1
+        return [slot[2] for _, slot in order]
+
+    def _take(self) -> T:
+        items = self._pop(1)
+        if not items:
+            raise IndexError
+        return items[0]
+
+    def depth(self) -> int:
+        return len(self._slots)
+
+    def drain_batch(self, max_items: Optional[int] = None) -> List[T]:
+        if max_items == 0 or not self._slots:
+            return []
+        items = self._pop(max_items)
+        if self.metrics is not None:
+            self.metrics.on_drain(items)
+        return items
+
+def make_channel(cfg: ChannelConfig) -> Channel:
+    if cfg.policy == "priority":
+        return PriorityChannel(cfg)
+    if cfg.backend == "queue" or cfg.policy not in ("drop_old", "latest"):
+        return QueueChannel(cfg)
+    if cfg.policy == "latest" and cfg.maxsize == 1:
+        return LatestChannel(cfg)
+    return RingChannel(cfg)
 
 class ChannelRegistry:
+    """One channel per topic. By default each has a single consumer; `subscribe` turns topics into
+    publish/subscribe, where every subscriber drains its own copy of the stream (see Subscription)."""
     def __init__(self, configs: Iterable[ChannelConfig]):
-        self._by_name: Dict[str, Channel] = {cfg.name: Channel(cfg) for cfg in configs}
+        self._by_name: Dict[str, Channel] = {cfg.name: make_channel(cfg) for cfg in configs}
+        self._subscriptions: Dict[str, Subscription] = {}
 
     def channel(self, name: str) -> Channel:
         return self._by_name[name]
 
     def names(self):
         return list(self._by_name.keys())
+
+    def drain_all(self, max_items: Optional[int] = None) -> Dict[str, List]:
+        """Batch-drain every channel; returns {topic: [items]} for the non-empty ones only."""
+        out: Dict[str, List] = {}
+        for name, ch in self._by_name.items():
+            items = ch.drain_batch(max_items)
+            if items:
+                out[name] = items
+        return out
+
+    def match(self, patterns: Iterable[str]) -> List[str]:
+        """Topics matching any of `patterns` (exact names or fnmatch wildcards such as "*_frame"), in
+        registry order. "priority" (command) channels match by exact name only."""
+        pats = list(patterns)
+        return [name for name, ch in self._by_name.items()
+                if name in pats or (ch.cfg.policy != "priority" and any(fnmatch.fnmatchcase(name, p) for p in pats))]
+
+    def subscribe(self, name: str, patterns: Iterable[str] = ("*",), maxsize: Optional[int] = None,
+                  policy: Optional[str] = None) -> "Subscription":
+        """Give subscriber `name` its own channel for every topic matching `patterns`.
+
+        Each channel copies the topic's config unless `maxsize`/`policy` override it. Patterns are resolved
+        here, once, into each topic's routing index, so a put costs one put per subscriber of that topic and
+        never looks at other topics. A topic with subscribers stops filling its own channel, so every
+        consumer of it should subscribe. Its own listeners stop firing (there is nothing to drain), and its
+        metrics count the routed items as `routed`; puts and drains show on the subscribers' channels.
+        """
+        if name in self._subscriptions:
+            raise ValueError(f"already subscribed: {name!r}")
+        topics = self.match(patterns)
+        if any(self._by_name[t].cfg.policy == "priority" for t in topics):
+            raise ValueError("\"priority\" command channels are point-to-point and cannot be subscribed")
+        overrides = {k: v for k, v in (("maxsize", maxsize), ("policy", policy)) if v is not None}
+        sub = Subscription(name, [replace(self._by_name[t].cfg, **overrides) for t in topics])
+        for t in topics:
+            ch = self._by_name[t]
+            ch._subscribers = ch._subscribers + (sub.channel(t),)
+        self._subscriptions[name] = sub
+        return sub
+
+    def unsubscribe(self, sub: "Subscription") -> None:
+        """Detach `sub`. A topic left without subscribers goes back to filling its own channel. The
+        subscriber's channels lose their metrics, and BusMetrics drops them from its next report."""
+        if self._subscriptions.pop(sub.name, None) is None:
+            return
+        for t in sub.names():
+            ch = self._by_name[t]
+            ch._subscribers = tuple(c for c in ch._subscribers if c is not sub.channel(t))
+            sub.channel(t).metrics = None
+
+    def subscriptions(self) -> List["Subscription"]:
+        return list(self._subscriptions.values())
+
+class Subscription(ChannelRegistry):
+    """One subscriber's private channels, one per matched topic.
+
+    It is a ChannelRegistry itself, so AsyncBridge, TkPump and BusMetrics.attach take it in place of the
+    shared registry and only ever visit the topics it subscribed to.
+    """
+    def __init__(self, name: str, configs: Iterable[ChannelConfig]):
+        super().__init__(configs)
+        self.name = name
@@ -0,0 +1,85 @@
+from __future__ import annotations
+import json
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from messages import Envelope, as_dict
+import wire
+
+try:
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+try:
+    import msgpack as _msgpack
+except ImportError:
+    _msgpack = None
+
+Encoded = Union[str, bytes]
+
+# "json" goes out as a text frame (orjson when installed, stdlib otherwise); "msgpack" and "binary"
+# (columnar frames, see wire.py) as binary frames.
+FORMATS: Tuple[str, ...] = ("json", "binary") + (("msgpack",) if _msgpack is not None else ())
+
+def envelope_dict(env: Envelope, seq: Optional[int] = None) -> Dict[str, Any]:
+    d = {"topic": env.topic, "payload": as_dict(env.payload), "ts": env.ts}
+    if seq is not None:
+        d["seq"] = seq
+    return d
+
+def dumps(d: Dict[str, Any], fmt: str = "json") -> Encoded:
+    """Serialize a plain message dict in one of the dict-shaped formats ("json", "msgpack")."""
+    if fmt == "json":
+        return _orjson.dumps(d).decode() if _orjson is not None else json.dumps(d)
+    if fmt == "msgpack" and _msgpack is not None:
+        return _msgpack.packb(d, use_bin_type=True)
+    raise ValueError(f"unsupported wire format: {fmt!r}")
+
+def encode(env: Envelope, fmt: str = "json", seq: Optional[int] = None) -> Encoded:
+    if fmt != "binary":
+        return dumps(envelope_dict(env, seq), fmt)
+    frame = wire.encode_batch(env.topic, (env,), seq or 0)
+    return frame if frame is not None else encode(env, "json", seq)
+
+class EncodedCache:
+    """Serialized frames keyed by envelope identity: each (envelope, format, seq) is encoded exactly once,
+    however many clients receive it.
+
+    The envelope is kept next to its bytes so its id() cannot be reused while the entry is alive.
+    Oldest entries are evicted past `capacity`.
+    """
+    def __init__(self, capacity: int = 4096):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Tuple[int, str, Optional[int]], Tuple[Envelope, Encoded]] = OrderedDict()
+
+    def get(self, env: Envelope, fmt: str = "json", seq: Optional[int] = None) -> Encoded:
+        key = (id(env), fmt, seq)   # the seq is part of the bytes
+        hit = self._entries.get(key)
+        if hit is not None and hit[0] is env:
+            self.hits += 1
+            return hit[1]
+        self.misses += 1
+        data = encode(env, fmt, seq)
+        self._entries[key] = (env, data)
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+        return data
+
+    def put(self, env: Envelope, fmt: str, data: Encoded, seq: Optional[int] = None) -> None:
+        """Seed the cache with an encoding made elsewhere (e.g. in another process), numbered `seq`."""
+        self._entries[(id(env), fmt, seq)] = (env, data)
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def get_batch(self, topic: str, envs: Sequence[Envelope], fmt: str = "json",
+                  seq0: Optional[int] = None) -> List[Encoded]:
+        """"binary" packs the whole batch into one columnar frame; other formats stay one message per envelope."""
+        if fmt == "binary":
+            frame = wire.encode_batch(topic, envs, seq0 or 0)
+            if frame is not None:
+                return [frame]
+            fmt = "json"
+        if seq0 is None:
+            return [self.get(env, fmt) for env in envs]
+        return [self.get(env, fmt, seq0 + i) for i, env in enumerate(envs)]
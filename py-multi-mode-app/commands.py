@@ -0,0 +1,64 @@
+"""Setup command ingress: client JSON -> Command envelopes on the "priority" setup channel.
+
+    {"cmd": "estop", "id": "a1"}                           # urgent: drains ahead of everything queued, never coalesced
+    {"cmd": "resume", "id": "a2"}                          # urgent; queued resumes fold into the newest
+    {"cmd": "set", "name": "rate_hz.pose", "value": 50, "id": "a3"}   # coalesced per name
+
+`CommandIngress.submit` runs on the event loop and never blocks. It parses the message, offers it to the
+channel and returns the immediate "setup_ack" reply: "queued", or "rejected" when the text is not a
+command or the queue is full. The controller later publishes "applied" or "failed" with the same id, or
+"superseded" (with "by": the id of the request that ran) for a request a newer one replaced while queued.
+Requests without an "id" get one from the ingress, returned in the "queued" reply.
+"""
+from __future__ import annotations
+import itertools
+import json
+import time
+from typing import Any, Dict, Optional
+from channels import PriorityChannel
+from messages import Command, CommandResult, Envelope
+
+COMMAND_PRIORITIES: Dict[str, int] = {"estop": 0, "resume": 0}
+DEFAULT_PRIORITY = 1
+# Commands sharing a coalescing key supersede each other while queued; "set" coalesces per setting name.
+# "estop" has no key: a stop must never be folded into anything, so every one is applied.
+COALESCE_KEYS: Dict[str, str] = {"resume": "resume"}
+
+def parse_command(msg: Dict[str, Any], client: str, cid: str) -> Command:
+    cmd = msg["cmd"]
+    if not isinstance(cmd, str):
+        raise TypeError('"cmd" must be a string')
+    name = msg.get("name")
+    if cmd == "set" and not isinstance(name, str):
+        raise ValueError('"set" needs a string "name"')
+    key = "set:" + name if cmd == "set" else COALESCE_KEYS.get(cmd)
+    return Command(cmd, name, msg.get("value"), COMMAND_PRIORITIES.get(cmd, DEFAULT_PRIORITY), key, ((client, cid),))
+
+class CommandIngress:
+    def __init__(self, channel: PriorityChannel):
+        self.channel = channel
+        self._ids = itertools.count(1)
+
+    def submit(self, text: Any, client: str) -> Envelope:
+        """Queue one client message; returns the "setup_ack" envelope for that client."""
+        msg: Optional[Dict[str, Any]] = None
+        if isinstance(text, str):
+            try:
+                msg = json.loads(text)
+            except ValueError:
+                pass
+        if not isinstance(msg, dict) or "cmd" not in msg:
+            return command_ack("", client, "", "rejected", 'expected a JSON object with a "cmd"')
+        cid = str(msg["id"]) if msg.get("id") is not None else "srv-%d" % next(self._ids)
+        try:
+            command = parse_command(msg, client, cid)
+        except (TypeError, ValueError) as e:
+            return command_ack(cid, client, str(msg["cmd"]), "rejected", str(e))
+        if not self.channel.offer(Envelope(topic="setup", payload=command, ts=time.time())):
+            return command_ack(cid, client, command.cmd, "rejected", "command queue full")
+        return command_ack(cid, client, command.cmd, "queued")
+
+def command_ack(cid: str, client: str, cmd: str, status: str, error: Optional[str] = None,
+                coalesced: int = 1, by: Optional[str] = None) -> Envelope:
+    result = CommandResult(cid, client, cmd, status, error is None, error, coalesced, by)
+    return Envelope(topic="setup_ack", payload=result, ts=time.time())
@@ -1,17 +1,69 @@
 from __future__ import annotations
-import threading, time, math, random
-from typing import Callable
+import threading, time, math, random, struct
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Tuple
+from change_filter import ChangeFilter
 from channels import ChannelRegistry
-from messages import Envelope, Telemetry, FrameMsg, Detection, PoseMsg
+from commands import command_ack
+from messages import Command, Envelope, Telemetry, FrameMsg, Detection, PoseMsg
+from scheduler import Scheduler
+if TYPE_CHECKING:
+    from batch_sim import BatchSim
+    from frame_pool import FramePool   # shared_memory is only imported by whoever builds the pools
+
+# Per-source tick rates (Hz). Each source runs on its own absolute deadlines.
+DEFAULT_RATES: Dict[str, float] = {
+    "setup": 50.0,
+    "kpi": 20.0,
+    "pose": 100.0,
+    "detections": 20.0,
+    "frames": 10.0,
+    "image_msgs": 10.0,
+}
+
+# Shape and struct dtype of the simulated frames written into FramePools (see build_frame_pools).
+FRAME_SPECS: Dict[str, Tuple[Tuple[int, ...], str]] = {
+    "visual_frame": ((480, 640, 3), "B"),
+    "thermal_frame": ((240, 320), "H"),
+    "lidar_frame": ((16384, 3), "f"),   # point cloud: x, y, z
+}
+
+# Per-field epsilons for ChangeFilter: moves below these are not worth a publish (see change_filter.py).
+CHANGE_EPS: Dict[str, Dict[str, float]] = {
+    "pose": {"x": 1e-3, "y": 1e-3, "z": 1e-3, "yaw": 1e-3, "pitch": 1e-3, "roll": 1e-3},
+    "detections": {"conf": 0.01, "x": 2, "y": 2, "w": 2, "h": 2},
+}
 
 class Controller:
     """Runs in a background thread. Talks only to the ChannelRegistry."""
-    def __init__(self, reg: ChannelRegistry, on_error: Callable[[Exception], None] | None = None):
+    def __init__(self, reg: ChannelRegistry, on_error: Callable[[Exception], None] | None = None,
+                 rates: Dict[str, float] | None = None, overrun: str = "skip",
+                 frame_pools: Dict[str, FramePool] | None = None, change_filter: ChangeFilter | None = None,
+                 sim: BatchSim | None = None):
         self.reg = reg
+        # With a BatchSim, kpi and pose ticks publish K sources at once (K x M samples, K poses) in one put each.
+        self.sim = sim
+        # Optional change detection for pose/detections; None publishes every tick.
+        self.change_filter = change_filter
+        # With pools, frames are rendered into shared memory and only FrameHandles go through the channels.
+        self.frame_pools = frame_pools or {}
+        # "estop" halts every source except "setup" until "resume"; "set" values without a handler land in settings.
+        self.halted = False
+        self.settings: Dict[str, Any] = {}
+        self._patterns = {t: _test_pattern(*FRAME_SPECS[t]) for t in self.frame_pools}
+        self._frame_no = 0
         self._stop = threading.Event()
         self._on_error = on_error or (lambda e: None)
         self._thread: threading.Thread | None = None
         self._t0 = time.perf_counter()
+        self.rates = {**DEFAULT_RATES, **(rates or {})}
+        self.scheduler = Scheduler(overrun=overrun)
+        self.scheduler.add("setup", self.rates["setup"], self._read_setup)
+        kpi, pose = (self._push_kpi, self._push_pose) if sim is None else (self._push_kpi_batch, self._push_pose_batch)
+        self._kpi_task = self.scheduler.add("kpi", self.rates["kpi"], self._unless_halted(kpi))
+        self._pose_task = self.scheduler.add("pose", self.rates["pose"], self._unless_halted(pose))
+        self.scheduler.add("detections", self.rates["detections"], self._unless_halted(self._push_detections))
+        self.scheduler.add("frames", self.rates["frames"], self._unless_halted(self._push_frames))
+        self.scheduler.add("image_msgs", self.rates["image_msgs"], self._unless_halted(self._push_image_msgs))
 
     def start(self):
         if self._thread and self._thread.is_alive():
@@ -24,44 +76,135 @@ class Controller:
         if self._thread:
             self._thread.join(timeout=2.0)
 
-    # --- Example "external process" simulation ---
+    def loop_stats(self) -> Dict[str, Dict[str, float]]:
+        """Achieved rate, start-time jitter percentiles and overrun counts per source."""
+        return self.scheduler.stats()
+
     def _run(self):
         try:
-            phase = 0.0
-            while not self._stop.is_set():
-                now = time.time()
-
-                # 1) Read commands/setup if any
-                setup_ch = self.reg.channel("setup")
-                for env in setup_ch.try_drain():
-                    # Apply setup/config commands here (env.payload)
-                    pass
-
-                # 2) Push telemetry / KPI
-                val = math.sin(phase) + random.uniform(-0.05, 0.05)
-                env = Envelope(topic="kpi", payload=Telemetry(source="sim", value=val), ts=now)
-                self.reg.channel("kpi").put(env)
-
-                # 3) Pose and detections
-                pose = Envelope(topic="pose", payload=PoseMsg(x=math.sin(phase), y=math.cos(phase), z=0.0,
-                                                              yaw=phase%6.28, pitch=0.0, roll=0.0), ts=now)
-                self.reg.channel("pose").put(pose)
-
-                det = Envelope(topic="detections", payload=Detection(cls="target", conf=0.9,
-                                                                     x=42, y=40, w=100, h=80), ts=now)
-                self.reg.channel("detections").put(det)
-
-                # 4) Frames (latest wins)
-                for t in ("visual_frame","thermal_frame","lidar_frame"):
-                    frame = Envelope(topic=t, payload=FrameMsg(path=None, ts=now), ts=now)
-                    self.reg.channel(t).put(frame)
-
-                # 5) Image message logs (bounded)
-                for t in ("visual_image_msg","thermal_image_msg","lidar_image_msg"):
-                    msg = Envelope(topic=t, payload={"saved": True, "path": f"/tmp/{t}_{int(now)}.png"}, ts=now)
-                    self.reg.channel(t).put(msg)
-
-                phase += 0.05
-                time.sleep(0.05)  # simulate I/O pace
+            self.scheduler.run(self._stop)
         except Exception as e:
             self._on_error(e)
+
+    # --- Example "external process" simulation ---
+    # Phase follows elapsed time (1 rad/s) rather than tick count, so it is independent of each source's rate.
+    def _phase(self) -> float:
+        return time.perf_counter() - self._t0
+
+    def _unless_halted(self, fn: Callable[[], None]) -> Callable[[], None]:
+        def tick():
+            if not self.halted:
+                fn()
+        return tick
+
+    def _read_setup(self):
+        # 1) Read commands/setup if any: the whole queue, urgent first and already coalesced
+        batch = self.reg.channel("setup").drain_batch()
+        if batch:
+            self._handle_commands(batch)
+
+    def _handle_commands(self, batch: List[Envelope]):
+        """Apply one tick's commands in drain order and answer every request folded into each one on
+        "setup_ack" (when the registry has that topic). The newest origin is the request that ran; the
+        older ones it replaced are answered "superseded"."""
+        acks = self.reg.channel("setup_ack") if "setup_ack" in self.reg.names() else None
+        for env in batch:
+            cmd = env.payload
+            if not isinstance(cmd, Command):
+                continue
+            try:
+                self._apply(cmd)
+                ok, error = True, None
+            except (KeyError, TypeError, ValueError) as e:
+                ok, error = False, str(e)
+            if acks is None:
+                continue
+            n = len(cmd.origins)
+            ran = cmd.origins[-1][1]
+            for client, cid in cmd.origins[:-1]:
+                acks.put(command_ack(cid, client, cmd.cmd, "superseded", None, n, by=ran))
+            client, cid = cmd.origins[-1]
+            acks.put(command_ack(cid, client, cmd.cmd, "applied" if ok else "failed", error, n))
+
+    def _apply(self, cmd: Command):
+        if cmd.cmd == "estop":
+            self.halted = True
+        elif cmd.cmd == "resume":
+            self.halted = False
+        elif cmd.cmd == "set" and cmd.name.startswith("rate_hz."):
+            # Retime a source, e.g. {"cmd": "set", "name": "rate_hz.pose", "value": 50}
+            source = cmd.name[len("rate_hz."):]
+            task = next((t for t in self.scheduler.tasks if t.name == source), None)
+            if task is None:
+                raise KeyError(f"no scheduled source {source!r}")
+            hz = float(cmd.value)
+            if hz <= 0:
+                raise ValueError("rate must be > 0")
+            task.period = 1.0 / hz
+        elif cmd.cmd == "set":
+            self.settings[cmd.name] = cmd.value
+        else:
+            raise ValueError(f"unknown command: {cmd.cmd!r}")
+
+    def _push_kpi(self):
+        # 2) Push telemetry / KPI
+        now = time.time()
+        val = math.sin(self._phase()) + random.uniform(-0.05, 0.05)
+        self.reg.channel("kpi").put(Envelope(topic="kpi", payload=Telemetry(source="sim", value=val), ts=now))
+
+    def _push_pose(self):
+        # 3) Pose and detections
+        now, phase = time.time(), self._phase()
+        pose = Envelope(topic="pose", payload=PoseMsg(x=math.sin(phase), y=math.cos(phase), z=0.0,
+                                                      yaw=phase%6.28, pitch=0.0, roll=0.0), ts=now)
+        if self.change_filter is None or self.change_filter.admit(pose):
+            self.reg.channel("pose").put(pose)
+
+    def _push_kpi_batch(self):
+        self.reg.channel("kpi").put_batch(self.sim.kpi_envelopes(time.time(), self._kpi_task.period))
+
+    def _push_pose_batch(self):
+        poses = self.sim.pose_envelopes(time.time(), self._pose_task.period)
+        if self.change_filter is not None:
+            poses = [env for env in poses if self.change_filter.admit(env)]
+        self.reg.channel("pose").put_batch(poses)
+
+    def _push_detections(self):
+        now = time.time()
+        det = Envelope(topic="detections", payload=Detection(cls="target", conf=0.9,
+                                                             x=42, y=40, w=100, h=80), ts=now)
+        if self.change_filter is None or self.change_filter.admit(det):
+            self.reg.channel("detections").put(det)
+
+    def _push_frames(self):
+        # 4) Frames (latest wins)
+        now = time.time()
+        self._frame_no += 1
+        for t in ("visual_frame","thermal_frame","lidar_frame"):
+            handle = None
+            pool = self.frame_pools.get(t)
+            if pool is not None:
+                pattern = self._patterns[t]
+                n = len(pattern) // 2
+                off = (self._frame_no * 4096) % n
+                def render(view, src=pattern[off:off + n]):
+                    view[:] = src
+                handle = pool.fill(*FRAME_SPECS[t], render)
+                if handle is None:
+                    continue   # every slot is leased by a reader; skip this frame rather than wait
+            frame = Envelope(topic=t, payload=FrameMsg(path=None, ts=now, handle=handle), ts=now)
+            self.reg.channel(t).put(frame)
+
+    def _push_image_msgs(self):
+        # 5) Image message logs (bounded)
+        now = time.time()
+        for t in ("visual_image_msg","thermal_image_msg","lidar_image_msg"):
+            msg = Envelope(topic=t, payload={"saved": True, "path": f"/tmp/{t}_{int(now)}.png"}, ts=now)
+            self.reg.channel(t).put(msg)
+
+def _test_pattern(shape: Tuple[int, ...], dtype: str) -> memoryview:
+    # Two frames' worth of a byte ramp; sliding a window over it gives a moving image with one memcpy per frame.
+    n = struct.calcsize(dtype)
+    for d in shape:
+        n *= d
+    return memoryview(bytes(i & 0xFF for i in range(256)) * (2 * n // 256 + 1))[:2 * n]
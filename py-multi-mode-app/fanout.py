@@ -0,0 +1,384 @@
+from __future__ import annotations
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Iterable, List, Optional, Sequence, Set, Tuple
+from codec import EncodedCache, FORMATS, dumps, encode
+from delta import DeltaCodec, DeltaKey, delta_key, frame_dict
+from downsample import Downsampler
+from metrics import Histogram
+from messages import Envelope
+import wire
+
+FANOUT_POLICIES = ("drop_old", "latest", "disconnect")
+
+# Backpressure on rates: every RATE_ADAPT_S a session whose queue is at least half full halves its rate scale
+# (down to RATE_SCALE_MIN); one that has drained below an eighth of it wins RATE_SCALE_STEP back (AIMD).
+RATE_ADAPT_S = 0.5
+RATE_SCALE_MIN = 1.0 / 32
+RATE_SCALE_STEP = 0.125
+
+class ClientSession:
+    """One client's bounded outbound queue plus the task that drains it into `send`.
+
+    Overflow reuses the ChannelConfig vocabulary: "drop_old" evicts the oldest queued message,
+    "latest" keeps only the newest message per topic, "disconnect" closes the client.
+    `topics` is the subscription ("*" matches every topic) and `fmt` the negotiated wire format.
+    With `delta` set, JSON/msgpack clients get keyframes and deltas (see delta.py) on the FanOut's delta
+    topics; `acked` holds the keyframe seq the client acknowledged per delta key (envelope topic and source).
+    `rates` caps topics ("*" for the rest) at a maximum rate with a reducer (see downsample.py), scaled by
+    `rate_scale` when the queue backs up; while it is below 1, uncapped topics get an automatic "latest" cap.
+    """
+    def __init__(self, key: Hashable, send: Callable[[Any], Awaitable[None]],
+                 close: Optional[Callable[[], Awaitable[None]]] = None,
+                 maxsize: int = 256, policy: str = "drop_old", name: Optional[str] = None,
+                 topics: Iterable[str] = ("*",), fmt: str = "json", e2e: Optional[Histogram] = None,
+                 deltas: Optional[DeltaCodec] = None):
+        if policy not in FANOUT_POLICIES:
+            raise ValueError(f"unknown fan-out policy: {policy!r}")
+        self.key = key
+        self.name = name or str(key)
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self.topics: Set[str] = set(topics)
+        self.fmt = fmt
+        self.delta = False
+        self.acked: Dict[DeltaKey, int] = {}
+        self.deltas = deltas  # the FanOut's codec, which knows what key an acked keyframe belongs to
+        self.rates: Dict[str, Tuple[float, str]] = {}
+        self.rate_scale = 1.0
+        self.windows: Dict[str, Downsampler] = {}
+        self._adapt_at = 0.0
+        self.sent = 0
+        self.dropped = 0
+        self.closed = False
+        self.last_send_s = 0.0
+        self.e2e = e2e  # records Envelope.ts -> send completion while bus metrics are on
+        self._send = send
+        self._close = close
+        # (message, queued at, topic, envelope ts)
+        self._buf: Deque[Tuple[Any, float, Optional[str], float]] = deque()
+        self._ready = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def subscribe(self, topics: Iterable[str]) -> None:
+        """Replace the subscription. ["*"] means every topic, [] means none."""
+        self.topics = set(topics)
+
+    def set_format(self, fmt: str) -> None:
+        if fmt not in FORMATS:
+            raise ValueError(f"unsupported wire format: {fmt!r}")
+        self.fmt = fmt
+
+    def ack(self, topic: str, seq: int) -> None:
+        # Acks of a keyframe already replaced (or of no keyframe) are ignored: deltas only refer to current ones.
+        key = self.deltas.keyframe_key(topic, seq) if self.deltas is not None else None
+        if key is not None:
+            self.acked[key] = seq
+
+    def set_rate(self, topic: str, hz: Optional[float], reduce: str = "latest") -> None:
+        """Cap `topic` ("*": every topic without a cap of its own) at `hz` messages per second, reduced
+        with `reduce`; a falsy `hz` lifts the cap."""
+        w = self.windows.pop(topic, None)
+        if w is not None:
+            w.cancel()
+        if not hz:
+            self.rates.pop(topic, None)
+            return
+        Downsampler(hz, reduce)  # validates
+        self.rates[topic] = (float(hz), reduce)
+
+    def adapt(self, now: float) -> None:
+        if now < self._adapt_at:
+            return
+        self._adapt_at = now + RATE_ADAPT_S
+        queued = len(self._buf)
+        if queued * 2 >= self.maxsize:
+            self.rate_scale = max(RATE_SCALE_MIN, self.rate_scale / 2)
+        elif queued * 8 <= self.maxsize and self.rate_scale < 1.0:
+            self.rate_scale = min(1.0, self.rate_scale + RATE_SCALE_STEP)
+
+    def window(self, topic: str, now: float, topic_hz: float) -> Optional[Downsampler]:
+        """The Downsampler `topic` goes through right now, or None to send every envelope. `topic_hz` is
+        the rate batches of the topic arrive at, the base of an automatic cap."""
+        spec = self.rates.get(topic) or self.rates.get("*")
+        w = self.windows.get(topic)
+        if spec is None and self.rate_scale >= 1.0:
+            if w is not None:   # the cap was lifted: what the window held is superseded by this batch
+                w.cancel()
+                del self.windows[topic]
+            return None
+        hz, reduce = spec if spec is not None else (topic_hz, "latest")
+        if w is None or w.reduce != reduce or w.auto != (spec is None):
+            if w is not None:
+                w.cancel()
+            w = self.windows[topic] = Downsampler(max(hz, 1e-3), reduce, auto=spec is None)
+        w.hz = max(hz * self.rate_scale, 1e-3)
+        return w
+
+    def clear_windows(self) -> None:
+        for w in self.windows.values():
+            w.cancel()
+        self.windows.clear()
+
+    def wants(self, topic: str) -> bool:
+        return topic in self.topics or "*" in self.topics
+
+    def offer(self, msg: Any, topic: Optional[str] = None, ts: float = 0.0) -> bool:
+        """Queue `msg` without waiting. `ts` is the (oldest) envelope ts it carries, 0 for messages that
+        are not envelopes. Returns False once the session is closed."""
+        if self.closed:
+            return False
+        buf = self._buf
+        if self.policy == "latest" and buf:
+            kept = [e for e in buf if e[2] != topic]
+            if len(kept) != len(buf):
+                self.dropped += len(buf) - len(kept)
+                buf.clear()
+                buf.extend(kept)
+        if len(buf) >= self.maxsize:
+            if self.policy == "disconnect":
+                self.dropped += len(buf) + 1
+                self.shutdown()
+                return False
+            buf.popleft()
+            self.dropped += 1
+        buf.append((msg, time.monotonic(), topic, ts))
+        self._ready.set()
+        return True
+
+    def shutdown(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._buf.clear()
+        self._ready.set()
+        if self._close is not None:
+            asyncio.ensure_future(self._close())
+
+    async def _run(self) -> None:
+        buf = self._buf
+        try:
+            while not self.closed:
+                await self._ready.wait()
+                self._ready.clear()
+                while buf and not self.closed:
+                    msg, _, _, ts = buf.popleft()
+                    t0 = time.monotonic()
+                    await self._send(msg)
+                    self.last_send_s = time.monotonic() - t0
+                    self.sent += 1
+                    if self.e2e is not None and ts:
+                        self.e2e.record(time.time() - ts)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.shutdown()  # broken connection: stop queueing for it
+
+    async def wait_closed(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        oldest = self._buf[0][1] if self._buf else None
+        return {
+            "policy": self.policy,
+            "fmt": self.fmt,
+            "delta": self.delta,
+            "topics": sorted(self.topics),
+            "queued": len(self._buf),
+            "maxsize": self.maxsize,
+            "lag_s": 0.0 if oldest is None else time.monotonic() - oldest,
+            "rates": {t: {"hz": hz, "reduce": r} for t, (hz, r) in self.rates.items()},
+            "rate_scale": self.rate_scale,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "last_send_s": self.last_send_s,
+            "closed": self.closed,
+        }
+
+class FanOut:
+    """Non-blocking broadcast to many clients. A slow client only fills (and overflows) its own queue."""
+    def __init__(self, maxsize: int = 256, policy: str = "drop_old", deltas: Optional[DeltaCodec] = None,
+                 e2e: Optional[Histogram] = None):
+        if policy not in FANOUT_POLICIES:
+            raise ValueError(f"unknown fan-out policy: {policy!r}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.deltas = deltas
+        self.e2e = e2e
+        self._sessions: Dict[Hashable, ClientSession] = {}
+        self._topic_hz: Dict[str, List[float]] = {}   # topic -> [window start, batches, batches per second]
+
+    def add(self, key: Hashable, send: Callable[[Any], Awaitable[None]],
+            close: Optional[Callable[[], Awaitable[None]]] = None,
+            maxsize: Optional[int] = None, policy: Optional[str] = None,
+            name: Optional[str] = None) -> ClientSession:
+        s = ClientSession(key, send, close, maxsize or self.maxsize, policy or self.policy, name, e2e=self.e2e,
+                          deltas=self.deltas)
+        self._sessions[key] = s
+        s.start()
+        return s
+
+    async def remove(self, key: Hashable) -> None:
+        s = self._sessions.pop(key, None)
+        if s is not None:
+            s.closed = True
+            s.clear_windows()
+            await s.wait_closed()
+
+    def session(self, key: Hashable) -> Optional[ClientSession]:
+        return self._sessions.get(key)
+
+    def publish(self, msg: Any, topic: Optional[str] = None) -> None:
+        dead = [key for key, s in self._sessions.items() if not s.offer(msg, topic)]
+        for key in dead:
+            self._sessions.pop(key, None)
+
+    def publish_to(self, name: str, env: Envelope, cache: EncodedCache) -> bool:
+        """Queue `env` for the session called `name` only (e.g. a command result). False if it is gone."""
+        for key, s in self._sessions.items():
+            if s.name != name:
+                continue
+            if not s.offer(cache.get(env, s.fmt), env.topic, env.ts):
+                self._sessions.pop(key, None)
+            return True
+        return False
+
+    def publish_envelope(self, env: Envelope, cache: EncodedCache) -> None:
+        self.publish_batch(env.topic, (env,), cache)
+
+    def publish_batch(self, topic: str, envs: Sequence[Envelope], cache: EncodedCache,
+                      seq0: Optional[int] = None, encoded: Optional[Dict[str, List[Any]]] = None) -> None:
+        """Offer envelopes of one topic to every subscribed client. Costs one encode per wire format in
+        use (binary clients get a single frame for the batch), not one per client. `seq0` (from a
+        SnapshotStore) numbers the envelopes on the wire. Rate-capped clients only fold the batch into
+        their Downsampler here and are sent its reduction when the window is due. `encoded` holds
+        encodings of the batch made elsewhere, per format, in the shape cache.get_batch returns."""
+        now = time.monotonic()
+        topic_hz = self._arrival_hz(topic, now)
+        encoded = dict(encoded) if encoded else {}
+        delta_topic = self.deltas is not None and seq0 is not None and self.deltas.handles(topic)
+        frames = None
+        framed: Dict[Tuple[str, int], Any] = {}
+        dead = []
+        for key, s in self._sessions.items():
+            if not s.wants(topic):
+                continue
+            s.adapt(now)
+            w = s.window(topic, now, topic_hz) if s.rates or s.rate_scale < 1.0 or s.windows else None
+            if w is not None:
+                w.add(envs, seq0)
+                if now >= w.due:
+                    if not self._emit(s, topic, w, cache, now):
+                        dead.append(key)
+                elif w.timer is None:
+                    w.timer = asyncio.get_running_loop().call_later(w.due - now, self._flush, key, topic, cache)
+                continue
+            if delta_topic and s.delta and s.fmt != "binary":
+                if frames is None:
+                    frames = self.deltas.frames(topic, envs, seq0)
+                msgs = self._delta_batch(s, topic, envs, seq0, frames, cache, framed)
+            else:
+                msgs = encoded.get(s.fmt)
+                if msgs is None:
+                    msgs = encoded[s.fmt] = cache.get_batch(topic, envs, s.fmt, seq0)
+            # One message per envelope, or one binary frame for the batch (stamped with its oldest ts).
+            per_env = len(msgs) == len(envs)
+            for i, msg in enumerate(msgs):
+                if not s.offer(msg, topic, envs[i].ts if per_env else envs[0].ts):
+                    dead.append(key)
+                    break
+        for key in dead:
+            self._sessions.pop(key, None)
+
+    def _arrival_hz(self, topic: str, now: float) -> float:
+        r = self._topic_hz.get(topic)
+        if r is None:
+            r = self._topic_hz[topic] = [now, 0, 0.0]
+        r[1] += 1
+        if now - r[0] >= 1.0:
+            r[2] = r[1] / (now - r[0])
+            r[0], r[1] = now, 0
+        return r[2] or r[1] / max(now - r[0], 1e-3)
+
+    @staticmethod
+    def _emit(s: ClientSession, topic: str, w: Downsampler, cache: EncodedCache, now: float) -> bool:
+        w.cancel()
+        out = w.take(now)
+        if not out:
+            return True
+        if s.fmt == "binary":
+            # A frame numbers its rows seq0, seq0 + 1, ..., so a window (whose seqs have gaps) goes out as one
+            # frame per run of consecutive seqs of one envelope topic, each headed by the run's first seq.
+            runs: List[List[Tuple[Envelope, Optional[int]]]] = []
+            for e in out:
+                prev = runs[-1][-1] if runs else None
+                if prev is not None and prev[0].topic == e[0].topic and prev[1] is not None and e[1] == prev[1] + 1:
+                    runs[-1].append(e)
+                else:
+                    runs.append([e])
+            out = []
+            for run in runs:
+                envs = [env for env, _ in run]
+                frame = wire.encode_batch(envs[0].topic, envs, run[0][1] or 0)
+                if frame is None:
+                    out += run
+                elif not s.offer(frame, topic, envs[0].ts):
+                    return False
+        fmt = "json" if s.fmt == "binary" else s.fmt
+        for env, seq in out:
+            if not s.offer(cache.get(env, fmt, seq) if w.shared else encode(env, fmt, seq), topic, env.ts):
+                return False
+        return True
+
+    def _flush(self, key: Hashable, topic: str, cache: EncodedCache) -> None:
+        # Timer callback: a window no later batch completed goes out on time.
+        s = self._sessions.get(key)
+        w = s.windows.get(topic) if s is not None else None
+        if w is None:
+            return
+        w.timer = None
+        if not self._emit(s, topic, w, cache, time.monotonic()):
+            self._sessions.pop(key, None)
+
+    @staticmethod
+    def _delta_batch(s: ClientSession, topic: str, envs: Sequence[Envelope], seq0: int, frames,
+                     cache: EncodedCache, framed: Dict[Tuple[str, int], Any]) -> List[Any]:
+        # Keyframes go to every delta client; deltas only to clients that acked their keyframe, the rest
+        # get the full message. Keyframe/delta encodings are shared through `framed`, full ones through `cache`.
+        # Acks are per delta key, like the keyframes they name (see DeltaCodec).
+        acked = s.acked
+        msgs = []
+        for i, frame in enumerate(frames):
+            if frame[1] is not None and frame[0] != acked.get(delta_key(envs[i])):
+                msgs.append(cache.get(envs[i], s.fmt, seq0 + i))
+                continue
+            msg = framed.get((s.fmt, i))
+            if msg is None:
+                msg = framed[(s.fmt, i)] = dumps(frame_dict(envs[i], seq0 + i, frame), s.fmt)
+            msgs.append(msg)
+        return msgs
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def formats(self) -> Set[str]:
+        """Wire formats the connected clients use."""
+        return {s.fmt for s in self._sessions.values()}
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {s.name: s.stats() for s in self._sessions.values()}
+
+    async def close(self) -> None:
+        for key in list(self._sessions):
+            await self.remove(key)
@@ -0,0 +1,160 @@
+from __future__ import annotations
+import multiprocessing as mp
+import struct
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Sequence, Tuple
+from messages import FrameHandle
+
+_HDR_FIELDS = 2  # per slot: generation, lease count (uint64 each)
+
+class StaleFrame(Exception):
+    """The slot behind a FrameHandle was recycled for a newer frame before it was opened."""
+
+class FramePool:
+    """Fixed pool of frame slots in one shared-memory block, reused frame after frame.
+
+    Only a FrameHandle (pool, slot, shape, dtype, generation) travels through the "latest" frame channels.
+    Readers open a handle and get a memoryview straight onto the slot: no copy per consumer, and the
+    same works from another process that attaches the pool by name.
+
+    Recycling is lease based: `read()` takes a lease on the slot for the duration of the `with` block,
+    and the writer only reuses slots with no lease that are not the most recently published one. Each
+    reuse bumps the slot generation, so a handle to a recycled slot raises StaleFrame instead of
+    returning the newer image. Lease bookkeeping happens under one lock (a multiprocessing.Lock so it
+    also works across processes); pixel data is never touched under the lock.
+
+    Every process that holds a pool calls close(); only the creating one unlinks the block.
+    """
+    def __init__(self, slots: int = 4, slot_bytes: int = 1920 * 1080 * 3, name: Optional[str] = None,
+                 lock=None, create: bool = True):
+        if slots < 2:
+            raise ValueError("a frame pool needs at least 2 slots")
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.dropped = 0  # frames not written because every other slot was leased
+        self._lock = lock if lock is not None else mp.Lock()
+        hdr = slots * _HDR_FIELDS * 8
+        self._shm = shared_memory.SharedMemory(name=name, create=create, size=hdr + slots * slot_bytes)
+        self._owner = create
+        self._hdr = self._shm.buf[:hdr].cast("Q")
+        self._data = self._shm.buf[hdr:]
+        self._last = -1
+        if create:
+            for i in range(slots * _HDR_FIELDS):
+                self._hdr[i] = 0
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    # Passing a pool to a child process (as a Process argument) attaches to the same block and lock.
+    def __getstate__(self):
+        return (self.slots, self.slot_bytes, self.name, self._lock)
+
+    def __setstate__(self, state) -> None:
+        slots, slot_bytes, name, lock = state
+        self.__init__(slots, slot_bytes, name=name, lock=lock, create=False)
+
+    def _slot_view(self, slot: int, nbytes: int) -> memoryview:
+        start = slot * self.slot_bytes
+        return self._data[start:start + nbytes]
+
+    def write(self, data, shape: Sequence[int], dtype: str = "B") -> Optional[FrameHandle]:
+        """Copy `data` (any buffer) into a free slot and return its handle, or None if none is free."""
+        src = memoryview(data).cast("B")
+        slot = self._claim(src.nbytes)
+        if slot is None:
+            return None
+        self._slot_view(slot, src.nbytes)[:] = src
+        return self._publish(slot, shape, dtype)
+
+    def fill(self, shape: Sequence[int], dtype: str, fill) -> Optional[FrameHandle]:
+        """Let `fill(view)` render straight into a free slot (no intermediate buffer)."""
+        nbytes = _nbytes(shape, dtype)
+        slot = self._claim(nbytes)
+        if slot is None:
+            return None
+        view = self._slot_view(slot, nbytes)
+        try:
+            fill(view)
+        finally:
+            view.release()
+        return self._publish(slot, shape, dtype)
+
+    def _claim(self, nbytes: int) -> Optional[int]:
+        if nbytes > self.slot_bytes:
+            raise ValueError(f"frame of {nbytes} bytes does not fit a {self.slot_bytes}-byte slot")
+        hdr = self._hdr
+        with self._lock:
+            for i in range(1, self.slots + 1):
+                slot = (self._last + i) % self.slots
+                if slot != self._last and hdr[slot * _HDR_FIELDS + 1] == 0:
+                    hdr[slot * _HDR_FIELDS] += 1  # invalidate handles to the previous frame in this slot
+                    return slot
+        self.dropped += 1
+        return None
+
+    def _publish(self, slot: int, shape: Sequence[int], dtype: str) -> FrameHandle:
+        self._last = slot
+        gen = self._hdr[slot * _HDR_FIELDS]
+        return FrameHandle(pool=self.name, slot=slot, shape=tuple(shape), dtype=dtype, generation=gen)
+
+    def read(self, handle: FrameHandle) -> "FrameLease":
+        """`with pool.read(h) as view:` yields a read-only memoryview cast to the handle's dtype and shape."""
+        return FrameLease(self, handle)
+
+    def _lease(self, handle: FrameHandle) -> None:
+        base = handle.slot * _HDR_FIELDS
+        with self._lock:
+            if self._hdr[base] != handle.generation:
+                raise StaleFrame(f"slot {handle.slot} now holds generation {self._hdr[base]}, not {handle.generation}")
+            self._hdr[base + 1] += 1
+
+    def _release(self, handle: FrameHandle) -> None:
+        with self._lock:
+            self._hdr[handle.slot * _HDR_FIELDS + 1] -= 1
+
+    def close(self) -> None:
+        self._hdr.release()
+        self._data.release()
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+def _nbytes(shape: Sequence[int], dtype: str) -> int:
+    n = struct.calcsize(dtype)
+    for d in shape:
+        n *= d
+    return n
+
+class FrameLease:
+    """Context manager returned by FramePool.read(); holds the slot lease while the view is in use."""
+    def __init__(self, pool: FramePool, handle: FrameHandle):
+        self.pool = pool
+        self.handle = handle
+        self._views: Tuple[memoryview, ...] = ()
+
+    def __enter__(self) -> memoryview:
+        h = self.handle
+        self.pool._lease(h)
+        try:
+            raw = self.pool._slot_view(h.slot, _nbytes(h.shape, h.dtype)).toreadonly()
+            view = raw.cast(h.dtype, h.shape)
+        except Exception:
+            self.pool._release(h)
+            raise
+        self._views = (raw, view)
+        return view
+
+    def __exit__(self, *exc) -> None:
+        for v in reversed(self._views):
+            v.release()
+        self._views = ()
+        self.pool._release(self.handle)
+
+def build_frame_pools(specs: Dict[str, Tuple[Tuple[int, ...], str]], slots: int = 4) -> Dict[str, FramePool]:
+    """One pool per frame topic, each slot sized for that topic's (shape, dtype).
+
+    Topics get separate pools so a busy topic never recycles the slot holding another topic's latest frame.
+    """
+    return {topic: FramePool(slots=slots, slot_bytes=_nbytes(shape, dtype)) for topic, (shape, dtype) in specs.items()}
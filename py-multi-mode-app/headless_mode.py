@@ -0,0 +1,46 @@
+"""Controller without a front end (containers, soak tests): registry, frame pools, Controller and the
+optional bus metrics, until SIGINT/SIGTERM. Neither tkinter nor websockets nor asyncio is imported."""
+from __future__ import annotations
+import signal, threading
+from typing import TYPE_CHECKING
+from change_filter import ChangeFilter
+from controller import Controller, CHANGE_EPS, FRAME_SPECS
+from frame_pool import build_frame_pools
+from startup import StartupTimer
+from topics import build_registry
+if TYPE_CHECKING:
+    from batch_sim import BatchSim
+
+def run_headless(metrics: bool = False, sim: BatchSim | None = None, timer: StartupTimer | None = None):
+    timer = timer or StartupTimer()
+    reg = build_registry("headless")
+    bus_metrics = reporter = None
+    if metrics:
+        from metrics import BusMetrics, MetricsReporter
+        bus_metrics = BusMetrics().attach(reg)
+        reporter = MetricsReporter(bus_metrics, reg.channel("metrics")).start()
+    pools = build_frame_pools(FRAME_SPECS)
+    timer.mark("registry")
+    ctl = Controller(reg, frame_pools=pools, change_filter=ChangeFilter(CHANGE_EPS), sim=sim)
+    ctl.start()
+    timer.mark("controller")
+    timer.done()
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    print(f"headless controller up in {timer.total_ms():.1f} ms", flush=True)
+    try:
+        while not stop.wait(0.5):
+            pass
+    finally:
+        ctl.stop()
+        if reporter is not None:
+            reporter.stop()
+        for pool in pools.values():
+            pool.close()
+        if bus_metrics is not None:
+            print(bus_metrics.text(), end="")
+
+if __name__ == "__main__":
+    run_headless()
@@ -0,0 +1,80 @@
+"""Single entry point for every mode: gui, server and headless (the Controller alone).
+
+    python run.py [--mode headless] [--config run.json] [--timing] [options]
+
+The mode and options come from the command line, from a JSON config file whose keys are the option names
+(`{"mode": "headless", "metrics": true}`), or both, the command line winning. Only the chosen backend is
+imported: tkinter for gui, asyncio and websockets for server, neither for headless. `--workers N` serves
+WebSocket clients from N processes (server_workers.py). Registries come from the topic table in topics.py.
+`--timing` prints how long each startup phase took, measured from the moment this module was imported.
+"""
+from __future__ import annotations
+import time
+T0 = time.perf_counter()   # startup timing starts here, before anything else is imported
+import argparse, json
+from typing import Any
+
+MODES = ("gui", "server", "headless")
+
+def build_parser(mode: str | None = None) -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mode", choices=MODES, default=mode or "server", help="front end to run")
+    ap.add_argument("--config", metavar="FILE", help="JSON file with option defaults, e.g. {\"mode\": \"headless\"}")
+    ap.add_argument("--timing", action="store_true", help="print a startup-phase timing breakdown to stderr")
+    ap.add_argument("--metrics", action="store_true",
+                    help="instrument the bus and publish a \"metrics\" topic (server: also http://127.0.0.1:8765/stats)")
+    ap.add_argument("--sim-sources", type=int, metavar="K",
+                    help="simulate K sources at once with numpy (kpi and pose, see batch_sim.py)")
+    ap.add_argument("--sim-samples", type=int, default=1, metavar="M", help="KPI samples per source per kpi tick")
+    ap.add_argument("--seed", type=int, default=0, help="random seed for --sim-sources")
+    ap.add_argument("--workers", type=int, default=1, metavar="N",
+                    help="server: serve WebSocket clients from N processes sharing the port (Linux)")
+    return ap
+
+def parse_args(argv: list[str] | None = None, mode: str | None = None) -> argparse.Namespace:
+    ap = build_parser(mode)
+    a = ap.parse_args(argv)
+    if a.config:
+        with open(a.config) as f:
+            config: dict[str, Any] = json.load(f)
+        known = set(vars(ap.parse_args([])))
+        unknown = sorted(k for k in config if k.replace("-", "_") not in known)
+        if unknown:
+            ap.error(f"unknown option(s) in {a.config}: {', '.join(unknown)}")
+        ap.set_defaults(**{k.replace("-", "_"): v for k, v in config.items()})
+        a = ap.parse_args(argv)   # the command line overrides the file
+    if a.workers < 1 or (a.workers > 1 and a.mode != "server"):
+        ap.error("--workers N (N >= 1) applies to the server mode")
+    return a
+
+def main(argv: list[str] | None = None, mode: str | None = None):
+    from startup import StartupTimer
+    timer = StartupTimer(T0)
+    a = parse_args(argv, mode)
+    timer.echo = a.timing
+    timer.mark("config")
+    sim = None
+    if a.sim_sources:
+        from batch_sim import BatchSim  # numpy is only needed for batch simulation
+        sim = BatchSim(a.sim_sources, a.sim_samples, a.seed)
+        timer.mark("batch sim")
+    if a.mode == "headless":
+        from headless_mode import run_headless
+        timer.mark("import headless")
+        run_headless(a.metrics, sim, timer)
+    elif a.mode == "gui":
+        from tk_mode import run_gui
+        timer.mark("import gui")
+        run_gui(a.metrics, sim, timer)
+    elif a.workers > 1:
+        from server_workers import run_workers
+        timer.mark("import server")
+        run_workers(a.workers, a.metrics, sim, timer)
+    else:
+        import asyncio
+        from server_mode import main as run_server
+        timer.mark("import server")
+        try:
+            asyncio.run(run_server(a.metrics, sim, timer))
+        except KeyboardInterrupt:
+            pass   # run_server() has already shut everything down
@@ -1,6 +1,6 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Any, Literal, TypedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Literal, Optional, Tuple
 
 # Topics (align to your former queues)
 Topic = Literal[
@@ -14,34 +14,158 @@ Topic = Literal[
     "visual_image_msg",
     "thermal_image_msg",
     "lidar_image_msg",
+    "metrics",
+    "setup_ack",
 ]
 
-class Telemetry(TypedDict):
-    source: str
-    value: float
+class Message:
+    """Slotted payload base.
 
-class FrameMsg(TypedDict):
-    path: str | None
-    ts: float
+    Fields are plain attributes (`p.x`) and keep the mapping access (`p["x"]`) the former TypedDicts
+    had, but without a dict per message. Use `as_dict()` to get a plain dict for encoders.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def keys(self):
+        return self.__slots__
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def __eq__(self, other: object) -> bool:
+        return type(other) is type(self) and all(getattr(self, k) == getattr(other, k) for k in self.__slots__)
+
+    __hash__ = None  # mutable value objects, like the dicts they replace
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{k}={getattr(self, k)!r}" for k in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def __getstate__(self):
+        return tuple(getattr(self, k) for k in self.__slots__)
+
+    def __setstate__(self, state) -> None:
+        for k, v in zip(self.__slots__, state):
+            setattr(self, k, v)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+class Telemetry(Message):
+    __slots__ = ("source", "value")
+
+    def __init__(self, source: str, value: float):
+        self.source = source
+        self.value = value
+
+class FrameHandle(Message):
+    """Where a frame lives in a FramePool (see frame_pool.py); the pixels themselves never travel."""
+    __slots__ = ("pool", "slot", "shape", "dtype", "generation")
+
+    def __init__(self, pool: str, slot: int, shape: Tuple[int, ...], dtype: str, generation: int):
+        self.pool = pool
+        self.slot = slot
+        self.shape = shape
+        self.dtype = dtype
+        self.generation = generation
+
+class FrameMsg(Message):
+    __slots__ = ("path", "ts", "handle")
+
+    def __init__(self, path: str | None, ts: float, handle: FrameHandle | None = None):
+        self.path = path
+        self.ts = ts
+        self.handle = handle
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"path": self.path, "ts": self.ts, "handle": self.handle.to_dict() if self.handle else None}
+
+class Detection(Message):
+    __slots__ = ("cls", "conf", "x", "y", "w", "h")
+
+    def __init__(self, cls: str, conf: float, x: int, y: int, w: int, h: int):
+        self.cls = cls
+        self.conf = conf
+        self.x = x
+        self.y = y
+        self.w = w
+        self.h = h
+
+class PoseMsg(Message):
+    """`source` names the body when several share the "pose" topic (batch simulation); None for a single one."""
+    __slots__ = ("x", "y", "z", "yaw", "pitch", "roll", "source")
+
+    def __init__(self, x: float, y: float, z: float, yaw: float, pitch: float, roll: float,
+                 source: Optional[str] = None):
+        self.x = x
+        self.y = y
+        self.z = z
+        self.yaw = yaw
+        self.pitch = pitch
+        self.roll = roll
+        self.source = source
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = {k: getattr(self, k) for k in self.__slots__}
+        if self.source is None:
+            del d["source"]  # single-body poses keep their original shape on the wire
+        return d
+
+class Command(Message):
+    """A setup command on its way to the controller (see commands.py).
+
+    `priority` 0 is urgent and drains first. `key` names what the command sets, so a newer command with the
+    same key supersedes a queued one (None: never coalesced). `origins` lists the (client, id) of every
+    request folded into it; each gets its own CommandResult.
+    """
+    __slots__ = ("cmd", "name", "value", "priority", "key", "origins")
+
+    def __init__(self, cmd: str, name: Optional[str], value: Any, priority: int, key: Optional[str],
+                 origins: Tuple[Tuple[str, str], ...]):
+        self.cmd = cmd
+        self.name = name
+        self.value = value
+        self.priority = priority
+        self.key = key
+        self.origins = origins
+
+    def coalesce(self, older: "Command") -> "Command":
+        return Command(self.cmd, self.name, self.value, min(self.priority, older.priority), self.key,
+                       older.origins + self.origins)
+
+class CommandResult(Message):
+    """Reply to one setup request, matched by `id`: "queued" or "rejected" from the ingress, then "applied" or
+    "failed" from the controller. `coalesced` is how many requests the applied command stood for. A request
+    replaced by a newer one while queued gets "superseded", with `by` the id of the request that ran."""
+    __slots__ = ("id", "client", "cmd", "status", "ok", "error", "coalesced", "by")
+
+    def __init__(self, id: str, client: str, cmd: str, status: str, ok: bool, error: Optional[str] = None,
+                 coalesced: int = 1, by: Optional[str] = None):
+        self.id = id
+        self.client = client
+        self.cmd = cmd
+        self.status = status
+        self.ok = ok
+        self.error = error
+        self.coalesced = coalesced
+        self.by = by
+
+def as_dict(payload: Any) -> Any:
+    """Plain-dict view of a payload for JSON/msgpack encoders. Non-Message payloads pass through."""
+    return payload.to_dict() if isinstance(payload, Message) else payload
 
-class Detection(TypedDict):
-    cls: str
-    conf: float
-    x: int
-    y: int
-    w: int
-    h: int
-
-class PoseMsg(TypedDict):
-    x: float
-    y: float
-    z: float
-    yaw: float
-    pitch: float
-    roll: float
-
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Envelope:
     topic: Topic
     payload: Any
     ts: float
+    # Monotonic time of the last channel put; stamped only while bus metrics are attached (0.0 otherwise).
+    enq_ts: float = field(default=0.0, compare=False, repr=False)
@@ -1,4 +1,4 @@
-from tk_mode import run_gui
+from launcher import main
 
 if __name__ == "__main__":
-    run_gui()
+    main(mode="gui")
@@ -1,5 +1,4 @@
-from server_mode import main
+from launcher import main
 
 if __name__ == "__main__":
-    import asyncio
-    asyncio.run(main())
+    main(mode="server")
@@ -1,77 +1,201 @@
 from __future__ import annotations
 import json
 import asyncio, signal
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit, parse_qs
 import websockets
 from websockets.server import WebSocketServerProtocol
-from channels import ChannelConfig, ChannelRegistry
-from controller import Controller
+from change_filter import ChangeFilter
+from controller import Controller, CHANGE_EPS, FRAME_SPECS
+from frame_pool import build_frame_pools
 from bridge_async import AsyncBridge
+from codec import EncodedCache, encode
+from commands import CommandIngress
+from delta import DeltaCodec
+from fanout import ClientSession, FanOut, FANOUT_POLICIES
 from messages import Envelope
+from metrics import BusMetrics, MetricsReporter
+from snapshot import SnapshotStore
+from topics import build_registry
+if TYPE_CHECKING:
+    from batch_sim import BatchSim
+    from startup import StartupTimer
 
-def build_registry() -> ChannelRegistry:
-    return ChannelRegistry([
-        ChannelConfig("visual_frame", maxsize=1, policy="latest"),
-        ChannelConfig("thermal_frame", maxsize=1, policy="latest"),
-        ChannelConfig("lidar_frame",   maxsize=1, policy="latest"),
-        ChannelConfig("kpi",           maxsize=1000, policy="drop_old"),
-        ChannelConfig("detections",    maxsize=1000, policy="drop_old"),
-        ChannelConfig("pose",          maxsize=1000, policy="drop_old"),
-        ChannelConfig("setup",         maxsize=10, policy="block"),
-        ChannelConfig("visual_image_msg",  maxsize=1000, policy="drop_old"),
-        ChannelConfig("thermal_image_msg", maxsize=1000, policy="drop_old"),
-        ChannelConfig("lidar_image_msg",   maxsize=1000, policy="drop_old"),
-    ])
-
-async def broadcaster(bridge: AsyncBridge, clients: set[WebSocketServerProtocol]):
-    kpi_q = bridge.get_async_queue("kpi")
-    while True:
-        env: Envelope = await kpi_q.get()
-        payload = {"topic": env.topic, "payload": env.payload, "ts": env.ts}
-        msg = json.dumps(payload)
-        stale = []
-        for ws in list(clients):
-            try:
-                await ws.send(msg)
-            except Exception:
-                stale.append(ws)
-        for ws in stale:
-            clients.discard(ws)
-
-async def handler(ws: WebSocketServerProtocol, reg: ChannelRegistry):
-    await ws.send("hello")
-    # If you need the URL path:
-    # print("client requested path:", ws.path)
-
-    setup_ch = reg.channel("setup")
+async def broadcaster(bridge: AsyncBridge, fanout: FanOut, cache: EncodedCache, max_batch: int = 256,
+                      store: SnapshotStore | None = None, direct: tuple[str, ...] = ("setup_ack",)):
+    """Forwards every bridged topic to subscribed clients. Whatever is queued for a topic goes out as
+    one batch; each envelope is encoded once (per wire format) through `cache` and handed to every
+    client's own queue. Never waits on a socket. With a `store`, batches are numbered and kept for
+    late joiners before they are fanned out. `direct` topics are replies addressed to one client
+    (payload "client"); they go to that session only and are not numbered or kept."""
+    async def forward(topic: str):
+        q = bridge.get_async_queue(topic)
+        while True:
+            batch: list[Envelope] = [await q.get()]
+            while len(batch) < max_batch and not q.empty():
+                batch.append(q.get_nowait())
+            if topic in direct:
+                for env in batch:
+                    fanout.publish_to(env.payload["client"], env, cache)
+                continue
+            seq0 = store.append(topic, batch) if store is not None else None
+            fanout.publish_batch(topic, batch, cache, seq0)
+
+    await asyncio.gather(*(forward(t) for t in bridge.topics))
+
+def client_options(ws: WebSocketServerProtocol) -> dict[str, str]:
+    """Per-client settings from the URL, e.g.
+    ws://127.0.0.1:8765/?policy=latest&maxsize=64&topics=kpi,pose&history=30&rate=kpi:2:mean,pose:10"""
+    path = getattr(ws, "path", None) or getattr(getattr(ws, "request", None), "path", "") or ""
+    return {k: v[-1] for k, v in parse_qs(urlsplit(path).query).items()}
+
+def parse_control(msg) -> dict | None:
+    """Session commands travel on the setup path. Only {"cmd": "subscribe"|"format"|"ack"|"rate", ...}
+    objects are handled by the server; anything else goes to the controller unchanged.
+
+        {"cmd": "subscribe", "topics": ["kpi", "pose"]}   # replaces the subscription; ["*"] = all
+        {"cmd": "format", "format": "binary"}             # wire format, see codec.FORMATS
+        {"cmd": "format", "format": "json", "delta": true}  # keyframes + deltas, see delta.py
+        {"cmd": "ack", "topic": "pose", "seq": 120}       # keyframe received; no reply
+        {"cmd": "rate", "topic": "kpi", "hz": 2, "reduce": "mean"}  # at most 2/s, see downsample.py
+        {"cmd": "rate", "topics": ["*"], "hz": 0}         # lift the caps
+    """
+    if not isinstance(msg, str) or not msg.startswith("{"):
+        return None
+    try:
+        obj = json.loads(msg)
+    except ValueError:
+        return None
+    return obj if isinstance(obj, dict) and obj.get("cmd") in ("subscribe", "format", "ack", "rate") else None
+
+def apply_control(session: ClientSession, ctl: dict) -> dict | None:
+    """Apply a session command; returns the "control" reply, or None for acks."""
+    try:
+        if ctl["cmd"] == "ack":
+            session.ack(str(ctl["topic"]), int(ctl["seq"]))
+            return None
+        if ctl["cmd"] == "subscribe":
+            session.subscribe(ctl.get("topics") or [])
+        elif ctl["cmd"] == "format":
+            session.set_format(ctl.get("format", "json"))
+            session.delta = bool(ctl.get("delta", session.delta))
+        elif ctl["cmd"] == "rate":
+            for topic in ctl.get("topics") or [ctl["topic"]]:
+                session.set_rate(str(topic), ctl.get("hz"), ctl.get("reduce", "latest"))
+    except (KeyError, TypeError, ValueError) as e:
+        return {"topic": "control", "ok": False, "cmd": ctl["cmd"], "error": str(e)}
+    return {"topic": "control", "ok": True, "cmd": ctl["cmd"], "topics": sorted(session.topics),
+            "format": session.fmt, "delta": session.delta, "rates": session.stats()["rates"]}
+
+def apply_rates(session: ClientSession, opts: dict[str, str]) -> None:
+    """?rate=TOPIC:HZ[:REDUCER],... from the URL; malformed entries are ignored."""
+    for item in filter(None, opts.get("rate", "").split(",")):
+        topic, _, rest = item.partition(":")
+        hz, _, reduce = rest.partition(":")
+        try:
+            session.set_rate(topic, float(hz), reduce or "latest")
+        except ValueError:
+            pass
+
+def history_s(opts: dict[str, str]) -> float:
+    try:
+        return max(0.0, float(opts.get("history", 0)))
+    except ValueError:
+        return 0.0
+
+def offer_snapshot(store: SnapshotStore, session: ClientSession, history_s: float = 0.0,
+                   exclude: set[str] = frozenset()) -> None:
+    """Queue one "snapshot" message (see SnapshotStore.snapshot) for the session's topics. Must run in
+    the same event-loop step that starts or changes the subscription, so that the snapshot ends right
+    before the first live message the session receives."""
+    topics = [t for t in store.topics() if session.wants(t) and t not in exclude]
+    if topics:
+        session.offer(json.dumps(store.snapshot(topics, history_s)), "snapshot")
+
+async def handler(ws: WebSocketServerProtocol, ingress: CommandIngress, session: ClientSession, store: SnapshotStore):
     try:
         async for msg in ws:
-            setup_ch.put(Envelope(topic="setup", payload={"raw": msg}, ts=0.0))
+            ctl = parse_control(msg)
+            if ctl is not None:
+                before = {t for t in store.topics() if session.wants(t)}
+                reply = apply_control(session, ctl)
+                if reply is not None:
+                    session.offer(json.dumps(reply), "control")
+                if ctl["cmd"] == "subscribe":
+                    # Newly subscribed topics start with their last value, like a fresh connection.
+                    offer_snapshot(store, session, exclude=before)
+                continue
+            # Controller command: queued without blocking the loop, acknowledged right away on "setup_ack".
+            reply = ingress.submit(msg, session.name)
+            session.offer(encode(reply, session.fmt), reply.topic, reply.ts)
     except websockets.ConnectionClosed:
         pass
 
-async def main():
+def make_ws_handler(ingress: CommandIngress, fanout: FanOut, store: SnapshotStore):
+    """The websockets connection handler: greets, joins the fan-out with the URL options, sends the join
+    snapshot and then serves the setup path until the client goes away."""
+    async def ws_handler(ws: WebSocketServerProtocol):
+        await ws.send("hello")
+        opts = client_options(ws)
+        policy = opts.get("policy") if opts.get("policy") in FANOUT_POLICIES else None
+        maxsize = int(opts["maxsize"]) if opts.get("maxsize", "").isdigit() else None
+        session = fanout.add(ws, ws.send, ws.close, maxsize=maxsize, policy=policy,
+                             name="%s:%s" % ws.remote_address[:2])
+        if opts.get("topics"):
+            session.subscribe(opts["topics"].split(","))
+        apply_rates(session, opts)
+        offer_snapshot(store, session, history_s(opts))
+        try:
+            await handler(ws, ingress, session, store)
+        finally:
+            await fanout.remove(ws)
+    return ws_handler
+
+def stats_route(metrics: BusMetrics):
+    """process_request hook serving metrics.text() at GET /stats on the WebSocket port. Accepts both the
+    legacy (path, headers) and the newer (connection, request) call signatures."""
+    def process_request(*args):
+        if hasattr(args[0], "respond"):
+            conn, request = args
+            return conn.respond(200, metrics.text()) if urlsplit(request.path).path == "/stats" else None
+        if urlsplit(args[0]).path != "/stats":
+            return None
+        return 200, [("Content-Type", "text/plain; charset=utf-8")], metrics.text().encode()
+    return process_request
+
+async def main(metrics: bool = False, sim: BatchSim | None = None, timer: StartupTimer | None = None):
     loop = asyncio.get_running_loop()
 
-    reg = build_registry()
-    ctl = Controller(reg)
+    reg = build_registry("server")
+    # Off by default: channels without metrics skip all counting and timestamping.
+    bus_metrics = BusMetrics().attach(reg) if metrics else None
+    reporter = MetricsReporter(bus_metrics, reg.channel("metrics")).start() if bus_metrics else None
+    pools = build_frame_pools(FRAME_SPECS)
+    if timer is not None:
+        timer.mark("registry")
+    ctl = Controller(reg, frame_pools=pools, change_filter=ChangeFilter(CHANGE_EPS), sim=sim)
     ctl.start()
+    if timer is not None:
+        timer.mark("controller")
 
-    bridge = AsyncBridge(reg)
+    # "setup" flows the other way (clients -> controller); the bridge must not consume it.
+    bridge = AsyncBridge(reg, topics=[name for name in reg.names() if name != "setup"])
     bridge.start()
 
-    clients: set[WebSocketServerProtocol] = set()
-
-    async def ws_handler(ws: WebSocketServerProtocol):
-        clients.add(ws)
-        try:
-            await handler(ws, reg)
-        finally:
-            clients.discard(ws)
+    fanout = FanOut(maxsize=256, policy="drop_old", deltas=DeltaCodec(("pose", "detections")),
+                    e2e=bus_metrics.e2e("ws") if bus_metrics else None)
+    cache = EncodedCache()
+    store = SnapshotStore(history=1024, history_s=60.0, limits={"visual_frame": 1, "thermal_frame": 1, "lidar_frame": 1})
 
-    server = await websockets.serve(ws_handler, "127.0.0.1", 8765)
-    print("WebSocket server on ws://127.0.0.1:8765")
+    extra = {"process_request": stats_route(bus_metrics)} if bus_metrics else {}
+    server = await websockets.serve(make_ws_handler(CommandIngress(reg.channel("setup")), fanout, store),
+                                   "127.0.0.1", 8765, **extra)
+    print("WebSocket server on ws://127.0.0.1:8765" + (" (stats: http://127.0.0.1:8765/stats)" if bus_metrics else ""))
+    if timer is not None:
+        timer.mark("server")
+        timer.done()
 
-    btask = asyncio.create_task(broadcaster(bridge, clients))
+    btask = asyncio.create_task(broadcaster(bridge, fanout, cache, store=store))
 
     stop = asyncio.Future()
     for sig in (signal.SIGINT, signal.SIGTERM):
@@ -85,10 +209,15 @@ async def main():
         pass
     finally:
         btask.cancel()
+        await fanout.close()
         server.close()
         await server.wait_closed()
         await bridge.stop()
         ctl.stop()
+        if reporter is not None:
+            reporter.stop()
+        for pool in pools.values():
+            pool.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
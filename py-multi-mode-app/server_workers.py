@@ -0,0 +1,149 @@
+"""Multi-worker server: the Controller plus N WebSocket worker processes sharing one port.
+
+    python run.py --mode server --workers 4
+
+This process keeps the registry, frame pools, Controller and bus metrics, plus an EncodedFeed (see
+worker_link.py) that numbers, encodes and pickles each outbound batch once for all workers. Each worker has
+its own interpreter and event loop and binds 127.0.0.1:8765 with SO_REUSEPORT, so the kernel spreads new
+connections over the workers. Within a worker, clients are served exactly as by server_mode (subscriptions,
+formats, rate caps, deltas, join snapshots). Commands go to the worker's own "setup" channel, which answers
+"queued" at once, and are forwarded to the Controller. Its "setup_ack" results reach every worker, and the
+one holding the client delivers them. Needs SO_REUSEPORT (Linux); workers do not serve /stats.
+"""
+from __future__ import annotations
+import asyncio
+import os
+import signal
+import socket
+import threading
+from typing import TYPE_CHECKING
+from change_filter import ChangeFilter
+from controller import Controller, CHANGE_EPS, FRAME_SPECS
+from frame_pool import build_frame_pools
+from startup import StartupTimer
+from topics import build_registry, topic_configs
+if TYPE_CHECKING:
+    from batch_sim import BatchSim
+
+WORKER_READY_S = 10.0   # how long a worker may take to start and bind
+FORMATS_EVERY_S = 0.5   # how often a worker re-checks which formats its clients use
+
+async def serve_worker(conn, host: str = "127.0.0.1", port: int = 8765):
+    """One worker: a FanOut, EncodedCache and SnapshotStore fed from `conn` until the controller closes it."""
+    import websockets
+    from channels import ChannelRegistry
+    from codec import EncodedCache
+    from commands import CommandIngress
+    from delta import DeltaCodec
+    from fanout import FanOut
+    from server_mode import make_ws_handler
+    from snapshot import SnapshotStore
+    from worker_link import Batch, WorkerFeed
+
+    loop = asyncio.get_running_loop()
+    reg = ChannelRegistry([c for c in topic_configs("server") if c.name == "setup"])
+    fanout = FanOut(maxsize=256, policy="drop_old", deltas=DeltaCodec(("pose", "detections")))
+    cache = EncodedCache()
+    store = SnapshotStore(history=1024, history_s=60.0, limits={"visual_frame": 1, "thermal_frame": 1, "lidar_frame": 1})
+    closed = asyncio.Event()
+
+    def deliver(batch: Batch):
+        for topic, seq0, envs, encoded in batch:
+            if seq0 is None:   # a reply for one client, which may be on another worker
+                for env in envs:
+                    fanout.publish_to(env.payload["client"], env, cache)
+                continue
+            store.append(topic, envs, seq0)
+            # Seed the cache too, so downsampled clients reuse the controller's encodings.
+            for fmt, msgs in encoded.items():
+                if len(msgs) == len(envs):
+                    for i, (env, msg) in enumerate(zip(envs, msgs)):
+                        cache.put(env, fmt, msg, seq0 + i)
+            fanout.publish_batch(topic, envs, cache, seq0, encoded)
+
+    server = await websockets.serve(make_ws_handler(CommandIngress(reg.channel("setup")), fanout, store),
+                                   host, port, reuse_port=True)
+    conn.send(("ready", os.getpid()))
+    feed = WorkerFeed(conn, reg.channel("setup"), deliver, loop, on_closed=closed.set).start()
+    formats = None
+    try:
+        while not closed.is_set():
+            if fanout.formats() != formats:
+                formats = fanout.formats()
+                feed.report_formats(formats)
+            try:
+                await asyncio.wait_for(closed.wait(), FORMATS_EVERY_S)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await fanout.close()
+        server.close()
+        await server.wait_closed()
+        feed.stop()
+
+def worker_main(conn, host: str, port: int):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)   # Ctrl+C reaches the whole group; the parent stops us via the pipe
+    asyncio.run(serve_worker(conn, host, port))
+
+def run_workers(workers: int = 2, metrics: bool = False, sim: BatchSim | None = None,
+                timer: StartupTimer | None = None, host: str = "127.0.0.1", port: int = 8765):
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise SystemExit("--workers needs SO_REUSEPORT (Linux)")
+    import multiprocessing
+    from worker_link import EncodedFeed
+    timer = timer or StartupTimer()
+    reg = build_registry("server")
+    bus_metrics = reporter = None
+    if metrics:
+        from metrics import BusMetrics, MetricsReporter
+        bus_metrics = BusMetrics().attach(reg)
+        reporter = MetricsReporter(bus_metrics, reg.channel("metrics")).start()
+    pools = build_frame_pools(FRAME_SPECS)
+    timer.mark("registry")
+    ctl = Controller(reg, frame_pools=pools, change_filter=ChangeFilter(CHANGE_EPS), sim=sim)
+    ctl.start()
+    timer.mark("controller")
+
+    ctx = multiprocessing.get_context("spawn")
+    conns, procs = [], []
+    for i in range(workers):
+        parent, child = ctx.Pipe(duplex=True)
+        proc = ctx.Process(target=worker_main, name=f"WsWorker-{i}", daemon=True, args=(child, host, port))
+        proc.start()
+        child.close()
+        conns.append(parent)
+        procs.append(proc)
+    feed = None
+    try:
+        for conn in conns:
+            if not conn.poll(WORKER_READY_S):
+                raise SystemExit("a WebSocket worker did not start in time")
+            conn.recv()   # ("ready", pid)
+        # "setup" flows the other way (workers -> controller); the feed must not consume it.
+        feed = EncodedFeed(reg, conns, outbound=[name for name in reg.names() if name != "setup"]).start()
+        timer.mark("workers")
+        timer.done()
+        print(f"WebSocket server on ws://{host}:{port} ({workers} workers)", flush=True)
+
+        stop = threading.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: stop.set())
+        while not stop.wait(0.5):
+            if not any(p.is_alive() for p in procs):
+                break
+    except EOFError:
+        raise SystemExit(f"a WebSocket worker failed to start (is {host}:{port} taken?)")
+    finally:
+        if feed is not None:
+            feed.stop()   # closing the pipes tells the workers to exit
+        for conn in conns:
+            conn.close()
+        for proc in procs:
+            proc.join(timeout=3.0)
+            if proc.is_alive():
+                proc.terminate()
+        ctl.stop()
+        if reporter is not None:
+            reporter.stop()
+        for pool in pools.values():
+            pool.close()
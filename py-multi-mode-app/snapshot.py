@@ -0,0 +1,94 @@
+from __future__ import annotations
+from collections import deque
+from typing import Any, Deque, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+from messages import Envelope, as_dict
+
+def value_key(env: Envelope) -> Tuple[Hashable, ...]:
+    # One channel topic can carry several values at once: kpi per source, pose per body in batch simulation.
+    # A late joiner needs the last of each.
+    p = env.payload
+    if not hasattr(p, "get"):
+        return (env.topic,)
+    return (env.topic, p.get("source"))
+
+class SnapshotStore:
+    """Per-topic sequence numbers plus the last value and a bounded recent history, for late joiners.
+
+    The broadcaster appends every batch before fanning it out; envelopes are numbered per topic from 1
+    and the number travels on the wire as "seq". A snapshot built in the same event-loop step that adds
+    (or re-subscribes) a session ends exactly one before the first live message the session will see,
+    so the handoff has no gap and no duplicate. The last value is kept per value_key (envelope topic,
+    source) for up to `history` keys per topic, so a joiner gets one per source of a shared topic.
+    History is capped at `history` envelopes per topic (`limits` overrides that per topic) and at
+    `history_s` seconds per request.
+    """
+    def __init__(self, history: int = 1024, history_s: float = 60.0, limits: Optional[Dict[str, int]] = None):
+        self.history = history
+        self.history_s = history_s
+        self.limits = limits or {}
+        self._next: Dict[str, int] = {}
+        self._recent: Dict[str, Deque[Tuple[int, Envelope]]] = {}
+        self._last: Dict[str, Dict[Tuple[Hashable, ...], Tuple[int, Envelope]]] = {}
+
+    def append(self, topic: str, envs: Sequence[Envelope], seq0: Optional[int] = None) -> int:
+        """Record a batch; returns the seq of its first envelope. A `seq0` adopts numbering done upstream
+        (the controller side of a multi-worker server, see server_workers.py) instead of counting here."""
+        if seq0 is None:
+            seq0 = self._next.get(topic, 1)
+        self._next[topic] = seq0 + len(envs)
+        recent = self._recent.get(topic)
+        if recent is None:
+            recent = self._recent[topic] = deque(maxlen=max(1, self.limits.get(topic, self.history)))
+        items = list(enumerate(envs, seq0))
+        recent.extend(items)
+        last = self._last.setdefault(topic, {})
+        for item in items:
+            k = value_key(item[1])
+            last.pop(k, None)  # re-insert, so the dict stays ordered oldest update first
+            last[k] = item
+        while len(last) > self.history:
+            del last[next(iter(last))]
+        return seq0
+
+    def topics(self) -> List[str]:
+        return list(self._recent)
+
+    def last_seq(self, topic: str) -> int:
+        return self._next.get(topic, 1) - 1
+
+    def _recent_items(self, topic: str, history_s: float) -> List[Tuple[int, Envelope]]:
+        # The last value of every key, plus (history_s > 0) every envelope of the last history_s seconds.
+        items = sorted(self._last[topic].values(), key=lambda item: item[0])
+        if history_s <= 0:
+            return items
+        recent = self._recent[topic]
+        cutoff = recent[-1][1].ts - min(history_s, self.history_s)
+        window = []
+        for item in reversed(recent):
+            if item[1].ts < cutoff:
+                break
+            window.append(item)
+        window.reverse()
+        first = window[0][0]
+        return [item for item in items if item[0] < first] + window
+
+    def snapshot(self, topics: Iterable[str], history_s: float = 0.0) -> Dict[str, Any]:
+        """One "snapshot" message: the last value per key of each topic, plus its last `history_s` seconds.
+
+            {"topic": "snapshot", "topics": {"kpi": {"seq": 41, "items": [{"topic": "kpi", "seq": 38, "ts": ...,
+                                                                          "payload": {...}}, ...]}}}
+
+        Items are in seq order and carry their own seq and envelope topic. `seq` is the last seq of the topic;
+        live messages for it continue at seq + 1.
+        """
+        out: Dict[str, Any] = {}
+        for topic in topics:
+            if not self._recent.get(topic):
+                continue
+            items = self._recent_items(topic, history_s)
+            out[topic] = {
+                "seq": self.last_seq(topic),
+                "items": [{"topic": e.topic, "seq": seq, "ts": e.ts, "payload": as_dict(e.payload)}
+                          for seq, e in items],
+            }
+        return {"topic": "snapshot", "topics": out}
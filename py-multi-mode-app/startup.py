@@ -0,0 +1,30 @@
+"""Startup-phase timing for the launcher: wall time per phase, printed with `--timing`."""
+from __future__ import annotations
+import sys, time
+
+class StartupTimer:
+    """`mark(phase)` closes the phase that started at the previous mark (or at `t0`); `done()` is called
+    once the mode is up and prints the breakdown to stderr when `echo` is set. Per-module import detail is
+    what `python -X importtime run.py ...` adds on top."""
+    def __init__(self, t0: float | None = None, echo: bool = False):
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self.echo = echo
+        self.phases: list[tuple[str, float]] = []
+        self._last = self.t0
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def total_ms(self) -> float:
+        return (self._last - self.t0) * 1e3
+
+    def report(self) -> str:
+        width = max((len(p) for p, _ in self.phases), default=5)
+        lines = [f"  {p:<{width}}  {s * 1e3:7.1f} ms" for p, s in self.phases]
+        return "\n".join(["startup:"] + lines + [f"  {'total':<{width}}  {self.total_ms():7.1f} ms"])
+
+    def done(self):
+        if self.echo:
+            print(self.report(), file=sys.stderr, flush=True)
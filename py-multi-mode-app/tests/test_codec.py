@@ -0,0 +1,14 @@
+"""EncodedCache: one encoding per envelope, format and seq."""
+import json
+
+from codec import EncodedCache
+from messages import Envelope, Telemetry
+
+def test_seq_is_part_of_the_key():
+    cache = EncodedCache()
+    env = Envelope("kpi", Telemetry("a", 1.0), 0.0)
+    assert json.loads(cache.get(env, "json", 5))["seq"] == 5
+    assert json.loads(cache.get(env, "json", 7))["seq"] == 7
+    cache.put(env, "json", "seeded", 9)
+    assert cache.get(env, "json", 9) == "seeded"
+    assert cache.get(env, "json", 5) is cache.get(env, "json", 5)
@@ -0,0 +1,41 @@
+"""DeltaCodec keyframes per envelope topic and source, and acks that count for their source."""
+import asyncio
+import json
+
+from codec import EncodedCache
+from delta import DeltaCodec
+from fanout import FanOut
+from messages import Envelope, PoseMsg
+
+def pose(source, x, ts):
+    return Envelope("pose", PoseMsg(x, 1, 2, 0, 0, 0, source=source), ts)
+
+def test_keyframes_are_kept_per_source():
+    # Batch simulation: every body's pose is diffed against its own keyframe, not the previous body's.
+    codec = DeltaCodec(keyframe_every=3)
+    batch = lambda seq0, ts: codec.frames("pose", [pose("sim-000", 1.0, ts), pose("sim-001", 5.0, ts)], seq0)
+    assert batch(1, 0.0) == [(1, None), (2, None)]
+    assert batch(3, 0.1) == [(1, {}), (2, {})]
+    assert batch(5, 0.2) == [(1, {}), (2, {})]
+    assert batch(7, 0.3) == [(7, None), (8, None)]  # keyframe_every counts each source's own envelopes
+    assert codec.keyframe_key("pose", 8) == ("pose", "sim-001")
+    assert codec.keyframe_key("pose", 2) is None  # replaced
+
+def test_acks_count_for_their_source():
+    async def run():
+        fanout = FanOut(deltas=DeltaCodec())
+        async def send(msg):
+            pass
+        s = fanout.add("client", send)
+        s.delta = True
+        cache = EncodedCache()
+        fanout.publish_batch("pose", [pose("a", 1.0, 0.0), pose("b", 2.0, 0.0)], cache, seq0=1)
+        s.ack("pose", 2)  # only b's keyframe
+        fanout.publish_batch("pose", [pose("a", 1.5, 0.1), pose("b", 2.5, 0.1)], cache, seq0=3)
+        msgs = [json.loads(m) for m, *_ in s._buf]
+        await fanout.close()
+        return msgs
+    msgs = asyncio.run(run())
+    assert [m.get("key", False) for m in msgs[:2]] == [True, True]
+    assert "payload" in msgs[2] and "base" not in msgs[2]  # a: not acked, full message
+    assert msgs[3] == {"topic": "pose", "ts": 0.1, "seq": 4, "base": 2, "delta": {"x": 2.5}}
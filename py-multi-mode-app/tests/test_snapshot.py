@@ -0,0 +1,22 @@
+"""Late-joiner snapshots: one last value per source of a shared topic, each with its own seq."""
+from messages import Envelope, PoseMsg, Telemetry
+from snapshot import SnapshotStore
+
+def pose(source, x, ts):
+    return Envelope("pose", PoseMsg(x, 0, 0, 0, 0, 0, source=source), ts)
+
+def test_last_value_per_body():
+    store = SnapshotStore()
+    store.append("pose", [pose("sim-000", 1, 1.0), pose("sim-001", 2, 1.0), pose("sim-000", 3, 2.0)])
+    store.append("pose", [pose("sim-000", 4, 3.0)])
+    snap = store.snapshot(["pose"])["topics"]["pose"]
+    assert snap["seq"] == 4  # live messages continue at 5
+    assert [(i["topic"], i["seq"], i["payload"]["source"], i["payload"]["x"]) for i in snap["items"]] == \
+           [("pose", 2, "sim-001", 2), ("pose", 4, "sim-000", 4)]
+
+def test_history_adds_last_values_of_quiet_sources():
+    store = SnapshotStore()
+    store.append("kpi", [Envelope("kpi", Telemetry("quiet", 0.0), 0.0)], seq0=7)
+    store.append("kpi", [Envelope("kpi", Telemetry("a", float(i)), 10.0 + i) for i in range(3)], seq0=8)
+    items = store.snapshot(["kpi"], history_s=1.0)["topics"]["kpi"]["items"]
+    assert [(i["seq"], i["payload"]["source"]) for i in items] == [(7, "quiet"), (9, "a"), (10, "a")]
@@ -0,0 +1,26 @@
+"""Binary frames decode to the same payloads as the JSON wire format."""
+import json
+
+import pytest
+
+import wire
+from messages import Envelope, FrameHandle, FrameMsg, Telemetry
+
+def test_frame_handle_round_trip():
+    handle = FrameHandle("psm_frames", 2, (480, 640, 3), "B", 2**33 + 5)
+    envs = [Envelope("visual_frame", FrameMsg(path=None, ts=1.0, handle=handle), 1.0),
+            Envelope("visual_frame", FrameMsg(path="/tmp/v.png", ts=2.0), 2.0)]
+    rows = wire.decode_frame(wire.encode_batch("visual_frame", envs, seq0=4))
+    assert [r["payload"] for r in rows] == [json.loads(json.dumps(e.payload.to_dict())) for e in envs]
+    assert rows[0]["payload"]["handle"]["shape"] == [480, 640, 3]
+    assert rows[1]["payload"]["handle"] is None
+    assert [r["seq"] for r in rows] == [4, 5]
+
+def test_version_is_checked():
+    frame = bytearray(wire.encode_batch("kpi", [Envelope("kpi", Telemetry("s", 1.0), 0.0)]))
+    assert frame[2] == wire.VERSION == 4
+    frame[2] = 3  # older frames share the header and still decode
+    assert wire.decode_frame(bytes(frame))[0]["payload"] == {"source": "s", "value": 1.0}
+    frame[2] = 9
+    with pytest.raises(ValueError):
+        wire.decode_frame(bytes(frame))
@@ -1,27 +1,38 @@
 from __future__ import annotations
 import tkinter as tk
-from channels import ChannelConfig, ChannelRegistry
-from controller import Controller
+from typing import TYPE_CHECKING
+from controller import Controller, FRAME_SPECS
+from frame_pool import StaleFrame, build_frame_pools
 from messages import Envelope
+from metrics import BusMetrics, MetricsReporter
+from tk_pump import TkPump
+from topics import build_registry
+if TYPE_CHECKING:
+    from batch_sim import BatchSim
+    from startup import StartupTimer
+try:
+    import numpy as np
+    from strip_chart import StripChart
+    from timeseries import TimeSeriesStore
+except ImportError:   # numpy is optional: without it the GUI shows the latest values only
+    np = None
 
-def build_registry() -> ChannelRegistry:
-    return ChannelRegistry([
-        ChannelConfig("visual_frame", maxsize=1, policy="latest"),
-        ChannelConfig("thermal_frame", maxsize=1, policy="latest"),
-        ChannelConfig("lidar_frame",   maxsize=1, policy="latest"),
-        ChannelConfig("kpi",           maxsize=1000, policy="drop_old"),
-        ChannelConfig("detections",    maxsize=1000, policy="drop_old"),
-        ChannelConfig("pose",          maxsize=1000, policy="drop_old"),
-        ChannelConfig("setup",         maxsize=10, policy="block"),
-        ChannelConfig("visual_image_msg",  maxsize=1000, policy="drop_old"),
-        ChannelConfig("thermal_image_msg", maxsize=1000, policy="drop_old"),
-        ChannelConfig("lidar_image_msg",   maxsize=1000, policy="drop_old"),
-    ])
-
-def run_gui():
-    reg = build_registry()
-    ctl = Controller(reg)
+# History kept for the strip charts: 10 minutes at up to 100 Hz.
+CHART_SPAN_S = 600.0
+CHART_MAX_HZ = 100.0
+
+def run_gui(metrics: bool = False, sim: BatchSim | None = None, timer: StartupTimer | None = None):
+    reg = build_registry("gui")
+    # Off by default: channels without metrics skip all counting and timestamping.
+    bus_metrics = BusMetrics().attach(reg) if metrics else None
+    reporter = MetricsReporter(bus_metrics, reg.channel("metrics")).start() if bus_metrics else None
+    pools = build_frame_pools(FRAME_SPECS)
+    if timer is not None:
+        timer.mark("registry")
+    ctl = Controller(reg, frame_pools=pools, sim=sim)
     ctl.start()
+    if timer is not None:
+        timer.mark("controller")
 
     root = tk.Tk()
     root.title("Telemetry (KPI)")
@@ -32,20 +43,87 @@ def run_gui():
     pose_label = tk.Label(root, text="pose: —", width=60)
     pose_label.pack(padx=10, pady=5)
 
-    def pump():
-        for env in reg.channel("kpi").try_drain():
-            label.config(text=f"KPI value: {env.payload['value']:.3f}")
-        for env in reg.channel("pose").try_drain():
-            p = env.payload
-            pose_label.config(text=f"pose: x={p['x']:.3f} y={p['y']:.3f} yaw={p['yaw']:.3f}")
-        root.after(30, pump)
+    frame_label = tk.Label(root, text="visual: —", width=60)
+    frame_label.pack(padx=10, pady=5)
+
+    stores, charts = {}, {}
+    if np is not None:
+        capacity = int(CHART_SPAN_S * CHART_MAX_HZ)
+        stores["kpi"] = TimeSeriesStore(["value"], capacity=capacity)
+        stores["pose"] = TimeSeriesStore(["x", "y", "z", "yaw", "pitch", "roll"], capacity=capacity)
+        charts["kpi"] = StripChart(root, stores["kpi"], span_s=CHART_SPAN_S)
+        charts["pose"] = StripChart(root, stores["pose"], fields=["x", "y"], span_s=CHART_SPAN_S)
+        for chart in charts.values():
+            chart.pack(fill="x", expand=True, padx=10, pady=2)
+
+    status = tk.Label(root, text="", width=60, fg="gray40")
+    status.pack(padx=10, pady=(0, 10))
+
+    def record(topic: str, envs):
+        # Every sample goes into the history; the render callbacks only see the newest one per frame.
+        store = stores.get(topic)
+        if store is None:
+            return
+        ts = np.fromiter((e.ts for e in envs), float, len(envs))
+        rows = np.array([[e.payload[f] for f in store.fields] for e in envs], dtype=float)
+        store.append(ts, rows)
+
+    def show_kpi(env: Envelope):
+        label.config(text=f"KPI value: {env.payload['value']:.3f}")
+        if "kpi" in charts:
+            charts["kpi"].redraw()
+
+    def show_pose(env: Envelope):
+        p = env.payload
+        pose_label.config(text=f"pose: x={p['x']:.3f} y={p['y']:.3f} yaw={p['yaw']:.3f}")
+        if "pose" in charts:
+            charts["pose"].redraw()
+
+    def show_visual(env: Envelope):
+        h = env.payload["handle"]
+        try:
+            with pools["visual_frame"].read(h) as px:   # zero-copy view onto the shared slot
+                rows, cols, _ = h.shape
+                frame_label.config(text=f"visual: {cols}x{rows} gen {h.generation} centre {px[rows // 2, cols // 2, 0]}")
+        except StaleFrame:
+            pass
+
+    metrics_label = tk.Label(root, text="", width=80, fg="gray40")
+    metrics_label.pack(padx=10, pady=(0, 10))
+
+    def show_metrics(env: Envelope):
+        kpi, tk_e2e = env.payload["channels"]["kpi"], env.payload["e2e"].get("tk")
+        text = f"kpi: {kpi['puts']} put · {kpi['drops']} dropped · high water {kpi['high_water']}"
+        if kpi["dwell"]["count"]:
+            text += f" · dwell p99 {kpi['dwell']['p99_ms']:.2f} ms"
+        if tk_e2e and tk_e2e["count"]:
+            text += f" · render p99 {tk_e2e['p99_ms']:.1f} ms"
+        metrics_label.config(text=text)
+
+    render = {"kpi": show_kpi, "pose": show_pose, "visual_frame": show_visual, "metrics": show_metrics}
+
+    def show_stats(stats):
+        status.config(text=f"frame {stats['frame_ms']:.1f} ms · every {stats['interval_ms']} ms · "
+                           f"dropped updates {stats['dropped_updates']}")
+
+    # At most one widget update per topic per frame, however much the controller buffered in between.
+    pump = TkPump(root, reg, lambda env: render[env.topic](env), every_ms=30, topics=list(render),
+                  on_batch=record, on_frame=show_stats, e2e=bus_metrics.e2e("tk") if bus_metrics else None)
 
     def on_close():
+        pump.stop()
         ctl.stop()
+        if reporter is not None:
+            reporter.stop()
         root.destroy()
+        for pool in pools.values():
+            pool.close()
 
     root.protocol("WM_DELETE_WINDOW", on_close)
-    pump()
+    pump.start()
+    if timer is not None:
+        timer.mark("gui")
+        timer.done()
     root.mainloop()
 
 if __name__ == "__main__":
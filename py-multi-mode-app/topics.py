@@ -0,0 +1,27 @@
+"""Declarative topic table: every channel the entry points use, with its bound, policy and the modes that
+carry it. `build_registry(mode)` is the one place registries are built from it."""
+from __future__ import annotations
+from channels import ChannelConfig, ChannelRegistry
+
+# name, maxsize, policy, modes (None: every mode)
+TOPICS: tuple[tuple[str, int, str, tuple[str, ...] | None], ...] = (
+    ("visual_frame",         1, "latest",   None),
+    ("thermal_frame",        1, "latest",   None),
+    ("lidar_frame",          1, "latest",   None),
+    ("kpi",               1000, "drop_old", None),
+    ("detections",        1000, "drop_old", None),
+    ("pose",              1000, "drop_old", None),
+    ("setup",               64, "priority", None),
+    ("setup_ack",         1000, "drop_old", ("server",)),   # command results go back to WebSocket clients only
+    ("metrics",              1, "latest",   None),
+    ("visual_image_msg",  1000, "drop_old", None),
+    ("thermal_image_msg", 1000, "drop_old", None),
+    ("lidar_image_msg",   1000, "drop_old", None),
+)
+
+def topic_configs(mode: str) -> list[ChannelConfig]:
+    return [ChannelConfig(name, maxsize=maxsize, policy=policy) for name, maxsize, policy, modes in TOPICS
+            if modes is None or mode in modes]
+
+def build_registry(mode: str) -> ChannelRegistry:
+    return ChannelRegistry(topic_configs(mode))
@@ -0,0 +1,199 @@
+"""Controller <-> WebSocket worker processes, for the multi-worker server (see server_workers.py).
+
+`EncodedFeed` runs next to the Controller. Like AsyncBridge it drains the outbound channels when they are
+put to, but it also numbers each batch per topic (the "seq" clients see), encodes it once per wire format
+some client uses and pickles the result once: the same bytes go to every worker over its own pipe (a Unix
+socket pair). Workers only unpickle and fan out, and all of them number and encode identically. Setup
+commands travel the other way and land on the controller's "setup" channel.
+
+`WorkerFeed` is the worker's end: a reader thread hands each batch to the event loop, and a sender thread
+forwards what clients put on the worker's own "setup" channel, plus the formats its clients use.
+
+    controller -> worker   ("batch", [(topic, seq0, envs, {fmt: encoded}), ...])   seq0 None: direct topic
+    worker -> controller   ("setup", [envs])  |  ("formats", [fmt, ...])
+"""
+from __future__ import annotations
+import asyncio
+import pickle
+import threading
+from multiprocessing.connection import Connection, wait
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from channels import Channel, ChannelRegistry
+from codec import Encoded, encode
+from messages import Envelope
+import wire
+
+Batch = List[Tuple[str, Optional[int], List[Envelope], Dict[str, List[Encoded]]]]
+
+def encode_formats(topic: str, envs: List[Envelope], seq0: int, formats: Iterable[str]) -> Dict[str, List[Encoded]]:
+    """A batch in every format of `formats`, shaped like EncodedCache.get_batch (one binary frame for the
+    batch; topics without a binary schema are left to the worker's JSON fallback)."""
+    out: Dict[str, List[Encoded]] = {}
+    for fmt in formats:
+        if fmt == "binary":
+            frame = wire.encode_batch(topic, envs, seq0)
+            if frame is not None:
+                out[fmt] = [frame]
+        else:
+            out[fmt] = [encode(env, fmt, seq0 + i) for i, env in enumerate(envs)]
+    return out
+
+class EncodedFeed:
+    """Sends every outbound batch, numbered and pre-encoded, to all workers; forwards their setup commands."""
+    def __init__(self, reg: ChannelRegistry, conns: Iterable[Connection], outbound: Iterable[str],
+                 direct: Iterable[str] = ("setup_ack",)):
+        self.reg = reg
+        self.outbound: List[str] = list(outbound)
+        self.direct: Set[str] = set(direct)   # replies to one client: broadcast unnumbered, encoded by its worker
+        self.formats: Dict[Connection, Set[str]] = {c: {"json"} for c in conns}   # until a worker reports
+        self.sent_batches = 0
+        self.sent_bytes = 0
+        self._next: Dict[str, int] = {}
+        self._wake = threading.Event()
+        self._stopping = False
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def workers(self) -> int:
+        return len(self.formats)
+
+    def start(self) -> EncodedFeed:
+        for name in self.outbound:
+            self.reg.channel(name).add_listener(self._on_put)
+        self._threads = [threading.Thread(target=self._send_loop, name="EncodedFeedSend", daemon=True),
+                         threading.Thread(target=self._recv_loop, name="EncodedFeedRecv", daemon=True)]
+        for t in self._threads:
+            t.start()
+        self._wake.set()
+        return self
+
+    def stop(self) -> None:
+        self._stopping = True
+        for name in self.outbound:
+            self.reg.channel(name).remove_listener(self._on_put)
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout=2.0)
+        for c in list(self.formats):   # workers see EOF and shut down
+            try:
+                c.close()
+            except OSError:
+                pass
+
+    def _on_put(self, name: str) -> None:
+        if not self._wake.is_set():
+            self._wake.set()
+
+    def _send_loop(self) -> None:
+        while not self._stopping:
+            self._wake.wait()
+            self._wake.clear()
+            formats = set().union(*list(self.formats.values()))
+            batch: Batch = []
+            for name in self.outbound:
+                envs = self.reg.channel(name).drain_batch()
+                if not envs:
+                    continue
+                if name in self.direct:
+                    batch.append((name, None, envs, {}))
+                    continue
+                seq0 = self._next.get(name, 1)
+                self._next[name] = seq0 + len(envs)
+                batch.append((name, seq0, envs, encode_formats(name, envs, seq0, formats)))
+            if not batch or not self.formats:
+                continue
+            data = pickle.dumps(("batch", batch), pickle.HIGHEST_PROTOCOL)   # once, whatever the worker count
+            for c in list(self.formats):
+                try:
+                    c.send_bytes(data)
+                except (OSError, ValueError):
+                    self.formats.pop(c, None)   # that worker is gone
+            self.sent_batches += 1
+            self.sent_bytes += len(data)
+
+    def _recv_loop(self) -> None:
+        setup = self.reg.channel("setup")
+        while not self._stopping and self.formats:
+            for c in wait(list(self.formats), timeout=0.1):
+                try:
+                    kind, items = c.recv()
+                except (EOFError, OSError):
+                    self.formats.pop(c, None)
+                    continue
+                if kind == "setup":
+                    setup.put_batch(items)
+                elif kind == "formats":
+                    self.formats[c] = set(items)
+
+class WorkerFeed:
+    """The worker's end of an EncodedFeed pipe. `deliver(batch)` runs on `loop`; `on_closed` too, once
+    the controller side goes away."""
+    def __init__(self, conn: Connection, setup: Channel[Envelope], deliver: Callable[[Batch], None],
+                 loop: asyncio.AbstractEventLoop, on_closed: Optional[Callable[[], None]] = None):
+        self.conn = conn
+        self.setup = setup
+        self.deliver = deliver
+        self.loop = loop
+        self.on_closed = on_closed
+        self.received_batches = 0
+        self._formats: Optional[List[str]] = None
+        self._wake = threading.Event()
+        self._stopping = False
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> WorkerFeed:
+        self.setup.add_listener(self._on_put)
+        self._threads = [threading.Thread(target=self._send_loop, name="WorkerFeedSend", daemon=True),
+                         threading.Thread(target=self._recv_loop, name="WorkerFeedRecv", daemon=True)]
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopping = True
+        self.setup.remove_listener(self._on_put)
+        self._wake.set()
+        for t in self._threads:
+            if t is not threading.current_thread():
+                t.join(timeout=2.0)
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+
+    def report_formats(self, formats: Iterable[str]) -> None:
+        """Tell the controller which formats to pre-encode for this worker's clients."""
+        self._formats = sorted(formats)
+        self._wake.set()
+
+    def _on_put(self, name: str) -> None:
+        if not self._wake.is_set():
+            self._wake.set()
+
+    def _send_loop(self) -> None:
+        while not self._stopping:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                if self._formats is not None:
+                    formats, self._formats = self._formats, None
+                    self.conn.send(("formats", formats))
+                items = self.setup.drain_batch()
+                if items:
+                    self.conn.send(("setup", items))
+            except (OSError, ValueError):
+                break
+
+    def _recv_loop(self) -> None:
+        while not self._stopping:
+            try:
+                if not self.conn.poll(0.1):
+                    continue
+                kind, batch = pickle.loads(self.conn.recv_bytes())
+            except (EOFError, OSError):
+                break
+            self.received_batches += 1
+            if kind == "batch":
+                self.loop.call_soon_threadsafe(self.deliver, batch)
+        if not self._stopping and self.on_closed is not None:
+            self.loop.call_soon_threadsafe(self.on_closed)